@@ -1,10 +1,22 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from src.persistence import load_state, save_state
-from src.solver import optimize_purchasing_plan
-from src.analytics import analyze_price_elasticity
+from src.solver import (
+    DEFAULT_BACKEND,
+    PLAN_STATUSES,
+    optimize_budget_frontier,
+    run_risk_scenarios,
+)
+from src.analytics import CHART_POINTS, ELASTICITY_CACHE
+from src.compute_graph import ComputeGraph
+from src.jobs import OptimizationJob
+from src.plan_cache import PLAN_CACHE
+from src.comparison import compare_plan_with_manual
+from src.importer import import_histories, apply_histories, read_history_csv
+from src.history_stats import STATS_FIELD, history_stats, stats_decay
 
 # --- CONFIGURAÇÃO VISUAL ---
 st.set_page_config(page_title="ProfitMax Pro", layout="wide", page_icon="📈")
@@ -34,60 +46,51 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-
-# --- FUNÇÕES AUXILIARES ---
-def calculate_abc_class(products):
-    """Classifica produtos em A (80%), B (15%) e C (5%) do faturamento potencial"""
-    if not products:
-        return {}
-    data = []
-    for p in products:
-        rev = p["target_sell_price"] * p["manual_sales_estimate"]
-        data.append({"id": p["id"], "rev": rev})
-
-    data.sort(key=lambda x: x["rev"], reverse=True)
-    total = sum(d["rev"] for d in data)
-    accumulated = 0
-    mapping = {}
-
-    for item in data:
-        accumulated += item["rev"]
-        perc = accumulated / total if total > 0 else 0
-        if perc <= 0.80:
-            mapping[item["id"]] = "A"
-        elif perc <= 0.95:
-            mapping[item["id"]] = "B"
-        else:
-            mapping[item["id"]] = "C"
-    return mapping
-
-
 if "app_state" not in st.session_state:
-    st.session_state.app_state = load_state()
+    load_errors = []
+    st.session_state.app_state = load_state(on_error=load_errors.append)
+    st.session_state.load_errors = load_errors
 state = st.session_state.app_state
+for msg in st.session_state.load_errors:
+    st.error(f"⚠️ {msg}")
 
-if "optimization_result" not in st.session_state:
-    st.session_state.optimization_result = None
+if "scenario_result" not in st.session_state:
+    st.session_state.scenario_result = None
+if "frontier_result" not in st.session_state:
+    st.session_state.frontier_result = None
 if "editing_product_id" not in st.session_state:
     st.session_state.editing_product_id = None
+# Upload de histórico já aplicado em cada produto: {id: (file_id, erros)}.
+# O arquivo continua no widget entre reruns e só deve ser aplicado uma vez
+if "applied_uploads" not in st.session_state:
+    st.session_state.applied_uploads = {}
+# Resultados derivados (elasticidade, curva ABC, margens, plano) só são
+# recalculados quando as entradas de que dependem mudam
+if "graph" not in st.session_state:
+    st.session_state.graph = ComputeGraph(state)
+graph = st.session_state.graph
 
 # --- SIDEBAR ---
 with st.sidebar:
     st.header("⚙️ Ajustes Globais")
 
     # Orçamento
-    state["budget"] = st.number_input(
-        "💰 Orçamento (R$)", value=state["budget"], step=500.0
+    graph.set_setting(
+        "budget",
+        st.number_input("💰 Orçamento (R$)", value=state["budget"], step=500.0),
     )
 
     # Apetite ao Risco (Slider atualizado)
     st.markdown("### 🎚️ Apetite ao Risco")
-    state["risk_factor"] = st.slider(
-        "Nível de Agressividade",
-        0.0,
-        1.0,
-        state["risk_factor"],
-        help="0% = Compra só o mínimo garantido. 100% = Compra até o teto máximo de vendas estimado.",
+    graph.set_setting(
+        "risk_factor",
+        st.slider(
+            "Nível de Agressividade",
+            0.0,
+            1.0,
+            state["risk_factor"],
+            help="0% = Compra só o mínimo garantido. 100% = Compra até o teto máximo de vendas estimado.",
+        ),
     )
 
     # Legenda Dinâmica
@@ -98,11 +101,46 @@ with st.sidebar:
     else:
         st.caption("⚖️ Modo: Moderado (Equilibrado)")
 
+    with st.expander("⏱️ Limites do Solver"):
+        solver_time_limit = st.number_input(
+            "Tempo máximo (s)",
+            0.0,
+            value=30.0,
+            step=5.0,
+            help="Ao atingir o limite, o plano usa a melhor solução encontrada até ali. 0 = sem limite.",
+        )
+        solver_gap = st.number_input(
+            "Gap aceito (%)",
+            0.0,
+            50.0,
+            value=0.0,
+            step=0.5,
+            help="Distância máxima do lucro ótimo aceita para encerrar a busca mais cedo. 0 = ótimo exato.",
+        )
+
     st.markdown("---")
     if st.button("💾 Salvar Dados"):
         save_state(state)
         st.toast("Dados salvos com sucesso!", icon="✅")
 
+
+# Acompanhamento do cálculo em segundo plano: só este trecho é reexecutado
+# periodicamente, o restante da página continua utilizável
+@st.fragment(run_every=0.5)
+def show_plan_job():
+    job, _ = st.session_state.plan_job
+    if job.finished:
+        st.rerun()
+    progress = job.progress()
+    st.progress(
+        progress["fraction"],
+        text=f"⏳ {progress['label']} · {progress['elapsed']:.1f}s",
+    )
+    if st.button("⏹️ CANCELAR CÁLCULO", use_container_width=True):
+        job.cancel()
+        st.rerun()
+
+
 tab_dashboard, tab_produtos, tab_pricing = st.tabs(
     ["📊 Painel Estratégico", "📦 Gestão de Produtos", "🧠 Laboratório de Preço"]
 )
@@ -114,19 +152,50 @@ with tab_dashboard:
         "**Regra de Ouro:** A IA tem prioridade absoluta. Se não houver histórico, usamos sua estimativa manual. Se a estimativa for 0 e não houver histórico, o produto é ignorado."
     )
 
+    # O plano é calculado por um job em segundo plano, guardado junto com as
+    # versões das entradas lidas no início (ver ComputeGraph.store)
+    plan_job = st.session_state.get("plan_job")
+    running = plan_job is not None and not plan_job[0].finished
+
     if st.button(
-        "🚀 CALCULAR PLANO DE COMPRA", type="primary", use_container_width=True
+        "🚀 CALCULAR PLANO DE COMPRA",
+        type="primary",
+        use_container_width=True,
+        disabled=running,
     ):
         if not state["products"]:
             st.error("Cadastre produtos primeiro.")
         else:
-            with st.spinner("Analisando dados e restrições..."):
-                res = optimize_purchasing_plan(
-                    state["products"], state["budget"], state["risk_factor"]
-                )
-                st.session_state.optimization_result = res
+            job = OptimizationJob(
+                state["products"],
+                state["budget"],
+                state["risk_factor"],
+                DEFAULT_BACKEND,
+                time_limit=solver_time_limit or None,
+                mip_gap=solver_gap / 100,
+                plan_cache=PLAN_CACHE,
+            ).start()
+            st.session_state.plan_job = (job, graph.plan_inputs())
+            # Redesenha a página já com o botão desabilitado e o progresso
+            st.rerun()
+
+    if running:
+        show_plan_job()
+    elif plan_job is not None:
+        job, inputs = plan_job
+        del st.session_state.plan_job
+        if job.state == "done":
+            graph.store(("plan", DEFAULT_BACKEND), inputs, job.result)
+        elif job.state == "failed":
+            st.error(f"Falha ao calcular o plano: {job.error}")
+        else:
+            st.info("⏹️ Cálculo cancelado. O último plano calculado foi mantido.")
 
-    result = st.session_state.optimization_result
+    result = graph.peek(("plan", DEFAULT_BACKEND))
+    if result and not graph.is_fresh(("plan", DEFAULT_BACKEND)):
+        st.info(
+            "ℹ️ Os dados mudaram desde o último cálculo. Clique em CALCULAR para atualizar o plano."
+        )
 
     # --- EXIBIÇÃO DE ERROS/AVISOS ---
     if result and "skipped" in result and result["skipped"]:
@@ -137,50 +206,16 @@ with tab_dashboard:
             for skip in result["skipped"]:
                 st.write(f"- {skip}")
 
-    if result and result["status"] == "Optimal" and result["data"]:
-        df = pd.DataFrame(result["data"])
+    if result and result["status"] in PLAN_STATUSES and result["data"]:
+        if "message" in result:
+            st.warning(f"⏱️ {result['message']}")
 
         # --- LÓGICA COMPARATIVA ---
-        total_lucro_manual = 0
-        total_lucro_ia = 0
-        comparativo = []
-
-        for _, row in df.iterrows():
-            prod_original = next(
-                p for p in state["products"] if p["name"] == row["Produto"]
-            )
-
-            qtd_otima = row["Qtd Compra"]
-            custo_full = row["Custo Unit"] + row["Custo Operacional"]
-
-            # Cenário 1: Preço Manual (Seu Alvo)
-            preco_manual = prod_original["target_sell_price"]
-            lucro_manual_item = (preco_manual - custo_full) * qtd_otima
-
-            # Cenário 2: Preço IA (Ou Manual se a IA não atuou)
-            preco_ia = row["Preço Venda"]
-            lucro_ia_item = row["Lucro Previsto"]
-
-            total_lucro_manual += lucro_manual_item
-            total_lucro_ia += lucro_ia_item
-
-            source_label = row["Base Decisão"]
-
-            comparativo.append(
-                {
-                    "Produto": row["Produto"],
-                    "Volume": qtd_otima,
-                    "Decisão Baseada em": source_label,
-                    "Seu Preço": preco_manual,
-                    "Preço Otimizado": preco_ia,
-                    "Lucro (Seu Preço)": lucro_manual_item,
-                    "Lucro (Otimizado)": lucro_ia_item,
-                    "Ganho Extra": lucro_ia_item - lucro_manual_item,
-                }
-            )
-
-        df_comp = pd.DataFrame(comparativo)
-        delta = total_lucro_ia - total_lucro_manual
+        comparison = compare_plan_with_manual(result["data"], state["products"])
+        df_comp = comparison["table"]
+        total_lucro_manual = comparison["total_manual"]
+        total_lucro_ia = comparison["total_optimized"]
+        delta = comparison["delta"]
 
         # --- CARDS KPI ---
         c1, c2, c3 = st.columns(3)
@@ -207,8 +242,8 @@ with tab_dashboard:
             unsafe_allow_html=True,
         )
 
-        inv_total = df["Investimento Total"].sum()
-        roi = (total_lucro_ia / inv_total * 100) if inv_total > 0 else 0
+        inv_total = comparison["investment"]
+        roi = comparison["roi"]
         c3.markdown(
             f"""
         <div class="metric-card" style="border-left: 5px solid #1565c0;">
@@ -261,7 +296,6 @@ with tab_dashboard:
 
         with col_t2:
             st.subheader("💎 Top Margem (Por Unidade)")
-            df_comp["Margem Unit"] = df_comp["Lucro (Otimizado)"] / df_comp["Volume"]
             st.dataframe(
                 df_comp.sort_values("Margem Unit", ascending=False)
                 .head(3)[["Produto", "Margem Unit"]]
@@ -273,6 +307,177 @@ with tab_dashboard:
         st.error(result["message"])
     elif result:
         st.warning("O orçamento é insuficiente para cobrir as compras mínimas.")
+
+    # --- DIAGNÓSTICO DA OTIMIZAÇÃO ---
+    if result and "diagnostics" in result:
+        diag = result["diagnostics"]
+        counters = diag["counters"]
+        with st.expander(
+            f"🩺 Diagnóstico da Otimização ({diag['total_seconds']:.2f}s)",
+            expanded=False,
+        ):
+            stage_names = {
+                "demand_estimation": "Estimativa de demanda",
+                "model_build": "Montagem do modelo",
+                "solver_model_build": "Montagem do modelo (matriz/MPS)",
+                "solve": "Solver",
+                "extraction": "Extração do resultado",
+            }
+            df_diag = pd.DataFrame(
+                [
+                    {"Etapa": stage_names.get(k, k), "Tempo (s)": v}
+                    for k, v in diag["timings"].items()
+                ]
+            )
+            d1, d2 = st.columns([2, 3])
+            d1.dataframe(
+                df_diag.style.format({"Tempo (s)": "{:.4f}"}),
+                hide_index=True,
+                use_container_width=True,
+            )
+
+            gap = counters.get("mip_gap")
+            d2.markdown(
+                f"**Produtos:** {counters.get('products_total', 0)} no catálogo, "
+                f"{counters.get('products_analyzed', 0)} analisados, "
+                f"{counters.get('products_skipped', 0)} ignorados  \n"
+                f"**Origem:** {counters.get('source_ai', 0)} IA · "
+                f"{counters.get('source_manual', 0)} manual · "
+                f"{counters.get('source_committed_only', 0)} apenas agendados  \n"
+                f"**Modelo:** {counters.get('variables', 0)} variáveis, "
+                f"{counters.get('constraints', 0)} restrição(ões)  \n"
+                f"**Solver:** {counters.get('backend_used', '-')} · "
+                f"status {counters.get('solver_status', '-')} · "
+                f"gap {'n/d' if gap is None else f'{gap:.2%}'}  \n"
+                f"**Cache de elasticidade:** {counters.get('elasticity_cache_hits', 0)} "
+                f"acertos, {counters.get('elasticity_cache_misses', 0)} ajustes"
+            )
+
+    # --- CENÁRIOS DE RISCO (CONSERVADOR / MODERADO / AGRESSIVO) ---
+    st.divider()
+    st.subheader("⚖️ Comparação de Cenários de Risco")
+    st.caption(
+        "Resolve 0%, 50% e 100% de apetite ao risco em paralelo, com a mesma estimativa de demanda."
+    )
+
+    if st.button("⚖️ COMPARAR CENÁRIOS", use_container_width=True):
+        if not state["products"]:
+            st.error("Cadastre produtos primeiro.")
+        else:
+            with st.spinner("Simulando cenários..."):
+                st.session_state.scenario_result = run_risk_scenarios(
+                    state["products"], state["budget"]
+                )
+
+    scenarios = st.session_state.scenario_result
+    if scenarios:
+        cols_sc = st.columns(len(scenarios["scenarios"]))
+        # Por ID: produtos com o mesmo nome não se misturam; o nome é só rótulo
+        volumes = {}
+        names = {}
+        for col, sc in zip(cols_sc, scenarios["scenarios"]):
+            if sc["status"] in PLAN_STATUSES:
+                lucro_sc = sum(r["Lucro Previsto"] for r in sc["data"])
+                inv_sc = sum(r["Investimento Total"] for r in sc["data"])
+                detalhe = f"Investimento: R$ {inv_sc:,.2f}"
+                volumes[sc["label"]] = {r["ID"]: r["Qtd Compra"] for r in sc["data"]}
+                names.update((r["ID"], r["Produto"]) for r in sc["data"])
+            else:
+                lucro_sc = 0.0
+                detalhe = sc.get("message", sc["status"])
+            col.markdown(
+                f"""
+            <div class="metric-card" style="border-left: 5px solid #607d8b;">
+                <div class="metric-title">{sc['label']} ({sc['risk']:.0%})</div>
+                <div class="metric-value">R$ {lucro_sc:,.2f}</div>
+                <div class="metric-delta">{detalhe}</div>
+            </div>""",
+                unsafe_allow_html=True,
+            )
+
+        if volumes:
+            df_volumes = pd.DataFrame(volumes).fillna(0).astype(int)
+            df_volumes.insert(0, "Produto", df_volumes.index.map(names))
+            st.dataframe(df_volumes, use_container_width=True, hide_index=True)
+
+    # --- FRONTEIRA DE ORÇAMENTO (LUCRO x INVESTIMENTO) ---
+    st.divider()
+    st.subheader("📈 Fronteira de Orçamento")
+    st.caption(
+        "Lucro previsto para uma faixa de orçamentos, calculado de uma vez (a demanda é estimada uma única vez)."
+    )
+    f1, f2, f3 = st.columns(3)
+    frontier_min = f1.number_input(
+        "Orçamento Mínimo (R$)", 0.0, value=float(state["budget"]) * 0.25, step=500.0
+    )
+    frontier_max = f2.number_input(
+        "Orçamento Máximo (R$)", 0.0, value=float(state["budget"]) * 2, step=500.0
+    )
+    frontier_points = f3.number_input("Pontos", 2, 200, value=50)
+
+    if st.button("📈 TRAÇAR FRONTEIRA", use_container_width=True):
+        if not state["products"]:
+            st.error("Cadastre produtos primeiro.")
+        else:
+            with st.spinner("Resolvendo a faixa de orçamentos..."):
+                st.session_state.frontier_result = optimize_budget_frontier(
+                    state["products"],
+                    np.linspace(frontier_min, frontier_max, int(frontier_points)),
+                    state["risk_factor"],
+                )
+
+    frontier = st.session_state.frontier_result
+    if frontier and frontier["points"]:
+        df_front = pd.DataFrame(frontier["points"])
+        df_front = df_front[df_front["status"] == "Optimal"]
+
+        fig_front = go.Figure()
+        fig_front.add_trace(
+            go.Scatter(
+                x=df_front["budget"],
+                y=df_front["profit"],
+                mode="lines+markers",
+                name="Lucro Previsto",
+                line=dict(color="#2e7d32", width=3),
+                customdata=df_front["investment"],
+                hovertemplate="Orçamento: R$ %{x:,.2f}<br>Lucro: R$ %{y:,.2f}<br>Investido: R$ %{customdata:,.2f}",
+            )
+        )
+        fig_front.add_vline(x=state["budget"], line_dash="dash", line_color="#1565c0")
+        fig_front.update_layout(
+            title="Lucro Previsto vs Orçamento",
+            xaxis_title="Orçamento (R$)",
+            yaxis_title="Lucro Previsto (R$)",
+            hovermode="x unified",
+        )
+        st.plotly_chart(fig_front, use_container_width=True)
+    elif frontier and "message" in frontier:
+        st.error(frontier["message"])
+
+    # --- HISTÓRICO DE PLANOS (AUDITORIA) ---
+    with st.expander("🗂️ Histórico de Planos Calculados"):
+        audit = PLAN_CACHE.history(limit=50)
+        if audit:
+            df_audit = pd.DataFrame(
+                [
+                    {
+                        "Data": pd.Timestamp(e["created"], unit="s").strftime(
+                            "%d/%m/%Y %H:%M"
+                        ),
+                        "Orçamento": e["request"]["budget"],
+                        "Risco": e["request"]["risk_appetite"],
+                        "Status": e["status"],
+                        "Itens": e["items"],
+                        "Investimento": e["investment"],
+                        "Lucro Previsto": e["profit"],
+                        "Origem": "Cache" if e["cache_hit"] else "Calculado",
+                    }
+                    for e in audit
+                ]
+            )
+            st.dataframe(df_audit, use_container_width=True, hide_index=True)
+        else:
+            st.caption("Nenhum plano calculado ainda.")
 # =========================================================
 # TAB 2: GESTÃO DE PRODUTOS (CRUD)
 # =========================================================
@@ -338,7 +543,8 @@ with tab_produtos:
         col_act = st.columns([1, 5])
         if st.session_state.editing_product_id:
             if col_act[0].button("💾 Atualizar", type="primary"):
-                state["products"][edit_idx].update(
+                graph.update_product(
+                    edit_idx,
                     {
                         "name": name,
                         "supplier_cost": cost,
@@ -348,7 +554,7 @@ with tab_produtos:
                         "stock_on_hand": stock,
                         "target_sell_price": target_price,
                         "manual_sales_estimate": manual_est,
-                    }
+                    },
                 )
                 st.session_state.editing_product_id = None
                 st.rerun()
@@ -358,7 +564,7 @@ with tab_produtos:
         else:
             if col_act[0].button("Cadastrar", type="primary"):
                 if name and cost > 0:
-                    state["products"].append(
+                    graph.add_product(
                         {
                             "id": str(pd.Timestamp.now().timestamp()),
                             "name": name,
@@ -377,14 +583,59 @@ with tab_produtos:
                 else:
                     st.error("Preencha Nome e Custo corretamente.")
 
+    # --- IMPORTAÇÃO EM LOTE ---
+    with st.expander("📥 Importação em Lote de Históricos"):
+        st.caption(
+            "Envie um ZIP ou vários CSVs por produto (nome do arquivo = nome do "
+            "produto, colunas `mes,quantidade,valor`), ou um CSV único com a "
+            "coluna `produto`."
+        )
+        bulk_files = st.file_uploader(
+            "Arquivos de histórico",
+            type=["csv", "zip"],
+            accept_multiple_files=True,
+            key="bulk_history",
+        )
+        if st.button("📥 IMPORTAR HISTÓRICOS", disabled=not bulk_files):
+            histories, errors = {}, []
+            for f in bulk_files:
+                result = import_histories(f, name=f.name)
+                histories.update(result["histories"])
+                errors.extend(result["errors"])
+
+            applied = apply_histories(state["products"], histories)
+            graph.products_changed(applied["matched_ids"], ["history", STATS_FIELD])
+            # Gravação única para todo o lote
+            if applied["matched"]:
+                save_state(state)
+                st.success(
+                    f"{len(applied['matched'])} histórico(s) importado(s): "
+                    + ", ".join(applied["matched"])
+                )
+            if applied["unmatched"]:
+                st.warning(
+                    "Sem produto correspondente: " + ", ".join(applied["unmatched"])
+                )
+            for msg in errors:
+                st.warning(msg)
+
     # --- LISTAGEM ---
     st.divider()
     st.markdown("### Catálogo de Produtos")
-    abc_map = calculate_abc_class(state["products"])
+    abc_mode = st.radio(
+        "Base da Curva ABC",
+        ["manual", "optimized"],
+        format_func=lambda m: (
+            "Faturamento manual" if m == "manual" else "Faturamento otimizado (IA)"
+        ),
+        horizontal=True,
+    )
+    graph.set_abc_mode(abc_mode)
+    margins = graph.margins()
 
     for i, p in enumerate(state["products"]):
         with st.container(border=True):
-            cls = abc_map.get(p["id"], "C")
+            cls = graph.abc_class(p["id"])
             css_class = f"badge-{cls.lower()}"
 
             cols = st.columns([3, 2, 1, 1])
@@ -399,7 +650,7 @@ with tab_produtos:
             )
 
             # Coluna 2: Dados Financeiros & Upload
-            margem = p["target_sell_price"] - p["supplier_cost"] - p["operational_cost"]
+            margem = margins[p["id"]]
             cor_m = "green" if margem > 0 else "red"
             cols[1].markdown(f"Margem Manual: :{cor_m}[R$ {margem:.2f}]")
 
@@ -410,20 +661,22 @@ with tab_produtos:
                 label_visibility="collapsed",
             )
             if up:
-                try:
-                    df = pd.read_csv(up)
-                    hist = [
-                        {
-                            "period": str(r.get("mes", "")),
-                            "quantity": int(r["quantidade"]),
-                            "unit_price": float(r["valor"]),
-                        }
-                        for _, r in df.iterrows()
-                    ]
-                    state["products"][i]["history"] = hist
-                    st.toast("Histórico importado!")
-                except:
-                    pass
+                applied = st.session_state.applied_uploads.get(p["id"])
+                if applied is None or applied[0] != up.file_id:
+                    hist, errors = read_history_csv(up)
+                    if hist:
+                        graph.update_product(
+                            i,
+                            {
+                                "history": hist,
+                                STATS_FIELD: history_stats(hist, stats_decay(p)),
+                            },
+                        )
+                        st.toast("Histórico importado!")
+                    applied = (up.file_id, errors)
+                    st.session_state.applied_uploads[p["id"]] = applied
+                for msg in applied[1]:
+                    cols[1].caption(f"⚠️ {msg}")
 
             # Coluna 3 e 4: Ações
             if cols[2].button("✏️", key=f"ed_{p['id']}"):
@@ -431,7 +684,7 @@ with tab_produtos:
                 st.rerun()
 
             if cols[3].button("🗑️", key=f"dl_{p['id']}"):
-                state["products"].pop(i)
+                graph.remove_product(i)
                 st.rerun()
 
 # =========================================================
@@ -441,7 +694,7 @@ with tab_pricing:
     st.title("🧠 Simulador de Elasticidade de Preço")
     st.markdown("Veja como a IA enxerga a sensibilidade de preço dos seus clientes.")
 
-    prods_with_hist = [p for p in state["products"] if len(p["history"]) >= 3]
+    prods_with_hist = graph.products_with_history(3)
 
     if not prods_with_hist:
         st.info(
@@ -453,8 +706,16 @@ with tab_pricing:
         )
         sel_prod = next(p for p in prods_with_hist if p["name"] == sel_name)
 
-        # Análise de IA
-        res = analyze_price_elasticity(sel_prod["history"], sel_prod["supplier_cost"])
+        # Análise de IA (reaproveita o cache compartilhado com o solver)
+        res = graph.elasticity(sel_prod)
+        cache_stats = ELASTICITY_CACHE.stats()
+        graph_stats = graph.stats()
+        st.caption(
+            f"Cache de elasticidade: {cache_stats['size']} SKUs | "
+            f"{cache_stats['hits']} acertos / {cache_stats['misses']} recálculos | "
+            f"Resultados derivados: {graph_stats['hits']} reaproveitados / "
+            f"{graph_stats['recomputes']} recalculados"
+        )
 
         if res["valid"]:
             col_a, col_b, col_c = st.columns(3)
@@ -472,8 +733,13 @@ with tab_pricing:
                 help="Se < -1, o cliente é muito sensível a preço.",
             )
 
-            # Gráfico Plotly
-            chart = res["chart_data"]
+            # Gráfico Plotly (curva gerada só aqui, na resolução escolhida)
+            points = st.select_slider(
+                "Resolução da curva (pontos)",
+                options=[25, 50, 100, 200, 500],
+                value=CHART_POINTS,
+            )
+            chart = graph.elasticity_chart(sel_prod, points)
             fig = go.Figure()
 
             # Linha de Lucro
@@ -1,27 +1,253 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
-from typing import List, Tuple, Optional, Dict, Any
-from src.models import SaleRecord
+from typing import List, Tuple, Optional, Dict, Any, Sequence, Union
+from src.models import HistoryStats, SaleRecord, Product
+from src.catalog import Catalog
+from src.history_store import LazyHistory, history_columns, history_periods
+from src.history_stats import STATS_FIELD, regression_from_stats, stored_stats
+
+REASON_FEW_MONTHS = "Dados insuficientes (mínimo 3 meses de histórico)."
+REASON_NO_VARIATION = "Variação de preço insuficiente no histórico para análise."
+REASON_POSITIVE_ELASTICITY = "Comportamento anômalo detectado (Elasticidade Positiva). O modelo sugere usar a média simples."
+
+# Pontos da curva preço x lucro do Laboratório de Preço
+CHART_POINTS = 50
+
+# Meses do campo `period` do histórico (abreviações do CSV, em português)
+MONTHS = (
+    "jan",
+    "fev",
+    "mar",
+    "abr",
+    "mai",
+    "jun",
+    "jul",
+    "ago",
+    "set",
+    "out",
+    "nov",
+    "dez",
+)
+_MONTH_ALIASES = {
+    **{name: i for i, name in enumerate(MONTHS)},
+    # Abreviações em inglês que diferem das em português
+    "feb": 1,
+    "apr": 3,
+    "may": 4,
+    "aug": 7,
+    "sep": 8,
+    "oct": 9,
+    "dec": 11,
+}
+# Penalidade (ridge) dos efeitos de mês do modelo sazonal: um mês visto
+# poucas vezes fica perto de zero em vez de absorver todo o ruído
+SEASONAL_RIDGE = 1.0
+
+
+class ElasticityCache:
+    """
+    Cache LRU de resultados de elasticidade, endereçado pelo conteúdo
+    (hash de preços/quantidades do histórico + custo do fornecedor).
+
+    Os resultados guardados são compartilhados: quem lê não deve alterá-los.
+    Pode ser usado ao mesmo tempo pela interface e por um job em segundo
+    plano (acesso protegido por lock).
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Cache compartilhado pelo solver e pelo Laboratório de Preço
+ELASTICITY_CACHE = ElasticityCache()
+
+
+def elasticity_cache_key(history: List[SaleRecord], cost: float) -> str:
+    """Hash estável das entradas que afetam o ajuste (preço, quantidade, custo)."""
+    # Mesmo hash para o histórico em lista ou em colunas (LazyHistory)
+    prices, quantities = history_columns(history)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.float64(cost).tobytes())
+    digest.update(np.ascontiguousarray(prices, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(quantities, dtype=np.int64).tobytes())
+    return digest.hexdigest()
 
 
 def analyze_price_elasticity(
+    history: List[SaleRecord],
+    current_cost: float,
+    cache: Optional[ElasticityCache] = ELASTICITY_CACHE,
+    lean: bool = False,
+    stats: Optional[HistoryStats] = None,
+) -> Dict[str, Any]:
+    """
+    Ajuste de elasticidade de um produto. Com `lean`, calcula só o que o
+    solver usa (preço ótimo, demanda, elasticidade e intercepto), sem o
+    modelo do sklearn nem os dados de gráfico; a curva pode ser gerada
+    depois por `price_profit_curve`.
+
+    Com `stats` (as somas guardadas no produto, ver src.history_stats)
+    ainda válidas para o histórico, o ajuste sai delas em O(1), sem ler o
+    histórico nem passar pelo cache.
+    """
+    stats = stored_stats(history, stats)
+    if stats is not None:
+        result = _fit_from_stats(stats, current_cost)
+        if not lean and result["valid"]:
+            result["chart_data"] = _profit_curve(
+                result, stats["price_min"], stats["price_max"], current_cost
+            )
+        return result
+
+    fit = _fit_price_elasticity_lean if lean else _fit_price_elasticity
+    if cache is None:
+        return fit(history, current_cost)
+
+    key = elasticity_cache_key(history, current_cost)
+    result = cache.get(key)
+
+    # Entradas enxutas (deste modo ou do caminho em lote) não têm modelo nem gráfico
+    if result is None or (not lean and result["valid"] and "chart_data" not in result):
+        result = fit(history, current_cost)
+        cache.put(key, result)
+    return result
+
+
+def _fit_from_stats(stats: HistoryStats, current_cost: float) -> Dict[str, Any]:
+    """Mesmas regras de `_fit_price_elasticity_lean`, a partir das somas."""
+    if stats["count"] < 3:
+        return {"valid": False, "reason": REASON_FEW_MONTHS}
+    if stats["price_max"] <= stats["price_min"]:
+        return {"valid": False, "reason": REASON_NO_VARIATION}
+
+    elasticity, intercept = regression_from_stats(stats)
+    if elasticity >= 0:
+        return {"valid": False, "reason": REASON_POSITIVE_ELASTICITY}
+
+    optimal_price = max((current_cost - intercept / elasticity) / 2, current_cost * 1.1)
+    optimal_qty = max(0, int(elasticity * optimal_price + intercept))
+    return {
+        "valid": True,
+        "optimal_price": float(optimal_price),
+        "optimal_qty": optimal_qty,
+        "elasticity": float(elasticity),
+        "intercept": float(intercept),
+    }
+
+
+def _fit_price_elasticity_lean(
+    history: List[SaleRecord], current_cost: float
+) -> Dict[str, Any]:
+    """Mesmas regras de `_fit_price_elasticity`, em forma fechada e sem DataFrame."""
+    if len(history) < 3:
+        return {"valid": False, "reason": REASON_FEW_MONTHS}
+
+    prices, quantities = history_columns(history)
+    if prices.max() <= prices.min():
+        return {"valid": False, "reason": REASON_NO_VARIATION}
+
+    dx = prices - prices.mean()
+    elasticity = float(dx @ (quantities - quantities.mean()) / (dx @ dx))
+    intercept = float(quantities.mean() - elasticity * prices.mean())
+    if elasticity >= 0:
+        return {"valid": False, "reason": REASON_POSITIVE_ELASTICITY}
+
+    optimal_price = max((current_cost - intercept / elasticity) / 2, current_cost * 1.1)
+    optimal_qty = max(0, int(elasticity * optimal_price + intercept))
+    return {
+        "valid": True,
+        "optimal_price": float(optimal_price),
+        "optimal_qty": optimal_qty,
+        "elasticity": elasticity,
+        "intercept": intercept,
+    }
+
+
+def price_profit_curve(
+    result: Dict[str, Any],
+    history: List[SaleRecord],
+    current_cost: float,
+    points: int = CHART_POINTS,
+) -> Dict[str, np.ndarray]:
+    """
+    Dados do gráfico preço x lucro de um ajuste válido (enxuto ou completo),
+    gerados sob demanda com `points` preços entre 80% do menor e 150% do
+    maior preço do histórico.
+    """
+    prices, _ = history_columns(history)
+    return _profit_curve(result, prices.min(), prices.max(), current_cost, points)
+
+
+def _profit_curve(
+    result: Dict[str, Any],
+    price_min: float,
+    price_max: float,
+    current_cost: float,
+    points: int = CHART_POINTS,
+) -> Dict[str, np.ndarray]:
+    price_range = np.linspace(price_min * 0.8, price_max * 1.5, points)
+    predicted_qty_range = result["elasticity"] * price_range + result["intercept"]
+    return {
+        "prices": price_range,
+        "quantities": predicted_qty_range,
+        "profits": (price_range - current_cost) * predicted_qty_range,
+    }
+
+
+def _fit_price_elasticity(
     history: List[SaleRecord], current_cost: float
 ) -> Dict[str, Any]:
     # 1. Validações de Segurança
     if len(history) < 3:
-        return {
-            "valid": False,
-            "reason": "Dados insuficientes (mínimo 3 meses de histórico).",
-        }
+        return {"valid": False, "reason": REASON_FEW_MONTHS}
 
-    df = pd.DataFrame(history)
+    df = pd.DataFrame(list(history))
 
     if df["unit_price"].nunique() < 2:
-        return {
-            "valid": False,
-            "reason": "Variação de preço insuficiente no histórico para análise.",
-        }
+        return {"valid": False, "reason": REASON_NO_VARIATION}
 
     # 2. Treinamento do Modelo (Machine Learning)
     X = df[["unit_price"]].values
@@ -40,10 +266,7 @@ def analyze_price_elasticity(
     # 3. Detecção de Anomalias
     # Elasticidade >= 0 significa que aumentar o preço aumentou a venda (raro no varejo, indica ruído nos dados)
     if elasticity >= 0:
-        return {
-            "valid": False,
-            "reason": "Comportamento anômalo detectado (Elasticidade Positiva). O modelo sugere usar a média simples.",
-        }
+        return {"valid": False, "reason": REASON_POSITIVE_ELASTICITY}
 
     # 4. Otimização Matemática (Cálculo Numérico)
     # Fórmula do Preço Ótimo derivada de: d(Lucro)/dP = 0
@@ -79,6 +302,7 @@ def analyze_price_elasticity(
         "optimal_price": float(optimal_price),
         "optimal_qty": optimal_qty,
         "elasticity": elasticity,
+        "intercept": float(intercept),
         "chart_data": {
             "prices": price_range.flatten(),
             "quantities": predicted_qty_range,
@@ -87,10 +311,329 @@ def analyze_price_elasticity(
     }
 
 
+def _pack_histories(
+    histories: List[List[SaleRecord]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Empacota históricos de tamanhos variados em vetores contíguos (ragged):
+    preços e quantidades concatenados + índice do produto dono de cada linha.
+    Históricos em colunas (LazyHistory) são lidos direto do snapshot.
+    """
+    lengths = np.fromiter((len(h) for h in histories), dtype=np.int64)
+    total = int(lengths.sum())
+    owner = np.repeat(np.arange(len(histories)), lengths)
+
+    if any(isinstance(h, LazyHistory) for h in histories):
+        columns = [history_columns(h) for h in histories]
+        prices = np.concatenate([c[0] for c in columns] + [np.zeros(0)])
+        quantities = np.concatenate([c[1] for c in columns] + [np.zeros(0)])
+        return prices.astype(np.float64), quantities.astype(np.float64), owner, lengths
+
+    prices = np.fromiter(
+        (r["unit_price"] for h in histories for r in h),
+        dtype=np.float64,
+        count=total,
+    )
+    quantities = np.fromiter(
+        (r["quantity"] for h in histories for r in h),
+        dtype=np.float64,
+        count=total,
+    )
+    return prices, quantities, owner, lengths
+
+
+def _costs_and_histories(
+    products: Union[List[Product], Catalog],
+) -> Tuple[np.ndarray, Sequence[List[SaleRecord]]]:
+    """Custo do fornecedor e histórico de cada produto (colunas do Catalog sem cópia)."""
+    if isinstance(products, Catalog):
+        return products["supplier_cost"], products.histories
+    costs = np.fromiter(
+        (p["supplier_cost"] for p in products), dtype=np.float64, count=len(products)
+    )
+    return costs, [p["history"] for p in products]
+
+
+def _fit_elasticity_batch(
+    costs: np.ndarray, histories: Sequence[List[SaleRecord]]
+) -> Dict[str, np.ndarray]:
+    """Resolve todas as regressões simples (quantidade ~ preço) de uma vez."""
+    n_products = len(histories)
+    prices, quantities, owner, lengths = _pack_histories(list(histories))
+    counts = np.maximum(lengths, 1)
+
+    # 1. Médias por produto
+    mean_x = np.bincount(owner, weights=prices, minlength=n_products) / counts
+    mean_y = np.bincount(owner, weights=quantities, minlength=n_products) / counts
+
+    # 2. Variação de preço (equivale a nunique >= 2)
+    price_min = np.full(n_products, np.inf)
+    price_max = np.full(n_products, -np.inf)
+    np.minimum.at(price_min, owner, prices)
+    np.maximum.at(price_max, owner, prices)
+
+    # 3. Mínimos quadrados centrados em forma fechada
+    dx = prices - mean_x[owner]
+    dy = quantities - mean_y[owner]
+    sxx = np.bincount(owner, weights=dx * dx, minlength=n_products)
+    sxy = np.bincount(owner, weights=dx * dy, minlength=n_products)
+
+    enough_data = lengths >= 3
+    has_variation = enough_data & (price_max > price_min)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        elasticity = np.where(has_variation, sxy / sxx, 0.0)
+    intercept = mean_y - elasticity * mean_x
+    valid = has_variation & (elasticity < 0)
+
+    # 4. Preço ótimo e demanda prevista (mesma fórmula da versão unitária)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        optimal_price = np.where(valid, (costs - intercept / elasticity) / 2, 0.0)
+    optimal_price = np.maximum(optimal_price, costs * 1.1)
+    optimal_qty = np.maximum(0, np.trunc(elasticity * optimal_price + intercept))
+
+    return {
+        "enough_data": enough_data,
+        "has_variation": has_variation,
+        "valid": valid,
+        "elasticity": elasticity,
+        "intercept": intercept,
+        "optimal_price": optimal_price,
+        "optimal_qty": optimal_qty.astype(np.int64),
+    }
+
+
+def period_month(period: Any) -> int:
+    """
+    Mês (0 = janeiro) de um período do histórico: "jan", "Fev/24",
+    "2024-03", "03/2024" ou 3. Devolve -1 quando o mês não é reconhecido.
+    """
+    if isinstance(period, (int, np.integer)):
+        return int(period) - 1 if 1 <= period <= 12 else -1
+    for token in re.split(r"[^0-9a-zç]+", str(period).strip().lower()):
+        if token[:3] in _MONTH_ALIASES:
+            return _MONTH_ALIASES[token[:3]]
+        if token.isdigit() and len(token) <= 2 and 1 <= int(token) <= 12:
+            return int(token) - 1
+    return -1
+
+
+def _pack_months(histories: List[List[SaleRecord]]) -> np.ndarray:
+    """Mês de cada linha, na mesma ordem de `_pack_histories` (-1 = desconhecido)."""
+    # Poucos períodos distintos: a conversão roda uma vez por valor
+    if any(isinstance(h, LazyHistory) for h in histories):
+        periods = np.concatenate(
+            [history_periods(h) for h in histories] + [np.zeros(0, dtype=np.str_)]
+        )
+        unique, inverse = np.unique(periods, return_inverse=True)
+        months = np.fromiter((period_month(u) for u in unique), dtype=np.int64)
+        return months[inverse.reshape(-1)] if len(unique) else np.zeros(0, np.int64)
+
+    lookup: Dict[Any, int] = {}
+    return np.fromiter(
+        (
+            (
+                lookup[r["period"]]
+                if r["period"] in lookup
+                else lookup.setdefault(r["period"], period_month(r["period"]))
+            )
+            for h in histories
+            for r in h
+        ),
+        dtype=np.int64,
+        count=sum(len(h) for h in histories),
+    )
+
+
+def pack_history_columns(
+    products: Union[List[Product], Catalog],
+) -> Dict[str, np.ndarray]:
+    """
+    Históricos de todo o catálogo em colunas concatenadas: preço, quantidade
+    e mês (-1 = desconhecido) de cada registro, e o tamanho de cada histórico.
+    """
+    _, histories = _costs_and_histories(products)
+    histories = list(histories)
+    prices, quantities, _, lengths = _pack_histories(histories)
+    return {
+        "prices": prices,
+        "quantities": quantities,
+        "months": _pack_months(histories),
+        "lengths": lengths,
+    }
+
+
+def _fit_seasonal_batch(
+    costs: np.ndarray,
+    histories: Sequence[List[SaleRecord]],
+    month: Optional[int] = None,
+    ridge: float = SEASONAL_RIDGE,
+) -> Dict[str, np.ndarray]:
+    """
+    Resolve de uma vez as regressões `quantidade ~ preço + efeito do mês` de
+    todos os produtos. Os efeitos de mês formam um bloco diagonal e são
+    eliminados em forma fechada (complemento de Schur); sobra um sistema
+    2x2 por produto para intercepto e elasticidade.
+
+    A previsão é para o mês `month` (0 = janeiro) ou, sem ele, para o mês
+    seguinte ao último registro de cada produto.
+    """
+    n_products = len(histories)
+    prices, quantities, owner, lengths = _pack_histories(list(histories))
+    months = _pack_months(list(histories))
+    counts = np.maximum(lengths, 1)
+
+    # 1. Preços centrados por produto (melhor condicionamento)
+    mean_x = np.bincount(owner, weights=prices, minlength=n_products) / counts
+    price_min = np.full(n_products, np.inf)
+    price_max = np.full(n_products, -np.inf)
+    np.minimum.at(price_min, owner, prices)
+    np.maximum.at(price_max, owner, prices)
+    dx = prices - mean_x[owner]
+
+    # 2. Somas por produto e por (produto, mês)
+    s_y = np.bincount(owner, weights=quantities, minlength=n_products)
+    s_xx = np.bincount(owner, weights=dx * dx, minlength=n_products)
+    s_xy = np.bincount(owner, weights=dx * quantities, minlength=n_products)
+    known = months >= 0
+    cell = owner[known] * 12 + months[known]
+    shape = (n_products, 12)
+    n_m = np.bincount(cell, minlength=n_products * 12).reshape(shape)
+    x_m = np.bincount(cell, weights=dx[known], minlength=n_products * 12).reshape(shape)
+    y_m = np.bincount(cell, weights=quantities[known], minlength=n_products * 12)
+    y_m = y_m.reshape(shape)
+
+    # 3. Equações normais reduzidas: [a11 a12; a12 a22] [alfa; beta] = [r1; r2]
+    d = n_m + ridge
+    a11 = lengths - (n_m * n_m / d).sum(axis=1)
+    a12 = -(n_m * x_m / d).sum(axis=1)
+    a22 = s_xx - (x_m * x_m / d).sum(axis=1)
+    r1 = s_y - (n_m * y_m / d).sum(axis=1)
+    r2 = s_xy - (x_m * y_m / d).sum(axis=1)
+    det = a11 * a22 - a12 * a12
+
+    enough_data = lengths >= 3
+    has_variation = enough_data & (price_max > price_min) & (det > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = np.where(has_variation, (a22 * r1 - a12 * r2) / det, 0.0)
+        elasticity = np.where(has_variation, (a11 * r2 - a12 * r1) / det, 0.0)
+    effects = (y_m - n_m * alpha[:, None] - x_m * elasticity[:, None]) / d
+    intercept = alpha - elasticity * mean_x
+    valid = has_variation & (elasticity < 0)
+
+    # 4. Mês previsto e seu efeito
+    if month is None:
+        last = np.full(n_products, -1)
+        ends = np.cumsum(lengths) - 1
+        has_rows = lengths > 0
+        last[has_rows] = months[ends[has_rows]]
+        target = np.where(last >= 0, (last + 1) % 12, -1)
+    else:
+        target = np.full(n_products, month)
+    effect = np.where(
+        target >= 0, effects[np.arange(n_products), np.maximum(target, 0)], 0.0
+    )
+    base = intercept + effect
+
+    # 5. Preço ótimo e demanda prevista (mesma fórmula do modelo só de preço)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        optimal_price = np.where(valid, (costs - base / elasticity) / 2, 0.0)
+    optimal_price = np.maximum(optimal_price, costs * 1.1)
+    optimal_qty = np.maximum(0, np.trunc(elasticity * optimal_price + base))
+
+    return {
+        "enough_data": enough_data,
+        "has_variation": has_variation,
+        "valid": valid,
+        "elasticity": elasticity,
+        "intercept": intercept,
+        "month": target,
+        "seasonal_effect": effect,
+        "optimal_price": optimal_price,
+        "optimal_qty": optimal_qty.astype(np.int64),
+    }
+
+
+def history_price_range(
+    products: Union[List[Product], Catalog],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Menor e maior preço do histórico de cada produto (NaN sem histórico)."""
+    _, histories = _costs_and_histories(products)
+    n_products = len(histories)
+    prices, _, owner, lengths = _pack_histories(list(histories))
+    price_min = np.full(n_products, np.inf)
+    price_max = np.full(n_products, -np.inf)
+    np.minimum.at(price_min, owner, prices)
+    np.maximum.at(price_max, owner, prices)
+    empty = lengths == 0
+    price_min[empty] = np.nan
+    price_max[empty] = np.nan
+    return price_min, price_max
+
+
+def analyze_price_elasticity_batch(
+    products: Union[List[Product], Catalog],
+    cache: Optional[ElasticityCache] = ELASTICITY_CACHE,
+) -> List[Dict[str, Any]]:
+    """
+    Versão vetorizada de `analyze_price_elasticity` para o catálogo inteiro.
+
+    Retorna um dicionário por produto, na mesma ordem, com as mesmas regras
+    de validade da versão unitária (sem o objeto do modelo e sem os dados
+    de gráfico). Produtos já presentes no cache não são reajustados, e os
+    que guardam somas válidas ("history_stats") saem delas em O(1).
+    """
+    if not products:
+        return []
+
+    costs, histories = _costs_and_histories(products)
+    extras = products.extras if isinstance(products, Catalog) else products
+    results: List[Optional[Dict[str, Any]]] = [None] * len(products)
+    keys: List[Optional[str]] = [None] * len(products)
+    pending = []
+    for i, history in enumerate(histories):
+        stats = stored_stats(history, extras[i].get(STATS_FIELD))
+        if stats is not None:
+            results[i] = _fit_from_stats(stats, costs[i])
+            continue
+        if cache is not None:
+            keys[i] = elasticity_cache_key(history, costs[i])
+            results[i] = cache.get(keys[i])
+        if results[i] is None:
+            pending.append(i)
+
+    if pending:
+        fit = _fit_elasticity_batch(costs[pending], [histories[i] for i in pending])
+        for j, i in enumerate(pending):
+            if not fit["enough_data"][j]:
+                res = {"valid": False, "reason": REASON_FEW_MONTHS}
+            elif not fit["has_variation"][j]:
+                res = {"valid": False, "reason": REASON_NO_VARIATION}
+            elif not fit["valid"][j]:
+                res = {"valid": False, "reason": REASON_POSITIVE_ELASTICITY}
+            else:
+                res = {
+                    "valid": True,
+                    "optimal_price": float(fit["optimal_price"][j]),
+                    "optimal_qty": int(fit["optimal_qty"][j]),
+                    "elasticity": float(fit["elasticity"][j]),
+                    "intercept": float(fit["intercept"][j]),
+                }
+            results[i] = res
+            if cache is not None:
+                cache.put(keys[i], res)
+
+    return results
+
+
 def calculate_optimal_price_and_demand(
-    history: List[SaleRecord], cost_price: float
+    history: List[SaleRecord],
+    cost_price: float,
+    cache: Optional[ElasticityCache] = ELASTICITY_CACHE,
+    stats: Optional[HistoryStats] = None,
 ) -> Tuple[Optional[float], int]:
-    result = analyze_price_elasticity(history, cost_price)
+    result = analyze_price_elasticity(
+        history, cost_price, cache=cache, lean=True, stats=stats
+    )
 
     if result["valid"]:
         return result["optimal_price"], result["optimal_qty"]
@@ -98,5 +641,231 @@ def calculate_optimal_price_and_demand(
     # Fallback: Se a IA falhar, retorna a média histórica
     if not history:
         return None, 0
-    df = pd.DataFrame(history)
-    return float(df["unit_price"].mean()), int(df["quantity"].mean())
+    prices, quantities = history_columns(history)
+    return float(prices.mean()), int(quantities.mean())
+
+
+def _with_mean_fallback(
+    products: Union[List[Product], Catalog], results: List[Dict[str, Any]]
+) -> List[Tuple[Optional[float], int]]:
+    """(preço ótimo, demanda) dos ajustes válidos; média histórica nos demais."""
+    histories = products.histories if isinstance(products, Catalog) else None
+    output: List[Tuple[Optional[float], int]] = []
+    for i, res in enumerate(results):
+        if res["valid"]:
+            output.append((res["optimal_price"], res["optimal_qty"]))
+            continue
+
+        # Fallback: Se a IA falhar, retorna a média histórica
+        history = histories[i] if histories is not None else products[i]["history"]
+        if not history:
+            output.append((None, 0))
+            continue
+        prices, quantities = history_columns(history)
+        output.append((float(prices.mean()), int(quantities.mean())))
+    return output
+
+
+def calculate_optimal_price_and_demand_batch(
+    products: Union[List[Product], Catalog],
+    cache: Optional[ElasticityCache] = ELASTICITY_CACHE,
+) -> List[Tuple[Optional[float], int]]:
+    """
+    Equivalente vetorizado de `calculate_optimal_price_and_demand` para uma
+    lista de produtos (inclui o fallback pela média histórica).
+    """
+    return _with_mean_fallback(
+        products, analyze_price_elasticity_batch(products, cache=cache)
+    )
+
+
+def forecast_seasonal_demand_batch(
+    products: Union[List[Product], Catalog],
+    month: Optional[Union[int, str]] = None,
+    ridge: float = SEASONAL_RIDGE,
+) -> List[Dict[str, Any]]:
+    """
+    Previsão sazonal (preço + efeito do mês do ano) do catálogo inteiro,
+    com as mesmas regras de validade de `analyze_price_elasticity_batch`.
+    `month` é o mês previsto ("jan", 1 = janeiro, ...); sem ele, cada
+    produto é previsto para o mês seguinte ao seu último registro.
+    """
+    if not products:
+        return []
+    target = None
+    if month is not None:
+        target = period_month(month)
+        if target < 0:
+            raise ValueError(f"Mês não reconhecido: {month!r}")
+
+    costs, histories = _costs_and_histories(products)
+    fit = _fit_seasonal_batch(costs, histories, target, ridge)
+    results = []
+    for j in range(len(histories)):
+        if not fit["enough_data"][j]:
+            results.append({"valid": False, "reason": REASON_FEW_MONTHS})
+        elif not fit["has_variation"][j]:
+            results.append({"valid": False, "reason": REASON_NO_VARIATION})
+        elif not fit["valid"][j]:
+            results.append({"valid": False, "reason": REASON_POSITIVE_ELASTICITY})
+        else:
+            results.append(
+                {
+                    "valid": True,
+                    "optimal_price": float(fit["optimal_price"][j]),
+                    "optimal_qty": int(fit["optimal_qty"][j]),
+                    "elasticity": float(fit["elasticity"][j]),
+                    "intercept": float(fit["intercept"][j]),
+                    "month": int(fit["month"][j]),
+                    "seasonal_effect": float(fit["seasonal_effect"][j]),
+                }
+            )
+    return results
+
+
+def calculate_seasonal_price_and_demand_batch(
+    products: Union[List[Product], Catalog],
+    month: Optional[Union[int, str]] = None,
+    ridge: float = SEASONAL_RIDGE,
+) -> List[Tuple[Optional[float], int]]:
+    """Como `calculate_optimal_price_and_demand_batch`, com o modelo sazonal."""
+    return _with_mean_fallback(
+        products, forecast_seasonal_demand_batch(products, month, ridge)
+    )
+
+
+ABC_REVENUE_MODES = ("manual", "optimized")
+# Faixas do faturamento acumulado: A até 80%, B até 95%, C o restante
+ABC_THRESHOLDS = (0.80, 0.95)
+
+
+def potential_revenue(
+    products: Union[List[Product], Catalog],
+    mode: str = "manual",
+    cache: Optional[ElasticityCache] = ELASTICITY_CACHE,
+) -> np.ndarray:
+    """
+    Faturamento potencial por produto: preço alvo x estimativa manual, ou
+    (modo "optimized") preço ótimo x demanda prevista pela IA para quem
+    tem elasticidade válida, mantendo o manual para os demais.
+    """
+    if mode not in ABC_REVENUE_MODES:
+        raise ValueError(f"Modo de faturamento desconhecido: {mode!r}")
+    n = len(products)
+    if isinstance(products, Catalog):
+        revenue = products["target_sell_price"] * products["manual_sales_estimate"]
+    else:
+        revenue = np.fromiter(
+            (p["target_sell_price"] * p["manual_sales_estimate"] for p in products),
+            dtype=np.float64,
+            count=n,
+        )
+    if mode == "optimized" and n:
+        for i, res in enumerate(analyze_price_elasticity_batch(products, cache)):
+            if res["valid"]:
+                revenue[i] = res["optimal_price"] * res["optimal_qty"]
+    return revenue
+
+
+class ABCIndex:
+    """
+    Curva ABC mantida incrementalmente.
+
+    Os produtos ficam ordenados por faturamento decrescente (empate: ordem
+    de cadastro) em vetores NumPy. Incluir, editar ou remover um produto
+    move só aquele item (busca binária + inserção), sem reordenar o
+    catálogo; as classes são recalculadas por soma acumulada vetorizada na
+    primeira consulta após a mudança.
+    """
+
+    def __init__(self, products: Sequence[Product] = (), mode: str = "manual"):
+        self.mode = mode
+        self.rebuild(products)
+
+    def rebuild(self, products: Sequence[Product]) -> None:
+        products = list(products)
+        revenue = potential_revenue(products, self.mode)
+        seq = np.arange(len(products), dtype=np.int64)
+        order = np.lexsort((seq, -revenue))
+
+        self._next_seq = len(products)
+        self._entry = {
+            p["id"]: (float(revenue[i]), int(i)) for i, p in enumerate(products)
+        }
+        self._neg_rev = -revenue[order]
+        self._seq = seq[order]
+        self._ids = np.array([products[i]["id"] for i in order], dtype=object)
+        self._classes: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._entry)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._entry
+
+    def _position(self, neg_rev: float, seq: int) -> int:
+        """Posição de (faturamento, cadastro) na ordem mantida."""
+        lo = int(np.searchsorted(self._neg_rev, neg_rev, side="left"))
+        hi = int(np.searchsorted(self._neg_rev, neg_rev, side="right"))
+        return lo + int(np.searchsorted(self._seq[lo:hi], seq))
+
+    def remove(self, product_id: str) -> None:
+        entry = self._entry.pop(product_id, None)
+        if entry is None:
+            return
+        pos = self._position(-entry[0], entry[1])
+        self._neg_rev = np.delete(self._neg_rev, pos)
+        self._seq = np.delete(self._seq, pos)
+        self._ids = np.delete(self._ids, pos)
+        self._classes = None
+
+    def upsert(self, product: Product) -> None:
+        """Inclui um produto novo (no fim do cadastro) ou reposiciona um editado."""
+        revenue = float(potential_revenue([product], self.mode)[0])
+        old = self._entry.get(product["id"])
+        if old is not None and old[0] == revenue:
+            return
+        if old is not None:
+            seq = old[1]
+            self.remove(product["id"])
+        else:
+            seq = self._next_seq
+            self._next_seq += 1
+
+        pos = self._position(-revenue, seq)
+        self._entry[product["id"]] = (revenue, seq)
+        self._neg_rev = np.insert(self._neg_rev, pos, -revenue)
+        self._seq = np.insert(self._seq, pos, seq)
+        self._ids = np.insert(self._ids, pos, product["id"])
+        self._classes = None
+
+    def _ranked_classes(self) -> np.ndarray:
+        if self._classes is None:
+            revenue = -self._neg_rev
+            accumulated = np.cumsum(revenue)
+            total = accumulated[-1] if accumulated.size else 0.0
+            perc = accumulated / total if total > 0 else np.zeros_like(accumulated)
+            self._classes = np.where(
+                perc <= ABC_THRESHOLDS[0],
+                "A",
+                np.where(perc <= ABC_THRESHOLDS[1], "B", "C"),
+            )
+        return self._classes
+
+    def get(self, product_id: str, default: str = "C") -> str:
+        entry = self._entry.get(product_id)
+        if entry is None:
+            return default
+        return str(self._ranked_classes()[self._position(-entry[0], entry[1])])
+
+    def as_dict(self) -> Dict[str, str]:
+        return dict(zip(self._ids.tolist(), self._ranked_classes().tolist()))
+
+
+def calculate_abc_class(
+    products: List[Product], mode: str = "manual"
+) -> Dict[str, str]:
+    """Classifica produtos em A (80%), B (15%) e C (5%) do faturamento potencial"""
+    if not products:
+        return {}
+    return ABCIndex(products, mode).as_dict()
@@ -0,0 +1,612 @@
+"""
+Benchmarks de desempenho do ProfitMax.
+
+Uso:
+    python -m src.benchmark [suite] [--sizes 10 1000 ...] [--output arq.json]
+                                    [--compare baseline.json]
+    python -m src.benchmark solvers
+"""
+
+import argparse
+import contextlib
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import List, Dict, Any, Callable, Optional, Sequence
+import numpy as np
+from src import persistence
+from src.models import AppState, Product, SaleRecord
+from src.analytics import (
+    analyze_price_elasticity,
+    analyze_price_elasticity_batch,
+    forecast_seasonal_demand_batch,
+    calculate_abc_class,
+    ABCIndex,
+    ELASTICITY_CACHE,
+)
+from pulp import LpProblem, LpMaximize, LpVariable, lpSum
+from src.matrix_model import build_matrix_model, write_mps
+from src.solver import (
+    build_purchase_model,
+    solve_purchase_model,
+    optimize_purchasing_plan,
+    optimize_budget_frontier,
+    optimize_joint_pricing_plan,
+)
+
+PERIODS = ["jan", "fev", "mar", "abr", "mai", "jun"]
+ALL_PERIODS = PERIODS + ["jul", "ago", "set", "out", "nov", "dez"]
+
+SUITE_SIZES = (10, 100, 1_000, 10_000, 100_000)
+# O ajuste unitário (sklearn) é medido numa amostra; o lote cobre o catálogo todo
+ELASTICITY_SAMPLE = 200
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+TEMPLATE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate_synthetic_catalog(n_products: int, seed: int = 42) -> List[Product]:
+    """Catálogo sintético reprodutível com histórico de demanda linear + ruído."""
+    rng = random.Random(seed)
+    products: List[Product] = []
+
+    for i in range(n_products):
+        cost = round(rng.uniform(2.0, 200.0), 2)
+        base_price = cost * rng.uniform(1.3, 3.0)
+        slope = rng.uniform(0.8, 3.0) * 100 / base_price
+
+        history = []
+        if rng.random() < 0.7:
+            for period in PERIODS[: rng.randint(3, len(PERIODS))]:
+                price = round(base_price * rng.uniform(0.8, 1.2), 2)
+                qty = max(0, int(100 + slope * (base_price - price) + rng.gauss(0, 3)))
+                history.append({"period": period, "quantity": qty, "unit_price": price})
+
+        products.append(
+            {
+                "id": f"sku-{i}",
+                "name": f"Produto {i}",
+                "supplier_cost": cost,
+                "operational_cost": round(rng.uniform(0.0, cost * 0.1), 2),
+                "stock_on_hand": rng.randint(0, 20),
+                "min_order_qty": rng.randint(0, 5),
+                "target_sell_price": round(base_price, 2),
+                "manual_sales_estimate": rng.randint(0, 150),
+                "history": history,
+            }
+        )
+    return products
+
+
+def load_history_templates(directory: str = TEMPLATE_DIR) -> List[List[SaleRecord]]:
+    """Históricos de exemplo (blusa.csv, tenis.csv, ...) usados como modelo."""
+    templates = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+        with open(path, "r", encoding="utf-8") as f:
+            header = f.readline().strip().split(",")
+            if header != ["mes", "quantidade", "valor"]:
+                continue
+            history = []
+            for line in f:
+                if line.strip():
+                    mes, qty, price = line.strip().split(",")
+                    history.append(
+                        {
+                            "period": mes,
+                            "quantity": int(qty),
+                            "unit_price": float(price),
+                        }
+                    )
+        templates.append(history)
+    return templates
+
+
+def generate_synthetic_state(
+    n_products: int,
+    seed: int = 42,
+    templates: Optional[List[List[SaleRecord]]] = None,
+    history_share: float = 0.8,
+) -> AppState:
+    """
+    AppState sintético e reprodutível: cada produto copia a curva de um
+    histórico de exemplo, com nível de preço e volume reescalados, ruído e
+    entre 3 e 12 meses. Parte dos produtos fica só com a estimativa manual.
+    """
+    rng = random.Random(seed)
+    templates = templates or load_history_templates()
+    products: List[Product] = []
+
+    for i in range(n_products):
+        template = rng.choice(templates)
+        price_scale = rng.lognormvariate(0.0, 0.6)
+        qty_scale = rng.lognormvariate(0.0, 0.5)
+        mean_price = sum(r["unit_price"] for r in template) / len(template)
+        base_price = mean_price * price_scale
+        cost = round(base_price / rng.uniform(1.6, 2.5), 2)
+
+        history = []
+        if rng.random() < history_share:
+            for k, period in enumerate(ALL_PERIODS[: rng.randint(3, 12)]):
+                ref = template[k % len(template)]
+                price = round(
+                    ref["unit_price"] * price_scale * rng.uniform(0.95, 1.05), 2
+                )
+                qty = ref["quantity"] * qty_scale * rng.uniform(0.9, 1.1)
+                history.append(
+                    {
+                        "period": period,
+                        "quantity": max(0, round(qty)),
+                        "unit_price": price,
+                    }
+                )
+
+        mean_qty = sum(r["quantity"] for r in template) / len(template)
+        products.append(
+            {
+                "id": f"sku-{i}",
+                "name": f"Produto {i}",
+                "supplier_cost": cost,
+                "operational_cost": round(cost * rng.uniform(0.0, 0.05), 2),
+                "stock_on_hand": rng.randint(0, 20),
+                "lead_time_days": rng.randint(1, 30),
+                "min_order_qty": rng.randint(0, 5),
+                "target_sell_price": round(base_price, 2),
+                "manual_sales_estimate": int(mean_qty * qty_scale),
+                "history": history,
+            }
+        )
+
+    # Orçamento para cerca de um quinto do volume estimado: restrição ativa
+    budget = sum(p["supplier_cost"] * p["manual_sales_estimate"] for p in products)
+    return {"budget": round(budget / 5, 2), "risk_factor": 0.5, "products": products}
+
+
+def _measure(
+    fn: Callable[[], Any],
+    setup: Optional[Callable[[], None]] = None,
+    memory: bool = True,
+) -> Dict[str, float]:
+    """
+    Tempo de uma execução e, numa segunda execução com tracemalloc (que
+    deixa o código mais lento), o pico de memória alocada.
+    """
+    if setup:
+        setup()
+    start = time.perf_counter()
+    fn()
+    result = {"seconds": time.perf_counter() - start}
+
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+@contextlib.contextmanager
+def _scratch_store():
+    """Diretório temporário como pasta de trabalho do motor de persistência."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+
+def run_benchmark_suite(
+    sizes: Sequence[int] = SUITE_SIZES, seed: int = 42, memory: bool = True
+) -> Dict[str, Any]:
+    """Mede cada etapa do app para cada tamanho de catálogo."""
+    rows = []
+
+    def record(n: int, step: str, **stats) -> None:
+        rows.append({"n_products": n, "step": step, **stats})
+
+    for n in sizes:
+        state = generate_synthetic_state(n, seed)
+        products = state["products"]
+        sample = products[:ELASTICITY_SAMPLE]
+
+        def elasticity_single():
+            for p in sample:
+                analyze_price_elasticity(p["history"], p["supplier_cost"], cache=None)
+
+        record(
+            n,
+            "analyze_price_elasticity",
+            sample=len(sample),
+            **_measure(elasticity_single, memory=memory),
+        )
+
+        def elasticity_lean():
+            for p in sample:
+                analyze_price_elasticity(
+                    p["history"], p["supplier_cost"], cache=None, lean=True
+                )
+
+        record(
+            n,
+            "analyze_price_elasticity_lean",
+            sample=len(sample),
+            **_measure(elasticity_lean, memory=memory),
+        )
+        record(
+            n,
+            "analyze_price_elasticity_batch",
+            **_measure(
+                lambda: analyze_price_elasticity_batch(products, cache=None),
+                memory=memory,
+            ),
+        )
+        record(
+            n,
+            "forecast_seasonal_demand_batch",
+            **_measure(lambda: forecast_seasonal_demand_batch(products), memory=memory),
+        )
+        record(
+            n,
+            "optimize_purchasing_plan",
+            **_measure(
+                lambda: optimize_purchasing_plan(
+                    products, state["budget"], state["risk_factor"]
+                ),
+                setup=ELASTICITY_CACHE.clear,
+                memory=memory,
+            ),
+        )
+        record(
+            n,
+            "calculate_abc_class",
+            **_measure(lambda: calculate_abc_class(products), memory=memory),
+        )
+
+        # Edição de um produto com a curva ABC já mantida
+        abc_index = ABCIndex(products)
+
+        def abc_edit():
+            edited = dict(products[n // 2])
+            edited["manual_sales_estimate"] += 1
+            abc_index.upsert(edited)
+            abc_index.get(edited["id"])
+            abc_index.upsert(products[n // 2])
+
+        record(n, "abc_index_update", **_measure(abc_edit, memory=memory))
+
+        with _scratch_store() as tmp:
+
+            def reset_store():
+                # Cada gravação medida parte de um armazenamento vazio
+                for path in glob.glob(os.path.join(tmp, "*")):
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+
+            record(
+                n,
+                "save_state",
+                **_measure(
+                    lambda: persistence.save_state(state),
+                    setup=reset_store,
+                    memory=memory,
+                ),
+            )
+            record(
+                n,
+                "save_state_unchanged",
+                **_measure(lambda: persistence.save_state(state), memory=memory),
+            )
+
+            # Sem snapshot o load monta as colunas do histórico; depois só as mapeia
+            record(
+                n,
+                "load_state_cold",
+                **_measure(
+                    persistence.load_state,
+                    setup=lambda: shutil.rmtree(
+                        persistence.HISTORY_DIR, ignore_errors=True
+                    ),
+                    memory=memory,
+                ),
+            )
+            record(n, "load_state", **_measure(persistence.load_state, memory=memory))
+
+            # Catálogo em JSON: arquivo antigo (migrado em memória) x já atual
+            json_path = os.path.join(tmp, "catalogo.json")
+
+            def write_legacy():
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(state, f, indent=4)
+
+            record(
+                n,
+                "load_json_migrate",
+                **_measure(
+                    lambda: persistence.load_state_file(json_path),
+                    setup=write_legacy,
+                    memory=memory,
+                ),
+            )
+            migrated = persistence.load_state_file(json_path)
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump({"version": persistence.SCHEMA_VERSION, **migrated}, f)
+            record(
+                n,
+                "load_json_current",
+                **_measure(
+                    lambda: persistence.load_state_file(json_path), memory=memory
+                ),
+            )
+
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "seed": seed,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "storage_engine": persistence.STORAGE_ENGINE,
+        "results": rows,
+    }
+
+
+def compare_baselines(
+    current: Dict[str, Any], baseline: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Variação de tempo e memória por (tamanho, etapa) em relação ao baseline."""
+    old = {(r["n_products"], r["step"]): r for r in baseline["results"]}
+    diffs = []
+    for row in current["results"]:
+        ref = old.get((row["n_products"], row["step"]))
+        if ref is None:
+            continue
+        diff = {
+            "n_products": row["n_products"],
+            "step": row["step"],
+            "seconds_ratio": (
+                row["seconds"] / ref["seconds"] if ref["seconds"] else float("inf")
+            ),
+        }
+        if "peak_mb" in row and ref.get("peak_mb"):
+            diff["peak_mb_ratio"] = row["peak_mb"] / ref["peak_mb"]
+        diffs.append(diff)
+    return diffs
+
+
+def benchmark_solver_backends(
+    sizes: Sequence[int] = (1_000, 10_000, 20_000),
+    backends: Sequence[str] = ("knapsack", "cbc"),
+    budget_share: float = 0.3,
+    risk_appetite: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """
+    Compara o tempo de resolução de cada backend sobre o mesmo modelo.
+    O orçamento é uma fração do custo de comprar o teto de todos os SKUs,
+    para que a restrição orçamentária fique ativa.
+    """
+    rows = []
+    for n in sizes:
+        model = build_purchase_model(generate_synthetic_catalog(n), risk_appetite)
+        full_cost = float(model["cost"] @ model["upper"])
+        min_cost = float(model["cost"] @ model["lower"])
+        budget = min_cost + (full_cost - min_cost) * budget_share
+
+        for backend in backends:
+            start = time.perf_counter()
+            status, qty = solve_purchase_model(model, budget, backend)
+            elapsed = time.perf_counter() - start
+            rows.append(
+                {
+                    "n_products": n,
+                    "backend": backend,
+                    "status": status,
+                    "seconds": elapsed,
+                    "profit": float(model["unit_profit"] @ qty),
+                }
+            )
+    return rows
+
+
+def benchmark_budget_frontier(
+    n_products: int = 10_000, points: int = 50, risk_appetite: float = 0.5
+) -> Dict[str, Any]:
+    """Fronteira de `points` orçamentos vs a mesma quantidade de chamadas independentes."""
+    products = generate_synthetic_catalog(n_products)
+    model = build_purchase_model(products, risk_appetite)
+    min_cost = float(model["cost"] @ model["lower"])
+    full_cost = float(model["cost"] @ model["upper"])
+    budgets = [min_cost + (full_cost - min_cost) * k / points for k in range(points)]
+
+    start = time.perf_counter()
+    optimize_budget_frontier(products, budgets, risk_appetite)
+    frontier_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for budget in budgets:
+        optimize_purchasing_plan(products, budget, risk_appetite)
+    independent_seconds = time.perf_counter() - start
+
+    return {
+        "n_products": n_products,
+        "points": points,
+        "frontier_seconds": frontier_seconds,
+        "independent_seconds": independent_seconds,
+    }
+
+
+def benchmark_joint_pricing(
+    sizes: Sequence[int] = (1_000, 5_000, 10_000),
+    points: int = 20,
+    seed: int = 42,
+) -> List[Dict[str, Any]]:
+    """
+    Preço e quantidade em conjunto vs o plano de duas etapas (preço ótimo
+    isolado + mochila), no mesmo catálogo e orçamento.
+    """
+    rows = []
+    for n in sizes:
+        state = generate_synthetic_state(n, seed)
+        args = (state["products"], state["budget"], state["risk_factor"])
+        for mode, run in (
+            ("two_stage", lambda: optimize_purchasing_plan(*args)),
+            ("joint", lambda: optimize_joint_pricing_plan(*args, points=points)),
+        ):
+            ELASTICITY_CACHE.clear()
+            start = time.perf_counter()
+            plan = run()
+            elapsed = time.perf_counter() - start
+            counters = plan["diagnostics"]["counters"]
+            rows.append(
+                {
+                    "n_products": n,
+                    "mode": mode,
+                    "status": plan["status"],
+                    "seconds": elapsed,
+                    "profit": sum(r["Lucro Previsto"] for r in plan["data"]),
+                    "method": counters.get(
+                        "solve_method", counters.get("backend_used")
+                    ),
+                }
+            )
+    return rows
+
+
+def _build_pulp_model(model: Dict[str, Any], budget: float) -> LpProblem:
+    """Montagem antiga do modelo, um objeto do PuLP por variável (referência)."""
+    prob = LpProblem("ProfitMax_Engine", LpMaximize)
+    variables = [
+        LpVariable(f"qty_{i}", lowBound=lo, upBound=up, cat="Integer")
+        for i, (lo, up) in enumerate(zip(model["lower"], model["upper"]))
+    ]
+    prob += lpSum(x * float(u) for x, u in zip(variables, model["unit_profit"]))
+    prob += lpSum(x * float(c) for x, c in zip(variables, model["cost"])) <= budget
+    return prob
+
+
+def benchmark_model_build(
+    sizes: Sequence[int] = (10_000, 50_000, 100_000),
+    risk_appetite: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """
+    Tempo para montar o modelo (e gravar o MPS lido pelo CBC) com objetos
+    do PuLP vs direto em vetores/CSR. `us_per_var` constante entre os
+    tamanhos indica crescimento linear.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            model = build_purchase_model(generate_synthetic_catalog(n), risk_appetite)
+            budget = float(model["cost"] @ model["upper"]) / 3
+            path = os.path.join(tmp, f"model_{n}.mps")
+
+            def pulp_build():
+                _build_pulp_model(model, budget).writeMPS(path)
+
+            def matrix_build():
+                write_mps(build_matrix_model(model, budget), path)
+
+            for builder, fn in (("pulp", pulp_build), ("matrix", matrix_build)):
+                seconds = _measure(fn, memory=False)["seconds"]
+                rows.append(
+                    {
+                        "n_products": n,
+                        "builder": builder,
+                        "seconds": seconds,
+                        "us_per_var": seconds / n * 1e6,
+                    }
+                )
+    return rows
+
+
+def _print_solver_benchmarks() -> None:
+    print(f"{'SKUs':>8} {'backend':>10} {'status':>12} {'tempo (s)':>10} {'lucro':>16}")
+    for row in benchmark_solver_backends():
+        print(
+            f"{row['n_products']:>8} {row['backend']:>10} {row['status']:>12} "
+            f"{row['seconds']:>10.3f} {row['profit']:>16.2f}"
+        )
+
+    print(f"\n{'SKUs':>8} {'montagem':>10} {'tempo (s)':>10} {'us/var':>8}")
+    for row in benchmark_model_build():
+        print(
+            f"{row['n_products']:>8} {row['builder']:>10} {row['seconds']:>10.3f} "
+            f"{row['us_per_var']:>8.1f}"
+        )
+
+    frontier = benchmark_budget_frontier()
+    print(
+        f"\nFronteira de {frontier['points']} orçamentos ({frontier['n_products']} SKUs): "
+        f"{frontier['frontier_seconds']:.3f}s vs {frontier['independent_seconds']:.3f}s "
+        "em chamadas independentes"
+    )
+
+    print(
+        f"\n{'SKUs':>8} {'modo':>10} {'status':>10} {'tempo (s)':>10} "
+        f"{'lucro':>16} {'método':>12}"
+    )
+    for row in benchmark_joint_pricing():
+        print(
+            f"{row['n_products']:>8} {row['mode']:>10} {row['status']:>10} "
+            f"{row['seconds']:>10.3f} {row['profit']:>16.2f} {row['method']:>12}"
+        )
+
+
+def _print_suite(report: Dict[str, Any], diffs: Optional[List[Dict[str, Any]]]) -> None:
+    ratios = {(d["n_products"], d["step"]): d for d in diffs or []}
+    print(
+        f"{'SKUs':>8} {'etapa':<32} {'tempo (s)':>10} {'pico (MB)':>10} {'vs base':>8}"
+    )
+    for row in report["results"]:
+        peak = f"{row['peak_mb']:>10.1f}" if "peak_mb" in row else f"{'-':>10}"
+        diff = ratios.get((row["n_products"], row["step"]))
+        vs = f"{diff['seconds_ratio']:>7.2f}x" if diff else f"{'-':>8}"
+        print(
+            f"{row['n_products']:>8} {row['step']:<32} {row['seconds']:>10.3f} {peak} {vs}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m src.benchmark")
+    parser.add_argument(
+        "command", nargs="?", choices=("suite", "solvers"), default="suite"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SUITE_SIZES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--output", default=DEFAULT_BASELINE, help="JSON com os resultados."
+    )
+    parser.add_argument("--compare", help="Baseline JSON anterior para comparação.")
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Não mede pico de memória."
+    )
+    args = parser.parse_args()
+
+    if args.command == "solvers":
+        _print_solver_benchmarks()
+    else:
+        report = run_benchmark_suite(args.sizes, args.seed, memory=not args.no_memory)
+        diffs = None
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                diffs = compare_baselines(report, json.load(f))
+            report["compared_to"] = args.compare
+            report["diffs"] = diffs
+        _print_suite(report, diffs)
+
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResultados salvos em {args.output}")
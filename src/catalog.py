@@ -0,0 +1,109 @@
+from typing import Any, Dict, List, Optional, Sequence, Union
+import numpy as np
+from src.models import Product, SaleRecord
+
+# Colunas numéricas do catálogo, com o tipo e o valor padrão de produtos
+# antigos que não têm o campo (os mesmos de `sanitize_product`)
+CATALOG_COLUMNS = (
+    ("supplier_cost", np.float64, 0.0),
+    ("operational_cost", np.float64, 0.0),
+    ("stock_on_hand", np.int64, 0),
+    ("lead_time_days", np.int64, 0),
+    ("min_order_qty", np.int64, 1),
+    ("target_sell_price", np.float64, 0.0),
+    ("manual_sales_estimate", np.int64, 0),
+)
+CATALOG_DTYPE = np.dtype([(name, dtype) for name, dtype, _ in CATALOG_COLUMNS])
+_DEFAULTS = {name: default for name, _, default in CATALOG_COLUMNS}
+
+
+class Catalog:
+    """
+    Catálogo em colunas: os campos numéricos de todos os produtos num único
+    array estruturado do NumPy, e id, nome e histórico em listas paralelas.
+
+    `catalog["supplier_cost"]` devolve uma visão da coluna (sem cópia), que
+    o solver e a análise usam direto em operações vetorizadas. A conversão
+    de/para a lista de dicionários (`from_products` / `to_products`)
+    preserva os campos fora das colunas, para a persistência e a interface.
+    """
+
+    __slots__ = ("ids", "names", "data", "histories", "extras")
+
+    def __init__(
+        self,
+        ids: List[str],
+        names: List[str],
+        data: np.ndarray,
+        histories: List[List[SaleRecord]],
+        extras: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.ids = ids
+        self.names = names
+        self.data = data
+        self.histories = histories
+        self.extras = extras if extras is not None else [{} for _ in ids]
+
+    @classmethod
+    def from_products(cls, products: Sequence[Product]) -> "Catalog":
+        n = len(products)
+        data = np.empty(n, dtype=CATALOG_DTYPE)
+        for name, dtype, default in CATALOG_COLUMNS:
+            data[name] = np.fromiter(
+                (p.get(name, default) for p in products), dtype=dtype, count=n
+            )
+        known = {"id", "name", "history", *_DEFAULTS}
+        return cls(
+            [p["id"] for p in products],
+            [p["name"] for p in products],
+            data,
+            [p.get("history", []) for p in products],
+            [{k: v for k, v in p.items() if k not in known} for p in products],
+        )
+
+    def to_products(self) -> List[Product]:
+        """
+        Lista de produtos no formato de dicionário. Campos ausentes na
+        origem voltam com o valor padrão; os históricos não são copiados.
+        """
+        columns = {name: self.data[name].tolist() for name in CATALOG_DTYPE.names}
+        products = []
+        for i, pid in enumerate(self.ids):
+            prod = {"id": pid, "name": self.names[i]}
+            prod.update((name, values[i]) for name, values in columns.items())
+            prod["history"] = self.histories[i]
+            prod.update(self.extras[i])
+            products.append(prod)
+        return products
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.data[column]
+
+    def take(self, indices: Union[slice, Sequence[int], np.ndarray]) -> "Catalog":
+        """Subconjunto dos produtos (por fatia ou por índices), na ordem pedida."""
+        if isinstance(indices, slice):
+            return Catalog(
+                self.ids[indices],
+                self.names[indices],
+                self.data[indices],
+                self.histories[indices],
+                self.extras[indices],
+            )
+        rows = np.asarray(indices, dtype=np.int64)
+        return Catalog(
+            [self.ids[i] for i in rows],
+            [self.names[i] for i in rows],
+            self.data[rows],
+            [self.histories[i] for i in rows],
+            [self.extras[i] for i in rows],
+        )
+
+
+def as_catalog(products: Union[Sequence[Product], Catalog]) -> Catalog:
+    """O próprio catálogo, ou a lista de produtos convertida."""
+    if isinstance(products, Catalog):
+        return products
+    return Catalog.from_products(products)
@@ -0,0 +1,339 @@
+"""
+Geração de planos de compra sem interface (ex.: execução noturna).
+
+Uso:
+    python -m src.cli optimize --catalog store_data.json --budget 5000 --risk 0.5
+    python -m src.cli optimize --catalog lojas/ --output planos/ --workers 4
+    python -m src.cli locations --catalog store_data.json --locations filiais.json
+
+Não importa streamlit nem plotly: os workers sobem rápido e ficam leves.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from src.persistence import load_state_file
+from src.solver import (
+    SOLVER_BACKENDS,
+    DEFAULT_BACKEND,
+    DEMAND_SOURCES,
+    DEFAULT_DEMAND_SOURCE,
+    PLAN_STATUSES,
+    optimize_purchasing_plan,
+)
+from src.locations import optimize_locations, optimize_locations_joint
+from src.plan_cache import PlanCache
+
+CATALOG_EXTENSIONS = (".json", ".db")
+# Sufixo dos arquivos de plano gravados (<catálogo>_plano.csv/json); por
+# padrão eles ficam no diretório dos catálogos e não são catálogos
+PLAN_SUFFIX = "_plano"
+OUTPUT_FORMATS = ("csv", "json")
+
+# Colunas do plano, na mesma ordem da tabela do dashboard
+PLAN_COLUMNS = [
+    "ID",
+    "Produto",
+    "Qtd Compra",
+    "Custo Unit",
+    "Custo Operacional",
+    "Preço Venda",
+    "Investimento Total",
+    "Lucro Previsto",
+    "Base Decisão",
+]
+
+
+def find_catalogs(path: str) -> List[str]:
+    """
+    Um arquivo de catálogo, ou todos os catálogos de um diretório (sem os
+    planos gravados por execuções anteriores).
+    """
+    if os.path.isdir(path):
+        return [
+            os.path.join(path, name)
+            for name in sorted(os.listdir(path))
+            if name.lower().endswith(CATALOG_EXTENSIONS)
+            and not os.path.splitext(name)[0].endswith(PLAN_SUFFIX)
+        ]
+    return [path]
+
+
+def write_json(payload: Dict[str, Any], output: str) -> None:
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=4, ensure_ascii=False)
+
+
+def write_csv(rows: List[Dict[str, Any]], output: str) -> None:
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=PLAN_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def optimize_catalog(
+    catalog: str,
+    output_dir: str,
+    budget: Optional[float] = None,
+    risk: Optional[float] = None,
+    fmt: str = "csv",
+    backend: str = DEFAULT_BACKEND,
+    time_limit: Optional[float] = None,
+    mip_gap: float = 0.0,
+    demand_source: str = DEFAULT_DEMAND_SOURCE,
+    month: Optional[str] = None,
+    plan_cache: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Otimiza um catálogo e grava o plano em `output_dir`. Orçamento e risco
+    não informados vêm do próprio catálogo. Com `plan_cache` (caminho do
+    banco), planos já calculados para as mesmas entradas são reaproveitados.
+    Retorna um resumo da execução.
+    """
+    start = time.perf_counter()
+    state = load_state_file(catalog)
+    budget = state["budget"] if budget is None else budget
+    risk = state["risk_factor"] if risk is None else risk
+
+    plan = optimize_purchasing_plan(
+        state["products"],
+        budget,
+        risk,
+        backend,
+        time_limit=time_limit,
+        mip_gap=mip_gap,
+        demand_source=demand_source,
+        month=month,
+        plan_cache=PlanCache(plan_cache) if plan_cache else None,
+    )
+    rows = plan["data"]
+
+    stem = os.path.splitext(os.path.basename(catalog))[0]
+    output = os.path.join(output_dir, f"{stem}{PLAN_SUFFIX}.{fmt}")
+    if fmt == "json":
+        payload = {"catalog": catalog, "budget": budget, "risk": risk, **plan}
+        write_json(payload, output)
+    else:
+        write_csv(rows, output)
+
+    return {
+        "catalog": catalog,
+        "output": output,
+        "status": plan["status"],
+        "message": plan.get("message", ""),
+        "items": len(rows),
+        "investment": sum(r["Investimento Total"] for r in rows),
+        "profit": sum(r["Lucro Previsto"] for r in rows),
+        "skipped": len(plan.get("skipped", [])),
+        "cached": plan["diagnostics"]["counters"].get("plan_cache") == "hit",
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def run_optimize(args: argparse.Namespace) -> int:
+    catalogs = find_catalogs(args.catalog)
+    if not catalogs or not all(os.path.isfile(c) for c in catalogs):
+        print(f"Nenhum catálogo encontrado em {args.catalog}", file=sys.stderr)
+        return 2
+
+    output_dir = args.output or os.path.dirname(os.path.abspath(catalogs[0]))
+    os.makedirs(output_dir, exist_ok=True)
+    job = dict(
+        output_dir=output_dir,
+        budget=args.budget,
+        risk=args.risk,
+        fmt=args.format,
+        backend=args.backend,
+        time_limit=args.time_limit,
+        mip_gap=args.mip_gap,
+        demand_source=args.demand,
+        month=args.month,
+        plan_cache=args.plan_cache,
+    )
+
+    # Paralelismo limitado: no máximo `workers` catálogos ao mesmo tempo
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(catalogs)))
+    failures = 0
+    if workers == 1:
+        outcomes = []
+        for catalog in catalogs:
+            try:
+                outcomes.append(optimize_catalog(catalog, **job))
+            except Exception as e:
+                outcomes.append({"catalog": catalog, "error": e})
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (catalog, pool.submit(optimize_catalog, catalog, **job))
+                for catalog in catalogs
+            ]
+            outcomes = []
+            for catalog, future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append({"catalog": catalog, "error": e})
+
+    for res in outcomes:
+        if "error" in res:
+            failures += 1
+            print(f"[ERRO] {res['catalog']}: {res['error']}", file=sys.stderr)
+        elif res["status"] not in PLAN_STATUSES:
+            failures += 1
+            print(f"[{res['status']}] {res['catalog']}: {res['message']}")
+        else:
+            print(
+                f"[OK] {res['catalog']} -> {res['output']} | {res['items']} itens | "
+                f"Investimento R$ {res['investment']:,.2f} | "
+                f"Lucro R$ {res['profit']:,.2f} | {res['seconds']:.2f}s"
+                + (" (cache)" if res["cached"] else "")
+            )
+            if res["message"]:
+                print(f"     {res['message']}")
+    return 1 if failures else 0
+
+
+def run_locations(args: argparse.Namespace) -> int:
+    state = load_state_file(args.catalog)
+    with open(args.locations, "r", encoding="utf-8") as f:
+        locations = json.load(f)
+
+    output_dir = args.output or os.path.dirname(os.path.abspath(args.locations))
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    if args.corporate_budget is None:
+        result = optimize_locations(
+            state["products"], locations, args.backend, args.workers
+        )
+    else:
+        result = optimize_locations_joint(
+            state["products"],
+            locations,
+            args.corporate_budget,
+            args.backend,
+            args.workers,
+        )
+        if result["status"] not in PLAN_STATUSES:
+            print(f"[{result['status']}] {result['message']}")
+            return 1
+
+    failures = 0
+    for plan in result["locations"]:
+        rows = plan["data"]
+        if plan["status"] not in PLAN_STATUSES:
+            failures += 1
+            print(f"[{plan['status']}] {plan['location']}: {plan.get('message', '')}")
+            continue
+        output = os.path.join(
+            output_dir, f"{plan['location']}{PLAN_SUFFIX}.{args.format}"
+        )
+        if args.format == "json":
+            write_json(plan, output)
+        else:
+            write_csv(rows, output)
+        print(
+            f"[OK] {plan['name']} -> {output} | {len(rows)} itens | "
+            f"Investimento R$ {sum(r['Investimento Total'] for r in rows):,.2f} | "
+            f"Lucro R$ {sum(r['Lucro Previsto'] for r in rows):,.2f}"
+        )
+    if args.corporate_budget is not None:
+        print(
+            f"Total: Investimento R$ {result['investment']:,.2f} de "
+            f"R$ {args.corporate_budget:,.2f} | Lucro R$ {result['profit']:,.2f} "
+            f"(gap {result['gap']:.2%})"
+        )
+    print(f"{len(locations)} lojas em {time.perf_counter() - start:.2f}s")
+    return 1 if failures else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli", description="ProfitMax em linha de comando."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    opt = commands.add_parser("optimize", help="Gera planos de compra otimizados.")
+    opt.add_argument(
+        "--catalog",
+        required=True,
+        help="Catálogo (.json ou .db) ou diretório com vários catálogos.",
+    )
+    opt.add_argument(
+        "--budget", type=float, help="Orçamento (padrão: o salvo no catálogo)."
+    )
+    opt.add_argument(
+        "--risk", type=float, help="Apetite ao risco 0-1 (padrão: o do catálogo)."
+    )
+    opt.add_argument("--output", help="Diretório de saída (padrão: o do catálogo).")
+    opt.add_argument("--format", choices=OUTPUT_FORMATS, default="csv")
+    opt.add_argument("--backend", choices=SOLVER_BACKENDS, default=DEFAULT_BACKEND)
+    opt.add_argument(
+        "--time-limit",
+        type=float,
+        help="Tempo máximo do solver em segundos; ao estourar, usa a melhor solução encontrada.",
+    )
+    opt.add_argument(
+        "--mip-gap",
+        type=float,
+        default=0.0,
+        help="Gap relativo aceito para encerrar a busca (ex.: 0.01 = 1%%).",
+    )
+    opt.add_argument(
+        "--demand",
+        choices=DEMAND_SOURCES,
+        default=DEFAULT_DEMAND_SOURCE,
+        help="Modelo de demanda: só preço ou preço + sazonalidade do mês.",
+    )
+    opt.add_argument(
+        "--month",
+        help="Mês previsto pelo modelo sazonal (ex.: jan); padrão: o seguinte ao histórico.",
+    )
+    opt.add_argument(
+        "--plan-cache",
+        help="Banco do cache de planos (ex.: store_plans.db); catálogos sem mudança não são recalculados.",
+    )
+    opt.add_argument(
+        "--workers",
+        type=int,
+        help="Catálogos processados em paralelo (padrão: nº de CPUs).",
+    )
+    opt.set_defaults(func=run_optimize)
+
+    loc = commands.add_parser(
+        "locations", help="Planos de várias lojas que compartilham um catálogo."
+    )
+    loc.add_argument("--catalog", required=True, help="Catálogo compartilhado.")
+    loc.add_argument(
+        "--locations",
+        required=True,
+        help="JSON com a lista de lojas (id, name, budget, risk_factor, overrides).",
+    )
+    loc.add_argument(
+        "--corporate-budget",
+        type=float,
+        help="Orçamento corporativo compartilhado (resolve o modelo conjunto).",
+    )
+    loc.add_argument("--output", help="Diretório de saída (padrão: o das lojas).")
+    loc.add_argument("--format", choices=OUTPUT_FORMATS, default="csv")
+    loc.add_argument("--backend", choices=SOLVER_BACKENDS, default=DEFAULT_BACKEND)
+    loc.add_argument(
+        "--workers",
+        type=int,
+        help="Lojas resolvidas em paralelo (padrão: nº de CPUs).",
+    )
+    loc.set_defaults(func=run_locations)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+from src.models import Product
+
+# Colunas da tabela comparativa, na ordem exibida no dashboard
+COMPARISON_COLUMNS = [
+    "ID",
+    "Produto",
+    "Volume",
+    "Decisão Baseada em",
+    "Seu Preço",
+    "Preço Otimizado",
+    "Lucro (Seu Preço)",
+    "Lucro (Otimizado)",
+    "Ganho Extra",
+    "Margem Unit",
+]
+
+
+def compare_plan_with_manual(
+    plan_rows: List[Dict[str, Any]], products: List[Product]
+) -> Dict[str, Any]:
+    """
+    Compara o plano otimizado com o mesmo volume vendido ao preço manual
+    (alvo) de cada produto. Plano e catálogo são unidos pelo id do produto
+    e todas as contas são feitas por coluna.
+
+    Produtos que saíram do catálogo depois do cálculo são comparados com o
+    próprio preço otimizado (ganho zero).
+
+    Retorna {"table": DataFrame, "total_manual", "total_optimized", "delta",
+    "investment", "roi"}.
+    """
+    n = len(plan_rows)
+    ids = [r["ID"] for r in plan_rows]
+
+    def column(key: str) -> np.ndarray:
+        return np.fromiter((r[key] for r in plan_rows), dtype=np.float64, count=n)
+
+    volume = column("Qtd Compra")
+    full_cost = column("Custo Unit") + column("Custo Operacional")
+    optimized_price = column("Preço Venda")
+    optimized_profit = column("Lucro Previsto")
+    investment = column("Investimento Total")
+
+    # Junção por id: índice do catálogo em dicionário, O(n + m)
+    target_price = {p["id"]: p["target_sell_price"] for p in products}
+    manual_price = np.fromiter(
+        (target_price.get(pid, np.nan) for pid in ids), dtype=np.float64, count=n
+    )
+    manual_price = np.where(np.isnan(manual_price), optimized_price, manual_price)
+
+    manual_profit = (manual_price - full_cost) * volume
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit_margin = np.where(volume > 0, optimized_profit / volume, 0.0)
+
+    table = pd.DataFrame(
+        {
+            "ID": ids,
+            "Produto": [r["Produto"] for r in plan_rows],
+            "Volume": volume.astype(np.int64),
+            "Decisão Baseada em": [r["Base Decisão"] for r in plan_rows],
+            "Seu Preço": manual_price,
+            "Preço Otimizado": optimized_price,
+            "Lucro (Seu Preço)": manual_profit,
+            "Lucro (Otimizado)": optimized_profit,
+            "Ganho Extra": optimized_profit - manual_profit,
+            "Margem Unit": unit_margin,
+        },
+        columns=COMPARISON_COLUMNS,
+    )
+
+    total_manual = float(manual_profit.sum())
+    total_optimized = float(optimized_profit.sum())
+    total_investment = float(investment.sum())
+    return {
+        "table": table,
+        "total_manual": total_manual,
+        "total_optimized": total_optimized,
+        "delta": total_optimized - total_manual,
+        "investment": total_investment,
+        "roi": (
+            total_optimized / total_investment * 100 if total_investment > 0 else 0.0
+        ),
+    }
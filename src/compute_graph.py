@@ -0,0 +1,209 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+import numpy as np
+from src.models import AppState, Product, SaleRecord
+from src.analytics import (
+    ABCIndex,
+    CHART_POINTS,
+    analyze_price_elasticity,
+    price_profit_curve,
+)
+from src.history_stats import STATS_FIELD, append_sale
+
+# Campos do produto que alimentam o ajuste de elasticidade
+ELASTICITY_FIELDS = ("history", "history_stats", "supplier_cost")
+# Campos que alteram o faturamento potencial (curva ABC)
+ABC_FIELDS = ("target_sell_price", "manual_sales_estimate", "history", "supplier_cost")
+
+InputKey = Tuple[Hashable, ...]
+InputSnapshot = Dict[InputKey, int]
+
+# Entradas do plano de compra
+PLAN_DEPS: Tuple[InputKey, ...] = (("catalog",), ("budget",), ("risk_factor",))
+
+
+class ComputeGraph:
+    """
+    Camada de cálculo com rastreamento de dependências sobre o AppState.
+
+    Cada entrada (um campo de um produto, o catálogo, o orçamento, o risco)
+    tem um número de versão, incrementado só quando o valor de fato muda.
+    Cada resultado derivado guarda as versões das entradas com que foi
+    calculado e só é recalculado quando alguma delas mudou. Assim, um rerun
+    do Streamlit sem alteração de dados não refaz nenhuma análise.
+
+    As alterações no estado devem passar pelos métodos desta classe.
+    """
+
+    def __init__(self, state: AppState, abc_mode: str = "manual"):
+        self.state = state
+        self.hits = 0
+        self.recomputes = 0
+        self._versions: Dict[InputKey, int] = {}
+        self._nodes: Dict[Hashable, Tuple[Dict[InputKey, int], Any]] = {}
+        self.abc = ABCIndex(state["products"], abc_mode)
+
+    # ------------------------------------------------------------------
+    # Entradas
+    # ------------------------------------------------------------------
+
+    def _bump(self, *keys: InputKey) -> None:
+        for key in keys:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def set_setting(self, name: str, value: Any) -> None:
+        """Orçamento/risco vindos dos widgets: só invalida se o valor mudou."""
+        if self.state.get(name) != value:
+            self.state[name] = value
+            self._bump((name,))
+
+    def add_product(self, product: Product) -> None:
+        self.state["products"].append(product)
+        self._bump(("catalog",))
+        self.abc.upsert(product)
+
+    def update_product(self, index: int, changes: Dict[str, Any]) -> None:
+        """Aplica `changes` ao produto e invalida só os campos alterados."""
+        product = self.state["products"][index]
+        changed = [k for k, v in changes.items() if k not in product or product[k] != v]
+        if not changed:
+            return
+        product.update({k: changes[k] for k in changed})
+        self.products_changed([product["id"]], changed)
+
+    def append_sale(self, index: int, record: SaleRecord) -> None:
+        """Acrescenta um mês de vendas ao produto (somas atualizadas em O(1))."""
+        product = self.state["products"][index]
+        append_sale(product, record)
+        self.products_changed([product["id"]], ["history", STATS_FIELD])
+
+    def products_changed(
+        self, product_ids: Iterable[str], fields: Iterable[str]
+    ) -> None:
+        """Avisa que os campos `fields` dos produtos foram alterados por fora."""
+        fields = list(fields)
+        ids = set(product_ids)
+        for pid in ids:
+            self._bump(*((pid, f) for f in fields))
+        self._bump(("catalog",))
+
+        if any(f in ABC_FIELDS for f in fields):
+            for p in self.state["products"]:
+                if p["id"] in ids:
+                    self.abc.upsert(p)
+
+    def remove_product(self, index: int) -> None:
+        product = self.state["products"].pop(index)
+        self.abc.remove(product["id"])
+        self._bump(("catalog",))
+
+    def set_abc_mode(self, mode: str) -> None:
+        if self.abc.mode != mode:
+            self.abc.mode = mode
+            self.abc.rebuild(self.state["products"])
+
+    # ------------------------------------------------------------------
+    # Nós derivados
+    # ------------------------------------------------------------------
+
+    def _snapshot(self, deps: Iterable[InputKey]) -> InputSnapshot:
+        return {dep: self._versions.get(dep, 0) for dep in deps}
+
+    def store(self, key: Hashable, snapshot: InputSnapshot, value: Any) -> None:
+        """
+        Guarda um valor calculado fora do grafo (ex.: por um job em segundo
+        plano). `snapshot` são as versões das entradas no início do cálculo:
+        se algo mudou enquanto isso, o valor já entra como desatualizado.
+        """
+        self._nodes[key] = (dict(snapshot), value)
+        self.recomputes += 1
+
+    def is_fresh(self, key: Hashable) -> bool:
+        node = self._nodes.get(key)
+        return node is not None and node[0] == self._snapshot(node[0])
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Último valor calculado (atual ou não), sem recalcular."""
+        node = self._nodes.get(key)
+        return node[1] if node else None
+
+    def derive(
+        self, key: Hashable, deps: Iterable[InputKey], compute: Callable[[], Any]
+    ) -> Any:
+        snapshot = self._snapshot(deps)
+        node = self._nodes.get(key)
+        if node is not None and node[0] == snapshot:
+            self.hits += 1
+            return node[1]
+
+        value = compute()
+        self._nodes[key] = (snapshot, value)
+        self.recomputes += 1
+        return value
+
+    def elasticity(self, product: Product) -> Dict[str, Any]:
+        pid = product["id"]
+        return self.derive(
+            ("elasticity", pid),
+            [(pid, f) for f in ELASTICITY_FIELDS],
+            lambda: analyze_price_elasticity(
+                product["history"],
+                product["supplier_cost"],
+                lean=True,
+                stats=product.get(STATS_FIELD),
+            ),
+        )
+
+    def elasticity_chart(
+        self, product: Product, points: int = CHART_POINTS
+    ) -> Dict[str, np.ndarray]:
+        """Curva preço x lucro, gerada só quando o Laboratório de Preço a exibe."""
+        pid = product["id"]
+        return self.derive(
+            ("elasticity_chart", pid, points),
+            [(pid, f) for f in ELASTICITY_FIELDS],
+            lambda: price_profit_curve(
+                self.elasticity(product),
+                product["history"],
+                product["supplier_cost"],
+                points,
+            ),
+        )
+
+    def abc_class(self, product_id: str) -> str:
+        return self.abc.get(product_id)
+
+    def margins(self) -> Dict[str, float]:
+        """Margem manual (preço alvo - custos) de todo o catálogo, por id."""
+
+        def compute():
+            products = self.state["products"]
+            n = len(products)
+            price, cost, op_cost = (
+                np.fromiter((p[f] for p in products), dtype=np.float64, count=n)
+                for f in ("target_sell_price", "supplier_cost", "operational_cost")
+            )
+            return dict(
+                zip((p["id"] for p in products), (price - cost - op_cost).tolist())
+            )
+
+        return self.derive(("margins",), [("catalog",)], compute)
+
+    def products_with_history(self, min_months: int = 3) -> List[Product]:
+        return self.derive(
+            ("with_history", min_months),
+            [("catalog",)],
+            lambda: [
+                p for p in self.state["products"] if len(p["history"]) >= min_months
+            ],
+        )
+
+    def plan_inputs(self) -> InputSnapshot:
+        """Versões atuais das entradas do plano (para `store`)."""
+        return self._snapshot(PLAN_DEPS)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "nodes": len(self._nodes),
+            "hits": self.hits,
+            "recomputes": self.recomputes,
+        }
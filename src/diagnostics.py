@@ -0,0 +1,53 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Gancho opcional para profilers/coletores de métricas. Recebe
+# (evento, nome, valor): ("stage_start", etapa, None),
+# ("stage_end", etapa, segundos), ("counter", nome, valor) e
+# ("progress", etapa, (concluídos, total)).
+MetricsHook = Callable[[str, str, Any], None]
+
+
+class Diagnostics:
+    """Tempos por etapa e contadores de uma execução do otimizador."""
+
+    def __init__(self, hook: Optional[MetricsHook] = None):
+        self.hook = hook
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self.hook:
+            self.hook("stage_start", name, None)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            if self.hook:
+                self.hook("stage_end", name, elapsed)
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        """Tempo medido fora de `stage` (ex.: informado pelo próprio backend)."""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def count(self, **counters: Any) -> None:
+        self.counters.update(counters)
+        if self.hook:
+            for name, value in counters.items():
+                self.hook("counter", name, value)
+
+    def progress(self, name: str, done: int, total: int) -> None:
+        """Avanço dentro de uma etapa; só vai para o gancho, não é guardado."""
+        if self.hook:
+            self.hook("progress", name, (done, total))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "timings": dict(self.timings),
+            "total_seconds": sum(self.timings.values()),
+            "counters": dict(self.counters),
+        }
@@ -0,0 +1,142 @@
+"""
+Estatísticas suficientes da regressão quantidade ~ preço, guardadas em cada
+produto ao lado do histórico (campo "history_stats"). Com elas a
+elasticidade sai em tempo constante, e um mês novo de vendas atualiza as
+somas sem reprocessar o histórico inteiro.
+
+Com fator de esquecimento `decay` < 1, cada venda nova multiplica as somas
+anteriores por `decay`: os meses recentes pesam mais, sem reajuste.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from src.models import HistoryStats, Product, SaleRecord
+from src.history_store import LazyHistory, history_columns
+
+STATS_FIELD = "history_stats"
+# 1.0 = todos os meses com o mesmo peso (a regressão de sempre)
+DEFAULT_DECAY = 1.0
+
+
+def history_tail(history: Sequence[SaleRecord]) -> Optional[List[Any]]:
+    """
+    Último registro do histórico como [período, quantidade, preço], lido em
+    O(1) (sem materializar históricos lazy). Junto com a contagem, é o que
+    as somas guardadas conferem para saber se ainda valem.
+    """
+    if not len(history):
+        return None
+    if isinstance(history, LazyHistory) and history._records is None:
+        periods, quantities, prices = history.columns()
+        return [str(periods[-1]), float(quantities[-1]), float(prices[-1])]
+    last = history[-1]
+    return [str(last["period"]), float(last["quantity"]), float(last["unit_price"])]
+
+
+def history_stats(
+    history: Sequence[SaleRecord], decay: float = DEFAULT_DECAY
+) -> HistoryStats:
+    """Somas de um histórico inteiro, com o peso `decay ** idade` por registro."""
+    if not 0.0 < decay <= 1.0:
+        raise ValueError(f"Fator de esquecimento fora de (0, 1]: {decay}")
+    prices, quantities = history_columns(history)
+    prices = np.asarray(prices, dtype=np.float64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    weights = decay ** np.arange(len(prices) - 1, -1, -1, dtype=np.float64)
+    return {
+        "count": len(prices),
+        "n": float(weights.sum()),
+        "sum_x": float(weights @ prices),
+        "sum_y": float(weights @ quantities),
+        "sum_xy": float(weights @ (prices * quantities)),
+        "sum_xx": float(weights @ (prices * prices)),
+        "sum_yy": float(weights @ (quantities * quantities)),
+        "price_min": float(prices.min()) if len(prices) else None,
+        "price_max": float(prices.max()) if len(prices) else None,
+        "decay": float(decay),
+        "tail": history_tail(history),
+    }
+
+
+def update_history_stats(stats: HistoryStats, record: SaleRecord) -> HistoryStats:
+    """Acrescenta um registro às somas (no próprio dicionário), em O(1)."""
+    x = float(record["unit_price"])
+    y = float(record["quantity"])
+    decay = stats["decay"]
+    stats["count"] += 1
+    stats["n"] = stats["n"] * decay + 1.0
+    stats["sum_x"] = stats["sum_x"] * decay + x
+    stats["sum_y"] = stats["sum_y"] * decay + y
+    stats["sum_xy"] = stats["sum_xy"] * decay + x * y
+    stats["sum_xx"] = stats["sum_xx"] * decay + x * x
+    stats["sum_yy"] = stats["sum_yy"] * decay + y * y
+    stats["price_min"] = x if stats["price_min"] is None else min(stats["price_min"], x)
+    stats["price_max"] = x if stats["price_max"] is None else max(stats["price_max"], x)
+    stats["tail"] = [str(record["period"]), y, x]
+    return stats
+
+
+def stored_stats(
+    history: Sequence[SaleRecord], stats: Optional[HistoryStats]
+) -> Optional[HistoryStats]:
+    """
+    As somas guardadas, se ainda correspondem ao histórico (mesmo número de
+    registros e mesmo último registro, conferidos em O(1)); None quando
+    faltam ou ficaram desatualizadas, e o ajuste volta a ser feito pelo
+    histórico.
+    """
+    if stats is None or stats.get("count") != len(history):
+        return None
+    if stats.get("tail") != history_tail(history):
+        return None
+    return stats
+
+
+def product_stats(product: Dict[str, Any]) -> Optional[HistoryStats]:
+    return stored_stats(product.get("history", []), product.get(STATS_FIELD))
+
+
+def stats_decay(product: Dict[str, Any]) -> float:
+    """Fator de esquecimento em uso no produto (o padrão, se não houver somas)."""
+    return product.get(STATS_FIELD, {}).get("decay", DEFAULT_DECAY)
+
+
+def refresh_stats(product: Product, decay: Optional[float] = None) -> HistoryStats:
+    """
+    Recalcula as somas do produto a partir do histórico (ex.: depois de
+    substituí-lo por uma importação). Sem `decay`, mantém o fator atual.
+    """
+    if decay is None:
+        decay = stats_decay(product)
+    product[STATS_FIELD] = history_stats(product.get("history", []), decay)
+    return product[STATS_FIELD]
+
+
+def append_sale(
+    product: Product, record: SaleRecord, decay: Optional[float] = None
+) -> HistoryStats:
+    """
+    Acrescenta um mês de vendas ao produto e atualiza as somas em O(1).
+    Somas ausentes ou desatualizadas são recalculadas uma vez antes. Um
+    histórico lazy (imutável) vira uma lista nova.
+    """
+    stats = product_stats(product)
+    if stats is None or (decay is not None and stats["decay"] != decay):
+        stats = refresh_stats(product, decay)
+    history = product.get("history", [])
+    if not isinstance(history, list):
+        history = list(history)
+    history.append(record)
+    product["history"] = history
+    update_history_stats(stats, record)
+    return stats
+
+
+def regression_from_stats(stats: HistoryStats) -> Tuple[float, float]:
+    """Inclinação (elasticidade) e intercepto dos mínimos quadrados ponderados."""
+    n = stats["n"]
+    sxx = stats["sum_xx"] - stats["sum_x"] * stats["sum_x"] / n
+    sxy = stats["sum_xy"] - stats["sum_x"] * stats["sum_y"] / n
+    elasticity = sxy / sxx
+    intercept = (stats["sum_y"] - elasticity * stats["sum_x"]) / n
+    return elasticity, intercept
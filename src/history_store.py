@@ -0,0 +1,221 @@
+"""
+Snapshot colunar do histórico de vendas, lido via memory-map.
+
+Cada snapshot é um diretório (ex.: store_history/v3) com:
+
+- offsets.npy: int64, n_produtos + 1 posições; o histórico do produto i
+  ocupa as linhas [offsets[i], offsets[i + 1]) das colunas abaixo;
+- period.npy, quantity.npy, unit_price.npy: as colunas de todos os
+  produtos concatenadas, em ordem cronológica dentro de cada produto;
+- meta.json: versão do histórico, geração do banco, ids dos produtos (na
+  ordem de offsets) e número de registros de cada um.
+
+O meta.json é sempre gravado por último: um snapshot interrompido no meio
+não tem meta e é refeito na próxima leitura. As contagens do meta também
+são conferidas com offsets.npy ao abrir.
+"""
+
+import json
+import os
+import shutil
+from collections.abc import Sequence
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from src.models import SaleRecord
+
+META_FILE = "meta.json"
+
+
+class HistoryStore:
+    """
+    Histórico de vendas de todo o catálogo em colunas NumPy (período,
+    quantidade, preço unitário), mapeadas em memória a partir de arquivos
+    .npy. O histórico de cada SKU é uma fatia [início, fim) das colunas.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.version = meta["version"]
+        self.generation = meta["generation"]
+        self.counts = [int(n) for n in meta["counts"]]
+        self._rows = {pid: i for i, pid in enumerate(meta["ids"])}
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+        if len(self.counts) != len(self._rows) or not np.array_equal(
+            np.diff(self.offsets), self.counts
+        ):
+            raise ValueError(f"Snapshot inconsistente em {directory}")
+        self.periods = np.load(os.path.join(directory, "period.npy"), mmap_mode="r")
+        self.quantities = np.load(
+            os.path.join(directory, "quantity.npy"), mmap_mode="r"
+        )
+        self.prices = np.load(os.path.join(directory, "unit_price.npy"), mmap_mode="r")
+
+    @staticmethod
+    def write(
+        directory: str,
+        version: int,
+        rows: Iterable[Tuple[str, str, int, float]],
+        generation: str = "",
+    ) -> "HistoryStore":
+        """
+        Grava um novo snapshot a partir de linhas (product_id, período,
+        quantidade, preço) já agrupadas por produto e em ordem cronológica.
+        `generation` identifica o banco de origem.
+        """
+        ids: List[str] = []
+        counts: List[int] = []
+        periods: List[str] = []
+        quantities: List[int] = []
+        prices: List[float] = []
+
+        for pid, period, qty, price in rows:
+            if not ids or ids[-1] != pid:
+                ids.append(pid)
+                counts.append(0)
+            counts[-1] += 1
+            periods.append(period)
+            quantities.append(qty)
+            prices.append(price)
+
+        os.makedirs(directory, exist_ok=True)
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        np.save(os.path.join(directory, "offsets.npy"), offsets)
+        np.save(os.path.join(directory, "period.npy"), np.array(periods, dtype=np.str_))
+        np.save(
+            os.path.join(directory, "quantity.npy"),
+            np.array(quantities, dtype=np.int64),
+        )
+        np.save(
+            os.path.join(directory, "unit_price.npy"),
+            np.array(prices, dtype=np.float64),
+        )
+        # O meta é gravado por último: sem ele o snapshot não é considerado válido
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": version,
+                    "generation": generation,
+                    "ids": ids,
+                    "counts": counts,
+                },
+                f,
+            )
+        return HistoryStore(directory)
+
+    @property
+    def product_ids(self) -> List[str]:
+        return list(self._rows)
+
+    def layout(self) -> List[Tuple[str, int]]:
+        """Pares (product_id, nº de registros), na ordem do snapshot."""
+        return list(zip(self._rows, self.counts))
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._rows
+
+    def _bounds(self, product_id: str) -> Tuple[int, int]:
+        row = self._rows.get(product_id)
+        if row is None:
+            return 0, 0
+        return int(self.offsets[row]), int(self.offsets[row + 1])
+
+    def length(self, product_id: str) -> int:
+        start, end = self._bounds(product_id)
+        return end - start
+
+    def columns(self, product_id: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Fatias (sem cópia) de período, quantidade e preço de um SKU."""
+        start, end = self._bounds(product_id)
+        return (
+            self.periods[start:end],
+            self.quantities[start:end],
+            self.prices[start:end],
+        )
+
+    def records(self, product_id: str) -> List[SaleRecord]:
+        periods, quantities, prices = self.columns(product_id)
+        return [
+            {"period": str(per), "quantity": int(qty), "unit_price": float(price)}
+            for per, qty, price in zip(periods, quantities, prices)
+        ]
+
+    def history(self, product_id: str) -> "LazyHistory":
+        return LazyHistory(self, product_id)
+
+
+class LazyHistory(Sequence):
+    """
+    Histórico de um produto que só é lido do snapshot colunar quando usado.
+    `len()` não toca nos dados; iterar/indexar materializa os registros uma
+    vez. É imutável: para editar, substitua por uma lista nova.
+
+    `version` é a versão do histórico do banco em que estes registros ainda
+    valem: começa na do snapshot e avança quando uma gravação muda o
+    histórico de outros produtos, mas não o deste.
+    """
+
+    def __init__(self, store: HistoryStore, product_id: str):
+        self.store = store
+        self.product_id = product_id
+        self.version = store.version
+        self._records: Optional[List[SaleRecord]] = None
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.store.columns(self.product_id)
+
+    def _materialize(self) -> List[SaleRecord]:
+        if self._records is None:
+            self._records = self.store.records(self.product_id)
+        return self._records
+
+    def __len__(self) -> int:
+        if self._records is not None:
+            return len(self._records)
+        return self.store.length(self.product_id)
+
+    def __getitem__(self, index):
+        return self._materialize()[index]
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, LazyHistory)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LazyHistory({self.product_id!r}, {len(self)} registros)"
+
+
+def history_columns(history: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """Preços e quantidades de um histórico, seja lista de registros ou lazy."""
+    if isinstance(history, LazyHistory) and history._records is None:
+        _, quantities, prices = history.columns()
+        return prices, quantities
+    n = len(history)
+    prices = np.fromiter((r["unit_price"] for r in history), dtype=np.float64, count=n)
+    quantities = np.fromiter(
+        (r["quantity"] for r in history), dtype=np.float64, count=n
+    )
+    return prices, quantities
+
+
+def history_periods(history: Sequence) -> np.ndarray:
+    """Períodos de um histórico (ex.: "jan", "fev"), na ordem dos registros."""
+    if isinstance(history, LazyHistory) and history._records is None:
+        return np.asarray(history.columns()[0], dtype=np.str_)
+    return np.array([str(r["period"]) for r in history], dtype=np.str_)
+
+
+def prune_snapshots(root: str, keep: str) -> None:
+    """Remove snapshots antigos (quem ainda os tem mapeados continua funcionando)."""
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if path != keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,247 @@
+"""
+Importação em lote de históricos de vendas.
+
+Aceita um diretório ou um ZIP de CSVs por produto (ex.: `blusa.csv`,
+`tenis.csv`, com colunas `mes,quantidade,valor`) ou um único CSV longo com
+uma coluna de produto. Os arquivos são lidos em blocos e validados por
+coluna; o resultado é aplicado ao catálogo e gravado de uma só vez.
+
+Uso:
+    python -m src.importer caminho/para/historicos[.zip|.csv]
+"""
+
+import os
+import sys
+import unicodedata
+import zipfile
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from src.models import Product, SaleRecord
+from src.history_stats import refresh_stats
+
+HISTORY_COLUMNS = ("mes", "quantidade", "valor")
+# Nomes aceitos para a coluna de produto no formato longo
+PRODUCT_COLUMNS = ("produto", "sku", "product", "id")
+# Linhas lidas por bloco: arquivos grandes nunca são carregados inteiros
+CHUNK_ROWS = 100_000
+
+Source = Union[str, BinaryIO]
+
+
+def normalize_name(name: Any) -> str:
+    """Chave de comparação: sem acentos, minúsculas e sem espaços nas pontas."""
+    text = unicodedata.normalize("NFKD", str(name))
+    return "".join(c for c in text if not unicodedata.combining(c)).strip().lower()
+
+
+def _validate_chunk(
+    df: pd.DataFrame, source: str, errors: List[str], product_col: Optional[str]
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Valida o bloco coluna a coluna: o mês não pode estar vazio, a quantidade
+    precisa ser um número inteiro e o valor numérico e, no formato longo, o
+    produto não pode estar vazio. Retorna o bloco com colunas normalizadas
+    e a máscara de linhas válidas.
+    """
+    quantity = pd.to_numeric(df["quantidade"], errors="coerce")
+    price = pd.to_numeric(df["valor"], errors="coerce")
+    period = df["mes"].fillna("").astype(str).str.strip()
+    ok = (
+        np.isfinite(quantity)
+        & (quantity == np.floor(quantity))
+        & np.isfinite(price)
+        & (period != "")
+    ).to_numpy()
+
+    clean = pd.DataFrame(
+        {
+            "period": period,
+            "quantity": quantity.where(ok, 0).astype(np.int64),
+            "unit_price": price.where(ok, 0.0).astype(np.float64),
+        }
+    )
+    if product_col is not None:
+        clean["key"] = df[product_col].fillna("").astype(str).str.strip()
+        ok = ok & (clean["key"] != "").to_numpy()
+
+    bad = int((~ok).sum())
+    if bad:
+        errors.append(f"{source}: {bad} linha(s) inválida(s) ignorada(s).")
+    return clean, ok
+
+
+def _records(df: pd.DataFrame) -> List[SaleRecord]:
+    return [
+        {"period": per, "quantity": qty, "unit_price": price}
+        for per, qty, price in zip(
+            df["period"].tolist(), df["quantity"].tolist(), df["unit_price"].tolist()
+        )
+    ]
+
+
+def _read_csv_source(
+    file: Source,
+    name: str,
+    histories: Dict[str, List[SaleRecord]],
+    errors: List[str],
+    chunksize: int,
+    split_products: bool = True,
+) -> int:
+    """
+    Lê um CSV em blocos. Com coluna de produto, cada linha vai para o seu
+    produto (formato longo); sem ela (ou com `split_products=False`), o
+    arquivo inteiro é o histórico do produto com o nome do arquivo.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    rows = 0
+    product_col = None
+    try:
+        reader = pd.read_csv(file, chunksize=chunksize, dtype=str)
+        for i, chunk in enumerate(reader):
+            chunk.columns = [str(c).strip().lower() for c in chunk.columns]
+            if i == 0:
+                missing = [c for c in HISTORY_COLUMNS if c not in chunk]
+                if missing:
+                    errors.append(
+                        f"{name}: colunas obrigatórias ausentes ({', '.join(missing)})."
+                    )
+                    return 0
+                if split_products:
+                    product_col = next((c for c in PRODUCT_COLUMNS if c in chunk), None)
+                if product_col is None:
+                    histories[stem] = []
+
+            clean, ok = _validate_chunk(chunk, name, errors, product_col)
+            clean = clean[ok]
+            rows += len(clean)
+
+            if product_col is None:
+                histories[stem].extend(_records(clean))
+                continue
+
+            # Agrupa por produto com uma ordenação estável (mantém a ordem
+            # cronológica do arquivo) e fatia os registros de cada grupo
+            codes, keys = pd.factorize(clean["key"])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+            records = _records(clean.iloc[order])
+            for k, key in enumerate(keys):
+                histories.setdefault(key, []).extend(records[bounds[k] : bounds[k + 1]])
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        errors.append(f"{name}: arquivo ilegível ({e}).")
+    return rows
+
+
+def read_history_csv(
+    file: Source, name: str = "", chunksize: int = CHUNK_ROWS
+) -> Tuple[List[SaleRecord], List[str]]:
+    """Histórico de um único produto (upload por linha do catálogo)."""
+    histories: Dict[str, List[SaleRecord]] = {}
+    errors: List[str] = []
+    name = name or getattr(file, "name", "historico.csv")
+    _read_csv_source(file, name, histories, errors, chunksize, split_products=False)
+    records = next(iter(histories.values()), [])
+    return records, errors
+
+
+def import_histories(
+    source: Source, name: str = "", chunksize: int = CHUNK_ROWS
+) -> Dict[str, Any]:
+    """
+    Lê todos os históricos de `source` (caminho de diretório, ZIP ou CSV, ou
+    um arquivo aberto; para arquivos abertos `name` indica a extensão).
+
+    Retorna {"histories": {produto: registros}, "errors": [...],
+    "files": n, "rows": n}.
+    """
+    histories: Dict[str, List[SaleRecord]] = {}
+    errors: List[str] = []
+    files = rows = 0
+    name = name or (source if isinstance(source, str) else getattr(source, "name", ""))
+
+    if isinstance(source, str) and os.path.isdir(source):
+        for entry in sorted(os.listdir(source)):
+            if entry.lower().endswith(".csv"):
+                files += 1
+                rows += _read_csv_source(
+                    os.path.join(source, entry), entry, histories, errors, chunksize
+                )
+    elif name.lower().endswith(".zip"):
+        try:
+            archive = zipfile.ZipFile(source)
+        except zipfile.BadZipFile:
+            errors.append(f"{name}: arquivo ZIP inválido.")
+        else:
+            with archive:
+                for member in sorted(archive.namelist()):
+                    base = os.path.basename(member)
+                    if not base.lower().endswith(".csv") or member.startswith(
+                        "__MACOSX"
+                    ):
+                        continue
+                    files += 1
+                    try:
+                        with archive.open(member) as f:
+                            rows += _read_csv_source(
+                                f, base, histories, errors, chunksize
+                            )
+                    except zipfile.BadZipFile as e:
+                        # Membro corrompido (ex.: CRC): os demais seguem
+                        errors.append(f"{base}: arquivo ilegível ({e}).")
+    else:
+        files = 1
+        rows = _read_csv_source(source, name, histories, errors, chunksize)
+
+    return {"histories": histories, "errors": errors, "files": files, "rows": rows}
+
+
+def apply_histories(
+    products: List[Product], histories: Dict[str, List[SaleRecord]]
+) -> Dict[str, List[str]]:
+    """
+    Substitui o histórico dos produtos encontrados (por id ou por nome, sem
+    diferenciar acentos/maiúsculas) e recalcula as somas da regressão
+    guardadas com ele. Retorna os nomes e ids atualizados e as chaves sem
+    produto correspondente.
+    """
+    by_key: Dict[str, Product] = {}
+    for p in products:
+        by_key.setdefault(normalize_name(p["name"]), p)
+    for p in products:
+        by_key.setdefault(normalize_name(p["id"]), p)
+
+    matched, matched_ids, unmatched = [], [], []
+    for key, records in histories.items():
+        prod = by_key.get(normalize_name(key))
+        if prod is None:
+            unmatched.append(key)
+            continue
+        prod["history"] = records
+        refresh_stats(prod)
+        matched.append(prod["name"])
+        matched_ids.append(prod["id"])
+    return {"matched": matched, "matched_ids": matched_ids, "unmatched": unmatched}
+
+
+if __name__ == "__main__":
+    from src.persistence import load_state, save_state
+
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+
+    result = import_histories(sys.argv[1])
+    state = load_state()
+    applied = apply_histories(state["products"], result["histories"])
+    if applied["matched"]:
+        save_state(state)
+
+    print(
+        f"{result['files']} arquivo(s), {result['rows']} linha(s) lida(s); "
+        f"{len(applied['matched'])} produto(s) atualizado(s)."
+    )
+    for key in applied["unmatched"]:
+        print(f"Sem produto correspondente: {key}")
+    for msg in result["errors"]:
+        print(msg)
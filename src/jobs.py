@@ -0,0 +1,178 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from src.models import Product
+from src.plan_cache import PlanCache
+from src.solver import DEFAULT_BACKEND, OptimizationCancelled, optimize_purchasing_plan
+
+# Estados de um job: "pending" -> "running" -> "done" | "cancelled" | "failed"
+JOB_FINISHED = ("done", "cancelled", "failed")
+
+# Etapas exibidas no acompanhamento, na ordem em que acontecem
+JOB_STAGES = {
+    "plan_cache": "Consultando planos já calculados",
+    "demand_estimation": "Estimando demanda",
+    "model_build": "Montando o modelo",
+    "solve": "Resolvendo",
+    "extraction": "Extraindo o plano",
+}
+
+
+class OptimizationJob:
+    """
+    Executa `optimize_purchasing_plan` numa thread em segundo plano, para
+    que a interface continue respondendo enquanto o solver trabalha.
+
+    O progresso (etapa atual e produtos processados na estimativa de
+    demanda) vem dos eventos do gancho de diagnóstico. O cancelamento é
+    cooperativo: a thread para no próximo ponto de checagem, mas o job já
+    é marcado como cancelado na hora e o resultado que chegar depois é
+    descartado.
+
+    Os produtos são copiados (cópia rasa) na criação: edições feitas no
+    catálogo durante a execução não afetam o cálculo em andamento.
+    """
+
+    def __init__(
+        self,
+        products: List[Product],
+        budget: float,
+        risk_appetite: float,
+        backend: str = DEFAULT_BACKEND,
+        time_limit: Optional[float] = None,
+        mip_gap: float = 0.0,
+        plan_cache: Optional[PlanCache] = None,
+    ):
+        self.products = [dict(p) for p in products]
+        self.budget = budget
+        self.risk_appetite = risk_appetite
+        self.backend = backend
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.plan_cache = plan_cache
+
+        self.state = "pending"
+        self.stage: Optional[str] = None
+        self.done = 0
+        self.total = len(self.products)
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="profitmax-optimize", daemon=True
+        )
+
+    # ------------------------------------------------------------------
+    # Controle
+    # ------------------------------------------------------------------
+
+    def start(self) -> "OptimizationJob":
+        self.started_at = time.perf_counter()
+        self.state = "running"
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        with self._lock:
+            if self.state in ("pending", "running"):
+                self.state = "cancelled"
+                self.finished_at = time.perf_counter()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera a thread terminar; devolve True se ela terminou."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in JOB_FINISHED
+
+    # ------------------------------------------------------------------
+    # Execução (thread de trabalho)
+    # ------------------------------------------------------------------
+
+    def _hook(self, event: str, name: str, value: Any) -> None:
+        if event == "stage_start":
+            self.stage = name
+        elif event == "progress":
+            self.done, self.total = value
+
+    def _run(self) -> None:
+        try:
+            result = optimize_purchasing_plan(
+                self.products,
+                self.budget,
+                self.risk_appetite,
+                self.backend,
+                hook=self._hook,
+                time_limit=self.time_limit,
+                mip_gap=self.mip_gap,
+                cancelled=self._cancel.is_set,
+                plan_cache=self.plan_cache,
+            )
+        except OptimizationCancelled:
+            result, error = None, None
+        except Exception as e:
+            result, error = None, e
+        else:
+            error = None
+
+        with self._lock:
+            if self.state != "running":
+                # Cancelado enquanto o solver terminava: descarta o resultado
+                return
+            self.finished_at = time.perf_counter()
+            if error is not None:
+                self.error = error
+                self.state = "failed"
+            elif result is None:
+                self.state = "cancelled"
+            else:
+                self.result = result
+                self.state = "done"
+
+    # ------------------------------------------------------------------
+    # Acompanhamento
+    # ------------------------------------------------------------------
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at or time.perf_counter()
+        return end - self.started_at
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Retrato do andamento: {"state", "stage", "label", "done", "total",
+        "fraction", "elapsed"}. `fraction` (0-1) cobre a estimativa de
+        demanda; nas etapas seguintes fica em 1.
+        """
+        stage = self.stage
+        if stage == "demand_estimation":
+            fraction = self.done / self.total if self.total else 1.0
+            label = f"{JOB_STAGES[stage]} ({self.done}/{self.total} produtos)"
+        elif stage is None:
+            fraction = 0.0
+            label = "Iniciando"
+        elif stage == "plan_cache":
+            fraction = 0.0
+            label = JOB_STAGES[stage]
+        else:
+            fraction = 1.0
+            label = JOB_STAGES.get(stage, stage)
+            if stage == "solve" and self.time_limit:
+                label += f" (limite de {self.time_limit:g}s)"
+        return {
+            "state": self.state,
+            "stage": stage,
+            "label": label,
+            "done": self.done,
+            "total": self.total,
+            "fraction": fraction,
+            "elapsed": self.elapsed(),
+        }
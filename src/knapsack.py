@@ -0,0 +1,415 @@
+import math
+from typing import Callable, Optional, Tuple
+import numpy as np
+
+# Limite de estados da programação dinâmica do núcleo. Se estourar, o
+# chamador deve recorrer a um solver MILP genérico (status "Not Solved").
+DEFAULT_STATE_LIMIT = 200_000
+# Tamanho do núcleo da primeira passada (busca de um bom incumbente)
+FIRST_PASS_CORE = 32
+
+# Consultado a cada camada da programação dinâmica; quando devolve True a
+# busca para e a melhor solução conhecida volta com status "Stopped"
+StopCheck = Callable[[], bool]
+
+
+def solve_bounded_knapsack(
+    value: np.ndarray,
+    weight: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    capacity: float,
+    state_limit: int = DEFAULT_STATE_LIMIT,
+    mip_gap: float = 0.0,
+    should_stop: Optional[StopCheck] = None,
+) -> Tuple[str, np.ndarray]:
+    """
+    Mochila limitada com mínimos obrigatórios, resolvida de forma exata:
+
+        max  sum(value * x)
+        s.a. sum(weight * x) <= capacity,  lower <= x <= upper,  x inteiro
+
+    Retorna (status, quantidades) com status "Optimal", "Infeasible",
+    "Not Solved" (limite de estados) ou "Stopped" (`should_stop` pediu
+    para parar). Nos dois últimos a quantidade devolvida é a melhor
+    conhecida. Com `mip_gap` > 0, "Optimal" significa a no máximo essa
+    distância relativa do ótimo.
+    """
+    knapsack = BoundedKnapsack(value, weight, lower, upper)
+    return knapsack.solve(
+        capacity, state_limit=state_limit, mip_gap=mip_gap, should_stop=should_stop
+    )
+
+
+class BoundedKnapsack:
+    """
+    Mochila preparada uma vez (mínimos fixados, itens ordenados por razão
+    lucro/custo) e resolvida para várias capacidades.
+
+    1. Fixa os mínimos (lower) e detecta falta de orçamento sem solver.
+    2. Preenche por razão lucro/custo (guloso) e calcula o limite da
+       relaxação linear (Dantzig).
+    3. Fixa pelos limites os itens que não podem melhorar a melhor solução
+       conhecida e resolve o "núcleo" restante (em torno do item
+       fracionário) por programação dinâmica com poda pelo limite linear.
+    """
+
+    def __init__(
+        self,
+        value: np.ndarray,
+        weight: np.ndarray,
+        lower: np.ndarray,
+        upper: np.ndarray,
+    ):
+        value = np.asarray(value, dtype=np.float64)
+        weight = np.asarray(weight, dtype=np.float64)
+        lower = np.rint(np.asarray(lower, dtype=np.float64)).astype(np.int64)
+        upper = np.rint(np.asarray(upper, dtype=np.float64)).astype(np.int64)
+
+        # --- 1. MÍNIMOS OBRIGATÓRIOS ---
+        room = upper - lower
+        gain = (value > 0) & (room > 0)
+
+        # Itens lucrativos sem custo entram sempre no máximo
+        free = gain & (weight <= 0)
+        self.base = lower.copy()
+        self.base[free] = upper[free]
+        self.base_cost = float(np.dot(weight, lower)) + float(
+            np.dot(weight[free], room[free])
+        )
+        self.min_cost = float(np.dot(weight, lower))
+
+        # --- 2. ORDEM POR RAZÃO LUCRO / CUSTO ---
+        cand = np.flatnonzero(gain & (weight > 0))
+        ratio = value[cand] / weight[cand]
+        self.order = cand[np.argsort(-ratio, kind="stable")]
+        self.w = weight[self.order]
+        self.v = value[self.order]
+        self.u = room[self.order]
+        self.r = self.v / self.w if self.order.size else np.zeros(0)
+        self.filled = np.cumsum(self.w * self.u)
+        self.value = value
+
+    def solve(
+        self,
+        capacity: float,
+        warm_start: Optional[np.ndarray] = None,
+        state_limit: int = DEFAULT_STATE_LIMIT,
+        mip_gap: float = 0.0,
+        should_stop: Optional[StopCheck] = None,
+    ) -> Tuple[str, np.ndarray]:
+        """
+        Resolve para a capacidade dada. `warm_start` é uma solução viável
+        conhecida (ex.: a ótima de um orçamento menor), usada como limite
+        inferior inicial quando for melhor que a gulosa.
+        """
+        tol = 1e-6 + 1e-12 * abs(capacity)
+        x = self.base.copy()
+        if capacity - self.min_cost < -tol:
+            return "Infeasible", x
+
+        remaining = capacity - self.base_cost
+        w, v, u, r = self.w, self.v, self.u, self.r
+        if self.order.size == 0:
+            return "Optimal", x
+
+        brk = int(np.searchsorted(self.filled, remaining + tol, side="right"))
+        if brk == self.order.size:
+            x[self.order] += u
+            return "Optimal", x
+
+        # Solução gulosa inteira (limite inferior): itens antes do corte cheios,
+        # depois completa com o que couber, na ordem das razões
+        greedy = np.zeros(self.order.size, dtype=np.int64)
+        greedy[:brk] = u[:brk]
+        cap = remaining - (float(self.filled[brk - 1]) if brk > 0 else 0.0)
+        for j in range(brk, self.order.size):
+            if cap < w[j] - tol:
+                continue
+            q = min(int(u[j]), int(math.floor((cap + tol) / w[j])))
+            greedy[j] = q
+            cap -= q * w[j]
+        incumbent = greedy
+        best_value = float(np.dot(v, greedy))
+
+        if warm_start is not None:
+            warm = np.clip(
+                np.asarray(warm_start, dtype=np.int64)[self.order]
+                - self.base[self.order],
+                0,
+                u,
+            )
+            warm_value = float(np.dot(v, warm))
+            if float(np.dot(w, warm)) <= remaining + tol and warm_value > best_value:
+                incumbent = warm
+                best_value = warm_value
+
+        # Limite superior da relaxação linear
+        prev = float(self.filled[brk - 1]) if brk > 0 else 0.0
+        z_lp = float(np.dot(v[:brk], u[:brk])) + (remaining - prev) * r[brk]
+
+        # Tolerância de gap: estados que não superam o incumbente em mais que
+        # isso são podados. Medida sobre o incumbente inicial, que só cresce
+        gap_tol = mip_gap * abs(best_value + float(np.dot(self.value, self.base)))
+        if z_lp - best_value <= gap_tol:
+            x[self.order] += incumbent
+            return "Optimal", x
+
+        # --- 3. REDUÇÃO + NÚCLEO ---
+        # Tirar uma unidade de um item antes do corte (ou pôr uma depois dele)
+        # custa pelo menos w_j * |r_j - r_corte| no limite linear
+        eps = 1e-7 + 1e-12 * abs(best_value)
+        distance = w * np.abs(r - r[brk])
+        core = np.flatnonzero(z_lp - distance > best_value + eps + gap_tol)
+        core = np.union1d(core, [brk])
+
+        # Núcleo grande: primeiro resolve só os itens mais próximos do corte
+        # para obter um incumbente forte, que encolhe o núcleo na redução
+        if core.size > FIRST_PASS_CORE:
+            near = core[np.argsort(distance[core], kind="stable")[:FIRST_PASS_CORE]]
+            first_status, chosen = self._solve_subset(
+                np.sort(near),
+                brk,
+                remaining,
+                incumbent,
+                best_value,
+                eps,
+                tol,
+                state_limit,
+                gap_tol,
+                should_stop,
+            )
+            if chosen is not None:
+                incumbent = chosen
+                best_value = float(np.dot(v, chosen))
+                core = np.flatnonzero(z_lp - distance > best_value + eps + gap_tol)
+                core = np.union1d(core, [brk])
+            if first_status == "Stopped":
+                x[self.order] += incumbent
+                return first_status, x
+
+        status, chosen = self._solve_subset(
+            core,
+            brk,
+            remaining,
+            incumbent,
+            best_value,
+            eps,
+            tol,
+            state_limit,
+            gap_tol,
+            should_stop,
+        )
+        if chosen is None:
+            # Nenhuma solução estritamente melhor que a incumbente
+            chosen = incumbent
+
+        x[self.order] += chosen
+        return status, x
+
+    def _solve_subset(
+        self,
+        core: np.ndarray,
+        brk: int,
+        remaining: float,
+        incumbent: np.ndarray,
+        best_value: float,
+        eps: float,
+        tol: float,
+        state_limit: int,
+        gap_tol: float = 0.0,
+        should_stop: Optional[StopCheck] = None,
+    ) -> Tuple[str, Optional[np.ndarray]]:
+        """
+        Resolve exatamente o núcleo `core` com os demais itens fixos na
+        solução de corte (cheios antes do corte, vazios depois).
+        """
+        w, v, u = self.w, self.v, self.u
+        fixed_full = np.zeros(u.size, dtype=bool)
+        fixed_full[:brk] = True
+        fixed_full[core] = False
+        core_cap = remaining - float(np.dot(w[fixed_full], u[fixed_full]))
+        fixed_value = float(np.dot(v[fixed_full], u[fixed_full]))
+
+        status, core_x = _solve_core(
+            v[core],
+            w[core],
+            u[core],
+            int(np.count_nonzero(core < brk)),
+            core_cap,
+            best_value - fixed_value,
+            eps,
+            tol,
+            state_limit,
+            gap_tol,
+            should_stop,
+        )
+        if core_x is None:
+            return status, None
+
+        chosen = np.where(fixed_full, u, 0)
+        chosen[core] = core_x
+        return status, chosen
+
+
+def _solve_core(
+    v: np.ndarray,
+    w: np.ndarray,
+    u: np.ndarray,
+    split: int,
+    capacity: float,
+    incumbent: float,
+    eps: float,
+    tol: float,
+    state_limit: int,
+    gap_tol: float = 0.0,
+    should_stop: Optional[StopCheck] = None,
+) -> Tuple[str, Optional[np.ndarray]]:
+    """
+    Programação dinâmica sobre o núcleo, expandindo a partir do item de corte.
+
+    Os itens vêm ordenados por razão; os `split` primeiros começam cheios
+    (solução de corte) e os demais vazios. Cada item limitado vira blocos
+    0/1 de 1, 2, 4, ... unidades, processados do mais próximo para o mais
+    distante da razão de corte: à esquerda um bloco pode ser retirado, à
+    direita pode ser incluído. Os estados (custo, lucro) formam uma
+    fronteira de Pareto e são podados pelo limite linear em relação à
+    próxima razão ainda não processada de cada lado. Estados acima da
+    capacidade são mantidos, pois retiradas futuras podem viabilizá-los.
+    Com `gap_tol` > 0 a poda descarta também quem só poderia superar o
+    melhor lucro conhecido por até `gap_tol`.
+
+    Retorna (status, quantidades do núcleo) ou (status, None) se nenhuma
+    solução estritamente melhor que `incumbent` existir.
+    """
+    ratio = v / w
+
+    # Blocos 0/1 de cada lado, do mais próximo para o mais distante do corte
+    def blocks(items):
+        owner, units = [], []
+        for i in items:
+            count, size = int(u[i]), 1
+            while count > 0:
+                take = min(size, count)
+                owner.append(i)
+                units.append(take)
+                count -= take
+                size *= 2
+        return owner, units
+
+    left_owner, left_units = blocks(range(split - 1, -1, -1))
+    right_owner, right_units = blocks(range(split, u.size))
+
+    # Intercala os dois lados pela distância até a razão de corte
+    r_cut = ratio[split]
+    owner, units, sign = [], [], []
+    li = ri = 0
+    while li < len(left_owner) or ri < len(right_owner):
+        take_left = ri >= len(right_owner) or (
+            li < len(left_owner)
+            and ratio[left_owner[li]] - r_cut <= r_cut - ratio[right_owner[ri]]
+        )
+        if take_left:
+            owner.append(left_owner[li])
+            units.append(left_units[li])
+            sign.append(-1)
+            li += 1
+        else:
+            owner.append(right_owner[ri])
+            units.append(right_units[ri])
+            sign.append(1)
+            ri += 1
+
+    m = len(owner)
+    owner = np.asarray(owner, dtype=np.int64)
+    units = np.asarray(units, dtype=np.int64)
+    sign = np.asarray(sign, dtype=np.int64)
+    cw = sign * w[owner] * units
+    cv = sign * v[owner] * units
+
+    # Próxima razão ainda não processada de cada lado, após o bloco k
+    next_left = np.full(m + 1, np.inf)
+    next_right = np.zeros(m + 1)
+    for k in range(m - 1, -1, -1):
+        next_left[k] = ratio[owner[k]] if sign[k] < 0 else next_left[k + 1]
+        next_right[k] = ratio[owner[k]] if sign[k] > 0 else next_right[k + 1]
+
+    weights = np.array([float(np.dot(w[:split], u[:split]))])
+    profits = np.array([float(np.dot(v[:split], u[:split]))])
+    parents = []
+    takes = []
+    best = incumbent
+    best_at = None
+    status = "Optimal"
+
+    for k in range(m):
+        # Expande: cada estado pode ou não mover o bloco k
+        new_w = np.concatenate((weights, weights + cw[k]))
+        new_p = np.concatenate((profits, profits + cv[k]))
+        parent = np.concatenate((np.arange(weights.size), np.arange(weights.size)))
+        took = np.repeat([False, True], weights.size)
+
+        # Dominância: ordenado por custo, só fica quem lucra mais que todos os mais baratos
+        idx = np.lexsort((-new_p, new_w))
+        new_w, new_p, parent, took = new_w[idx], new_p[idx], parent[idx], took[idx]
+        running = np.maximum.accumulate(new_p)
+        dominant = np.ones(new_p.size, dtype=bool)
+        dominant[1:] = new_p[1:] > running[:-1] + eps
+        new_w, new_p = new_w[dominant], new_p[dominant]
+        parent, took = parent[dominant], took[dominant]
+
+        feasible = new_w <= capacity + tol
+        if feasible.any():
+            top = int(np.argmax(np.where(feasible, new_p, -np.inf)))
+            if new_p[top] > best + eps:
+                best = float(new_p[top])
+                best_at = (k, top)
+
+        # Poda pelo limite linear em relação às próximas razões de cada lado
+        slack = capacity - new_w
+        with np.errstate(invalid="ignore"):
+            bound = np.where(
+                feasible,
+                new_p + slack * next_right[k + 1],
+                new_p + slack * next_left[k + 1],
+            )
+        alive = bound > best + eps + gap_tol
+
+        if best_at is not None and best_at[0] == k and not alive[best_at[1]]:
+            # Preserva o melhor estado para a reconstrução, fora da fronteira
+            keep_best = best_at[1]
+            alive_idx = np.flatnonzero(alive)
+            parents.append(np.append(parent[alive_idx], parent[keep_best]))
+            takes.append(np.append(took[alive_idx], took[keep_best]))
+            best_at = (k, alive_idx.size)
+        else:
+            if best_at is not None and best_at[0] == k:
+                best_at = (k, int(np.count_nonzero(alive[: best_at[1]])))
+            parents.append(parent[alive])
+            takes.append(took[alive])
+
+        weights = new_w[alive]
+        profits = new_p[alive]
+        if weights.size == 0:
+            break
+        if weights.size > state_limit:
+            status = "Not Solved"
+            break
+        if should_stop is not None and should_stop():
+            status = "Stopped"
+            break
+
+    if best_at is None:
+        return status, None
+
+    # Reconstrução: volta pelas camadas seguindo os pais
+    moved = np.zeros(u.size, dtype=np.int64)
+    layer, pos = best_at
+    while layer >= 0:
+        if takes[layer][pos]:
+            moved[owner[layer]] += units[layer]
+        pos = parents[layer][pos]
+        layer -= 1
+
+    chosen = np.where(np.arange(u.size) < split, u - moved, moved)
+    return status, chosen
@@ -0,0 +1,384 @@
+"""
+Planejamento de várias lojas/depósitos que compartilham o mesmo catálogo.
+
+O catálogo (custos, preços, histórico) e a estimativa de demanda ajustada
+sobre ele são compartilhados; cada `Location` guarda só o próprio orçamento,
+risco e os campos que diferem do catálogo (estoque, agendados, estimativa
+manual). Os planos das lojas são resolvidos em paralelo num pool de
+processos.
+
+No modo conjunto, além do orçamento de cada loja, há um orçamento
+corporativo compartilhado. O modelo conjunto é resolvido por relaxação
+lagrangiana: a restrição corporativa vira um preço por real investido
+(`lambda`), e cada loja resolve sozinha o seu subproblema com lucro
+unitário `lucro - lambda * custo`. O `lambda` é ajustado por bisseção até o
+investimento total caber no orçamento corporativo, e a sobra é redistribuída
+entre as lojas ao final. Cada iteração custa um subproblema por loja, então
+o tempo cresce linearmente com o número de lojas.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from src.models import Location, Product
+from src.analytics import calculate_optimal_price_and_demand_batch
+from src.solver import (
+    DEFAULT_BACKEND,
+    PLAN_STATUSES,
+    build_purchase_model,
+    estimate_demand,
+    plan_rows,
+    solve_plan,
+    solve_purchase_model,
+)
+
+# Campos que uma loja pode sobrescrever. Nenhum deles entra no ajuste da
+# curva de demanda, que por isso é calculado uma vez para todas as lojas.
+LOCATION_FIELDS = ("stock_on_hand", "min_order_qty", "manual_sales_estimate")
+
+# Iterações da bisseção do preço do orçamento corporativo
+JOINT_ITERATIONS = 40
+# Para antes quando o gap relativo entre o plano e o limite dual chega aqui
+JOINT_GAP = 1e-4
+
+
+def location_products(
+    products: List[Product], overrides: Dict[str, Dict[str, int]]
+) -> List[Product]:
+    """
+    Visão do catálogo de uma loja: só os produtos com override são copiados
+    (cópia rasa); os demais são os próprios dicionários do catálogo.
+    """
+    if not overrides:
+        return products
+    for fields in overrides.values():
+        unknown = set(fields) - set(LOCATION_FIELDS)
+        if unknown:
+            raise ValueError(
+                f"Campos não sobrescrevíveis por loja: {sorted(unknown)}. "
+                f"Opções: {LOCATION_FIELDS}"
+            )
+    return [
+        {**p, **overrides[p["id"]]} if p["id"] in overrides else p for p in products
+    ]
+
+
+def compact_overrides(
+    products: List[Product], location_catalog: List[Product]
+) -> Dict[str, Dict[str, int]]:
+    """Inverso de `location_products`: guarda só os campos que diferem do catálogo."""
+    base = {p["id"]: p for p in products}
+    overrides: Dict[str, Dict[str, int]] = {}
+    for p in location_catalog:
+        shared = base.get(p["id"])
+        if shared is None:
+            continue
+        diff = {
+            field: p[field]
+            for field in LOCATION_FIELDS
+            if field in p and p[field] != shared.get(field)
+        }
+        if diff:
+            overrides[p["id"]] = diff
+    return overrides
+
+
+def build_location_models(
+    products: List[Product], locations: Sequence[Location]
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Um modelo de compra por loja, com a demanda do catálogo estimada uma
+    única vez. Devolve os modelos e os produtos ignorados (sem dados) no
+    catálogo compartilhado.
+    """
+    estimates = calculate_optimal_price_and_demand_batch(products)
+    models = []
+    for loc in locations:
+        view = location_products(products, loc.get("overrides", {}))
+        demand = estimate_demand(view, estimates=estimates)
+        models.append(build_purchase_model(view, loc["risk_factor"], demand))
+    skipped = estimate_demand(products, estimates=estimates)["skipped"]
+    return models, skipped
+
+
+def _label(plan: Dict[str, Any], loc: Location) -> Dict[str, Any]:
+    plan["location"] = loc["id"]
+    plan["name"] = loc.get("name", loc["id"])
+    plan["budget"] = loc["budget"]
+    plan["risk"] = loc["risk_factor"]
+    return plan
+
+
+def _pool_size(tasks: int, max_workers: Optional[int]) -> int:
+    return max(1, min(tasks, max_workers or os.cpu_count() or 1))
+
+
+def optimize_locations(
+    products: List[Product],
+    locations: Sequence[Location],
+    backend: str = DEFAULT_BACKEND,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Plano independente para cada loja, cada uma com o próprio orçamento.
+    Os modelos são resolvidos em paralelo (um processo por núcleo, até o
+    número de lojas); `max_workers=1` resolve tudo no processo atual.
+    """
+    models, skipped = build_location_models(products, locations)
+    budgets = [loc["budget"] for loc in locations]
+
+    workers = _pool_size(len(models), max_workers)
+    if workers <= 1:
+        plans = [solve_plan(m, b, backend) for m, b in zip(models, budgets)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            plans = list(pool.map(solve_plan, models, budgets, [backend] * len(models)))
+
+    return {
+        "locations": [_label(plan, loc) for plan, loc in zip(plans, locations)],
+        "skipped": skipped,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Modo conjunto (orçamento corporativo compartilhado)
+# ---------------------------------------------------------------------------
+
+# Modelos das lojas de cada processo do pool, enviados uma única vez na
+# criação do worker em vez de a cada iteração da bisseção
+_WORKER_MODELS: List[Dict[str, Any]] = []
+
+
+def _init_worker(models: List[Dict[str, Any]]) -> None:
+    global _WORKER_MODELS
+    _WORKER_MODELS = models
+
+
+def _priced_model(model: Dict[str, Any], price: float) -> Dict[str, Any]:
+    return {**model, "unit_profit": model["unit_profit"] - price * model["cost"]}
+
+
+def _solve_shard(
+    price: float,
+    indices: Sequence[int],
+    budgets: Sequence[float],
+    backend: str,
+    models: Optional[List[Dict[str, Any]]] = None,
+) -> List[Tuple[str, np.ndarray]]:
+    """Subproblemas lagrangianos de um grupo de lojas para o preço `price`."""
+    models = _WORKER_MODELS if models is None else models
+    return [
+        solve_purchase_model(_priced_model(models[i], price), budgets[i], backend)
+        for i in indices
+    ]
+
+
+class _SubproblemRunner:
+    """Resolve os subproblemas de todas as lojas, em paralelo quando há pool."""
+
+    def __init__(
+        self,
+        models: List[Dict[str, Any]],
+        budgets: List[float],
+        backend: str,
+        pool: Optional[ProcessPoolExecutor],
+        workers: int,
+    ):
+        self.models = models
+        self.budgets = budgets
+        self.backend = backend
+        self.pool = pool
+        self.shards = [
+            list(s) for s in np.array_split(np.arange(len(models)), workers) if s.size
+        ]
+
+    def __call__(self, price: float) -> List[Tuple[str, np.ndarray]]:
+        if self.pool is None:
+            return _solve_shard(
+                price, range(len(self.models)), self.budgets, self.backend, self.models
+            )
+        futures = [
+            self.pool.submit(_solve_shard, price, shard, self.budgets, self.backend)
+            for shard in self.shards
+        ]
+        return [sol for future in futures for sol in future.result()]
+
+
+def optimize_locations_joint(
+    products: List[Product],
+    locations: Sequence[Location],
+    corporate_budget: float,
+    backend: str = DEFAULT_BACKEND,
+    max_workers: Optional[int] = None,
+    iterations: int = JOINT_ITERATIONS,
+    gap: float = JOINT_GAP,
+) -> Dict[str, Any]:
+    """
+    Planos de todas as lojas sob um orçamento corporativo compartilhado,
+    sem que nenhuma loja passe do próprio orçamento.
+
+    O resultado traz o plano de cada loja, o preço final do orçamento
+    corporativo (`price`), o lucro total e o limite superior da relaxação
+    lagrangiana (`bound`); `gap` é a distância relativa entre os dois.
+    """
+    models, skipped = build_location_models(products, locations)
+    budgets = [float(loc["budget"]) for loc in locations]
+    base = {"corporate_budget": corporate_budget, "skipped": skipped}
+
+    # Agendados de todas as lojas precisam caber no orçamento corporativo
+    min_spend = sum(float(m["cost"] @ m["lower"]) for m in models)
+    if min_spend > corporate_budget + 1e-6:
+        return {
+            **base,
+            "status": "Infeasible",
+            "locations": [],
+            "message": "Orçamento corporativo insuficiente para as vendas já agendadas!",
+        }
+
+    # Acima deste preço nenhuma compra opcional dá lucro em loja nenhuma
+    ratios = [
+        m["unit_profit"][m["cost"] > 0] / m["cost"][m["cost"] > 0] for m in models
+    ]
+    high = max((float(r.max()) for r in ratios if r.size), default=0.0)
+    high = max(high, 0.0) + 1e-9
+
+    workers = _pool_size(len(models), max_workers)
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(models,)
+        )
+    try:
+        solve_all = _SubproblemRunner(models, budgets, backend, pool, workers)
+
+        def evaluate(price: float) -> Tuple[List[Tuple[str, np.ndarray]], float, float]:
+            solutions = solve_all(price)
+            spend = sum(float(m["cost"] @ q) for m, (_, q) in zip(models, solutions))
+            dual = sum(
+                float(_priced_model(m, price)["unit_profit"] @ q)
+                for m, (_, q) in zip(models, solutions)
+            )
+            return solutions, spend, dual + price * corporate_budget
+
+        solutions, spend, bound = evaluate(0.0)
+        if any(status not in PLAN_STATUSES for status, _ in solutions):
+            # Alguma loja não cobre os próprios agendados: o preço não muda isso
+            plans = [solve_plan(m, b, backend) for m, b in zip(models, budgets)]
+            return {
+                **base,
+                "status": "Infeasible",
+                "locations": [_label(p, l) for p, l in zip(plans, locations)],
+                "message": "Há lojas sem orçamento para as próprias vendas agendadas.",
+            }
+
+        # Com preço zero o orçamento corporativo já folga: os planos
+        # independentes são o ótimo conjunto
+        price = 0.0
+        if spend > corporate_budget:
+            low, low_spend = 0.0, _spends(models, solutions)
+            best = None
+            for _ in range(iterations):
+                mid = 0.5 * (low + high)
+                candidate, cand_spend, cand_bound = evaluate(mid)
+                bound = min(bound, cand_bound)
+                if cand_spend <= corporate_budget:
+                    high = mid
+                    best = candidate
+                    profit = sum(
+                        float(m["unit_profit"] @ q)
+                        for m, (_, q) in zip(models, candidate)
+                    )
+                    if bound - profit <= gap * max(abs(bound), 1.0):
+                        break
+                else:
+                    low, low_spend = mid, _spends(models, candidate)
+            if best is None:
+                best = evaluate(high)[0]
+            price = high
+
+            # Perto do preço final, lojas com itens de mesma razão lucro/custo
+            # alternam entre comprar tudo e nada; a sobra é dividida entre as
+            # lojas na proporção do quanto cada uma gastaria a um preço menor
+            high_spend = _spends(models, best)
+            want = np.maximum(low_spend - high_spend, 0.0)
+            slack = corporate_budget - float(high_spend.sum())
+            share = want * min(1.0, slack / want.sum()) if want.sum() > 0 else want
+            solutions = _redistribute(
+                models, budgets, best, high_spend + share, backend
+            )
+            solutions = _redistribute(
+                models,
+                budgets,
+                solutions,
+                _spends(models, solutions)
+                + max(0.0, corporate_budget - float(_spends(models, solutions).sum())),
+                backend,
+                sequential=True,
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    plans = []
+    for model, loc, (status, qty) in zip(models, locations, solutions):
+        rows = plan_rows(model, qty) if model["ids"] else []
+        plans.append(
+            _label(
+                {"status": status, "data": rows, "skipped": model["skipped"]},
+                loc,
+            )
+        )
+
+    profit = sum(float(m["unit_profit"] @ q) for m, (_, q) in zip(models, solutions))
+    investment = sum(float(m["cost"] @ q) for m, (_, q) in zip(models, solutions))
+    bound = max(bound, profit)
+    return {
+        **base,
+        "status": (
+            "Optimal" if bound - profit <= gap * max(abs(bound), 1.0) else "Feasible"
+        ),
+        "locations": plans,
+        "price": price,
+        "profit": profit,
+        "investment": investment,
+        "bound": bound,
+        "gap": (bound - profit) / max(abs(bound), 1.0),
+    }
+
+
+def _spends(
+    models: List[Dict[str, Any]], solutions: List[Tuple[str, np.ndarray]]
+) -> np.ndarray:
+    return np.array([float(m["cost"] @ q) for m, (_, q) in zip(models, solutions)])
+
+
+def _redistribute(
+    models: List[Dict[str, Any]],
+    budgets: List[float],
+    solutions: List[Tuple[str, np.ndarray]],
+    caps: np.ndarray,
+    backend: str,
+    sequential: bool = False,
+) -> List[Tuple[str, np.ndarray]]:
+    """
+    Re-resolve cada loja com o lucro original e o teto de gasto `caps`
+    (limitado ao orçamento da loja). O plano anterior continua viável, então
+    o lucro de cada loja nunca piora. Com `sequential`, os tetos trazem a
+    mesma sobra para todas as lojas, e o que uma loja usa sai das seguintes.
+    """
+    result = list(solutions)
+    used = 0.0
+    for i, (model, (_, qty)) in enumerate(zip(models, solutions)):
+        spent = float(model["cost"] @ qty)
+        cap = min(budgets[i], float(caps[i]) - used)
+        if cap <= spent + 1e-9:
+            continue
+        status, new_qty = solve_purchase_model(model, cap, backend)
+        if status not in PLAN_STATUSES:
+            continue
+        if float(model["unit_profit"] @ new_qty) >= float(model["unit_profit"] @ qty):
+            result[i] = (status, new_qty)
+            if sequential:
+                used += float(model["cost"] @ new_qty) - spent
+    return result
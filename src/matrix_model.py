@@ -0,0 +1,178 @@
+"""
+Modelo de compra em forma matricial (vetor objetivo, limites e matriz de
+restrições CSR), montado direto dos vetores de `build_purchase_model`, sem
+criar um objeto do PuLP por variável. Alimenta o HiGHS em processo e é
+gravado em MPS para o CBC.
+"""
+
+import os
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from scipy.sparse import csr_array, vstack
+
+# Nomes curtos cabem nas colunas de 8 caracteres do MPS fixo lido pelo CBC
+COLUMN_PREFIX = "x"
+ROW_PREFIX = "r"
+
+
+def build_matrix_model(model: Dict[str, Any], budget: float) -> Dict[str, Any]:
+    """
+    Maximizar `objective @ x` sujeito a `row_lower <= matrix @ x <= row_upper`
+    e `lower <= x <= upper`, com x inteiro. A linha 0 é a restrição
+    orçamentária; cada item de `extra_constraints` vira mais uma linha e deve
+    trazer "coefficients" (um por variável) e "upper" (e "lower", opcional).
+    """
+    n = len(model["ids"])
+    rows = [
+        csr_array(
+            (model["cost"], (np.zeros(n, dtype=np.int64), np.arange(n))), shape=(1, n)
+        )
+    ]
+    row_lower = [-np.inf]
+    row_upper = [float(budget)]
+    for extra in model.get("extra_constraints", []):
+        rows.append(
+            csr_array(np.asarray(extra["coefficients"], dtype=np.float64)[None, :])
+        )
+        row_lower.append(float(extra.get("lower", -np.inf)))
+        row_upper.append(float(extra["upper"]))
+
+    return {
+        "objective": np.asarray(model["unit_profit"], dtype=np.float64),
+        "lower": np.asarray(model["lower"], dtype=np.float64),
+        "upper": np.asarray(model["upper"], dtype=np.float64),
+        "matrix": rows[0] if len(rows) == 1 else csr_array(vstack(rows)),
+        "row_lower": np.asarray(row_lower),
+        "row_upper": np.asarray(row_upper),
+    }
+
+
+def _number(values: np.ndarray) -> List[str]:
+    return [f"{v: .12e}" for v in values.tolist()]
+
+
+def write_mps(matrix_model: Dict[str, Any], path: str) -> None:
+    """
+    Grava o modelo em MPS (minimização do lucro negativo, todas as
+    variáveis inteiras). Montado coluna a coluna da matriz CSC, em tempo
+    linear no número de não zeros.
+    """
+    matrix = matrix_model["matrix"].tocsc()
+    n_rows, n_cols = matrix.shape
+    columns = [f"{COLUMN_PREFIX}{j}" for j in range(n_cols)]
+    rows = [f"{ROW_PREFIX}{i}" for i in range(n_rows)]
+    row_lower, row_upper = matrix_model["row_lower"], matrix_model["row_upper"]
+
+    lines = ["NAME          PROFITMAX", "ROWS", " N  OBJ"]
+    ranged = []
+    rhs = []
+    for i, name in enumerate(rows):
+        lo, up = row_lower[i], row_upper[i]
+        if np.isfinite(up) and np.isfinite(lo) and lo == up:
+            lines.append(f" E  {name}")
+            rhs.append((name, up))
+        elif np.isfinite(up):
+            lines.append(f" L  {name}")
+            rhs.append((name, up))
+            if np.isfinite(lo):
+                ranged.append((name, up - lo))
+        elif np.isfinite(lo):
+            lines.append(f" G  {name}")
+            rhs.append((name, lo))
+        else:
+            lines.append(f" N  {name}")
+
+    lines.append("COLUMNS")
+    lines.append("    MARKER                 'MARKER'                 'INTORG'")
+    objective = _number(-matrix_model["objective"])
+    values = _number(matrix.data)
+    row_of = matrix.indices.tolist()
+    starts = matrix.indptr.tolist()
+    for j, col in enumerate(columns):
+        lines.append(f"    {col:<8}  {'OBJ':<8}  {objective[j]}")
+        for k in range(starts[j], starts[j + 1]):
+            lines.append(f"    {col:<8}  {rows[row_of[k]]:<8}  {values[k]}")
+    lines.append("    MARKER                 'MARKER'                 'INTEND'")
+
+    lines.append("RHS")
+    lines.extend(f"    RHS       {name:<8}  {v: .12e}" for name, v in rhs)
+    if ranged:
+        lines.append("RANGES")
+        lines.extend(f"    RNG       {name:<8}  {v: .12e}" for name, v in ranged)
+
+    # Sem linha de limite, uma variável inteira do MPS fica em [0, +inf)
+    lines.append("BOUNDS")
+    lower = _number(matrix_model["lower"])
+    upper = _number(matrix_model["upper"])
+    fixed = matrix_model["lower"] == matrix_model["upper"]
+    has_lower = matrix_model["lower"] != 0
+    finite_upper = np.isfinite(matrix_model["upper"])
+    for j, col in enumerate(columns):
+        if fixed[j]:
+            lines.append(f" FX BND       {col:<8}  {lower[j]}")
+            continue
+        if has_lower[j]:
+            lines.append(f" LO BND       {col:<8}  {lower[j]}")
+        if finite_upper[j]:
+            lines.append(f" UP BND       {col:<8}  {upper[j]}")
+    lines.append("ENDATA")
+
+    with open(path, "w", encoding="ascii") as f:
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+# Primeira palavra do arquivo de solução do CBC -> status no padrão do PuLP
+_CBC_STATUS = {
+    "Optimal": "Optimal",
+    "Infeasible": "Infeasible",
+    "Integer": "Infeasible",
+    "Unbounded": "Unbounded",
+    "Stopped": "Not Solved",
+}
+
+
+def read_cbc_solution(path: str, n_cols: int) -> Tuple[str, Optional[np.ndarray]]:
+    """Status e valores das variáveis do arquivo `-solution` do CBC."""
+    with open(path, "r", encoding="ascii", errors="replace") as f:
+        header = f.readline()
+        status = _CBC_STATUS.get(header.split(" ", 1)[0], "Undefined")
+        if status == "Not Solved" and "objective value" in header:
+            # Limite atingido com incumbente: devolve a melhor solução encontrada
+            status = "Feasible"
+        if status not in ("Optimal", "Feasible"):
+            return status, None
+
+        values = np.zeros(n_cols)
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] == "**":
+                parts = parts[1:]
+            if len(parts) >= 3 and parts[1].startswith(COLUMN_PREFIX):
+                values[int(parts[1][len(COLUMN_PREFIX) :])] = float(parts[2])
+    return status, values
+
+
+def solve_mps_with_cbc(
+    matrix_model: Dict[str, Any],
+    cbc_path: str,
+    time_limit: Optional[float] = None,
+    mip_gap: float = 0.0,
+) -> Tuple[str, Optional[np.ndarray]]:
+    """Grava o MPS num diretório temporário e resolve no executável do CBC."""
+    with tempfile.TemporaryDirectory(prefix="profitmax_") as tmp:
+        mps = os.path.join(tmp, "model.mps")
+        solution = os.path.join(tmp, "model.sol")
+        write_mps(matrix_model, mps)
+
+        args = [cbc_path, mps, "-ratioGap", repr(float(mip_gap))]
+        if time_limit is not None:
+            args += ["-sec", repr(float(time_limit))]
+        args += ["-solve", "-printingOptions", "all", "-solution", solution]
+        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        if not os.path.exists(solution):
+            return "Not Solved", None
+        return read_cbc_solution(solution, matrix_model["matrix"].shape[1])
@@ -1,4 +1,4 @@
-from typing import List, TypedDict, Optional
+from typing import Dict, List, TypedDict, Optional
 
 
 class SaleRecord(TypedDict):
@@ -7,7 +7,29 @@ class SaleRecord(TypedDict):
     unit_price: float
 
 
-class Product(TypedDict):
+class HistoryStats(TypedDict):
+    """Somas da regressão quantidade (y) ~ preço (x); ver src.history_stats."""
+
+    count: int  # Registros do histórico incorporados
+    n: float  # Peso total (igual a count sem esquecimento)
+    sum_x: float
+    sum_y: float
+    sum_xy: float
+    sum_xx: float
+    sum_yy: float
+    price_min: Optional[float]
+    price_max: Optional[float]
+    decay: float  # Fator de esquecimento por registro novo (1.0 = nenhum)
+    # Último registro somado [período, quantidade, preço] (ver history_tail)
+    tail: Optional[List]
+
+
+class _ProductOptional(TypedDict, total=False):
+    # Somas da regressão mantidas junto com o histórico (ver src.history_stats)
+    history_stats: HistoryStats
+
+
+class Product(_ProductOptional):
     id: str
     name: str
     supplier_cost: float  # Preço de Compra
@@ -25,3 +47,12 @@ class AppState(TypedDict):
     budget: float
     risk_factor: float
     products: List[Product]
+
+
+class Location(TypedDict):
+    id: str
+    name: str
+    budget: float
+    risk_factor: float
+    # Só o que difere do catálogo compartilhado: {id do produto: {campo: valor}}
+    overrides: Dict[str, Dict[str, int]]
@@ -1,12 +1,96 @@
+import gc
+import hashlib
 import json
+import logging
 import os
-from typing import Dict, Any
+import shutil
+import sqlite3
+import uuid
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from src.models import AppState
+from src.history_store import HistoryStore, LazyHistory, prune_snapshots
+
+try:
+    # Decodificador JSON em C, bem mais rápido que o da biblioteca padrão
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
 
 DB_FILE = "store_data.json"
+SQLITE_FILE = "store_data.db"
+# Snapshot colunar (memory-mapped) do histórico de vendas do banco SQLite
+HISTORY_DIR = "store_history"
+
+# "sqlite" grava por produto (só o que mudou); "json" mantém o arquivo único antigo
+STORAGE_ENGINE = os.environ.get("PROFITMAX_STORAGE", "sqlite")
 
 DEFAULT_STATE: AppState = {"budget": 5000.0, "risk_factor": 0.5, "products": []}
 
+# Versão do formato gravado. Arquivos sem "version" (e bancos sem a chave
+# "schema_version") são da versão 1; cada migração leva à versão seguinte.
+# No armazenamento do próprio app (load_state) o resultado é gravado de
+# volta, para o próximo load seguir direto; arquivos avulsos
+# (load_state_file) são migrados só em memória.
+SCHEMA_VERSION = 2
+# Cópia preservada de um arquivo que não pôde ser lido
+CORRUPT_SUFFIX = ".corrompido"
+
+
+class StateLoadError(Exception):
+    """O arquivo de estado existe, mas não pôde ser lido."""
+
+
+# Colunas fixas da tabela de produtos; campos desconhecidos vão para "extra" (JSON)
+PRODUCT_COLUMNS = (
+    "name",
+    "supplier_cost",
+    "operational_cost",
+    "stock_on_hand",
+    "lead_time_days",
+    "min_order_qty",
+    "target_sell_price",
+    "manual_sales_estimate",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+-- Valores de texto do banco (ex.: "generation", UUID gerado na criação)
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    supplier_cost REAL NOT NULL,
+    operational_cost REAL NOT NULL,
+    stock_on_hand INTEGER NOT NULL,
+    lead_time_days INTEGER NOT NULL,
+    min_order_qty INTEGER NOT NULL,
+    target_sell_price REAL NOT NULL,
+    manual_sales_estimate INTEGER NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}',
+    row_hash TEXT NOT NULL,
+    history_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_position ON products (position);
+-- A chave primária (product_id, seq) já serve de índice por produto
+CREATE TABLE IF NOT EXISTS sales_history (
+    product_id TEXT NOT NULL REFERENCES products (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price REAL NOT NULL,
+    PRIMARY KEY (product_id, seq)
+);
+"""
+
 
 def sanitize_product(prod: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -31,33 +115,432 @@ def sanitize_product(prod: Dict[str, Any]) -> Dict[str, Any]:
     return prod
 
 
-def load_state() -> AppState:
-    if not os.path.exists(DB_FILE):
+def _migrate_v1(state: Dict[str, Any]) -> None:
+    """Versão 1 -> 2: chaves globais e campos de produto com valor padrão."""
+    state.setdefault("products", [])
+    state.setdefault("budget", 5000.0)
+    state.setdefault("risk_factor", 0.5)
+    state["products"] = [sanitize_product(p) for p in state["products"]]
+
+
+# Versão de origem -> migração que leva o estado para a versão seguinte
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], None]] = {1: _migrate_v1}
+
+
+def migrate_state(state: Dict[str, Any], version: int) -> bool:
+    """
+    Leva o estado lido na versão `version` até `SCHEMA_VERSION` (no próprio
+    dicionário). Retorna True se alguma migração rodou.
+    """
+    if version > SCHEMA_VERSION:
+        raise StateLoadError(
+            f"Arquivo na versão {version}, mais nova que a suportada "
+            f"({SCHEMA_VERSION})."
+        )
+    for v in range(version, SCHEMA_VERSION):
+        MIGRATIONS[v](state)
+    return version < SCHEMA_VERSION
+
+
+def _unreadable(path: str, error: Exception) -> StateLoadError:
+    return StateLoadError(f"Não foi possível ler {path}: {error}.")
+
+
+def _report_load_error(
+    path: str, error: Exception, on_error: Optional[Callable[[str], None]]
+) -> AppState:
+    """
+    Preserva uma cópia do arquivo ilegível (a próxima gravação o
+    substituiria), avisa e devolve o estado padrão.
+    """
+    backup = path + CORRUPT_SUFFIX
+    try:
+        shutil.copy2(path, backup)
+        message = (
+            f"{error} Cópia preservada em {backup}; iniciando com o estado padrão."
+        )
+    except OSError:
+        message = f"{error} Iniciando com o estado padrão."
+    logger.error(message)
+    if on_error is not None:
+        on_error(message)
+    return DEFAULT_STATE
+
+
+def load_state(
+    lazy_history: bool = True, on_error: Optional[Callable[[str], None]] = None
+) -> AppState:
+    """
+    Com `lazy_history` (motor SQLite), os produtos carregam sem o histórico:
+    cada `history` é uma LazyHistory lida do snapshot colunar só quando o
+    solver ou o Laboratório de Preço precisarem dela.
+
+    Um arquivo ilegível não interrompe o app: é copiado para
+    `<arquivo>.corrompido`, o erro vai para o log e para `on_error` (se
+    informado) e o estado padrão é devolvido.
+    """
+    if STORAGE_ENGINE == "json":
+        try:
+            return _load_json_state(DB_FILE, write_back=True)
+        except StateLoadError as e:
+            return _report_load_error(DB_FILE, e, on_error)
+
+    # Migração única: o primeiro load sem banco importa o JSON existente
+    if not os.path.exists(SQLITE_FILE) and os.path.exists(DB_FILE):
+        try:
+            migrate_json_to_sqlite(DB_FILE, SQLITE_FILE)
+        except StateLoadError as e:
+            return _report_load_error(DB_FILE, e, on_error)
+    if not os.path.exists(SQLITE_FILE):
         return DEFAULT_STATE
 
     try:
-        with open(DB_FILE, "r", encoding="utf-8") as f:
-            state = json.load(f)
+        return _load_sqlite_state(
+            SQLITE_FILE, HISTORY_DIR if lazy_history else None, write_back=True
+        )
+    except sqlite3.DatabaseError as e:
+        return _report_load_error(SQLITE_FILE, _unreadable(SQLITE_FILE, e), on_error)
+    except StateLoadError as e:
+        return _report_load_error(SQLITE_FILE, e, on_error)
+
+
+def save_state(state: AppState) -> None:
+    if STORAGE_ENGINE == "json":
+        _save_json_state(state, DB_FILE)
+    else:
+        _save_sqlite_state(state, SQLITE_FILE)
+
+
+def load_state_file(path: str) -> AppState:
+    """
+    Carrega um catálogo avulso (.json ou .db) independentemente do motor
+    configurado; usado pelo processamento em lote (src.cli). Um arquivo
+    ilegível gera `StateLoadError` em vez do estado padrão. Versões antigas
+    são migradas só em memória: o arquivo de entrada não é alterado.
+    """
+    if path.lower().endswith(".db"):
+        try:
+            return _load_sqlite_state(path)
+        except sqlite3.DatabaseError as e:
+            raise _unreadable(path, e) from e
+    return _load_json_state(path)
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> AppState:
+    """Importa o arquivo JSON legado para o banco SQLite (uma única vez)."""
+    state = _load_json_state(json_path)
+    _save_sqlite_state(state, db_path)
+    return state
 
-            # Garante que a chave 'products' exista
-            if "products" not in state:
-                state["products"] = []
 
-            # Aplica a correção (sanitização) em cada produto carregado
-            state["products"] = [sanitize_product(p) for p in state["products"]]
+# ---------------------------------------------------------------------------
+# Motor JSON (legado)
+# ---------------------------------------------------------------------------
 
-            # Garante chaves globais
-            if "budget" not in state:
-                state["budget"] = 5000.0
-            if "risk_factor" not in state:
-                state["risk_factor"] = 0.5
 
-            return state
+def _read_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        raw = f.read()
+    # O decode cria milhões de objetos sem ciclos: coletas do GC no meio
+    # dele só custam tempo
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+    finally:
+        if enabled:
+            gc.enable()
+
 
-    except (json.JSONDecodeError, IOError):
+def _load_json_state(path: str, write_back: bool = False) -> AppState:
+    """
+    Arquivos já na versão atual são usados como lidos, sem passar produto a
+    produto; os antigos são migrados (e, com `write_back`, gravados de volta).
+    """
+    if not os.path.exists(path):
         return DEFAULT_STATE
 
+    try:
+        state = _read_json(path)
+    except (ValueError, OSError) as e:
+        # orjson.JSONDecodeError e json.JSONDecodeError são ValueError
+        raise _unreadable(path, e) from e
+    if not isinstance(state, dict) or "products" not in state:
+        raise StateLoadError(f"{path} não contém um estado do ProfitMax.")
 
-def save_state(state: AppState) -> None:
-    with open(DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=4)
+    version = state.pop("version", 1)
+    if migrate_state(state, version) and write_back:
+        try:
+            _save_json_state(state, path)
+        except OSError as e:
+            # Sem permissão de escrita, a migração só repete no próximo load
+            logger.warning("Migração de %s não foi gravada: %s", path, e)
+    return state
+
+
+def _save_json_state(state: AppState, path: str) -> None:
+    payload = {"version": SCHEMA_VERSION, **state}
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+
+
+# ---------------------------------------------------------------------------
+# Motor SQLite
+# ---------------------------------------------------------------------------
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _digest(payload: Any) -> str:
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _product_row(prod: Dict[str, Any]) -> Tuple[List[Any], str, str]:
+    """
+    Valores das colunas fixas + JSON dos campos extras, e os hashes de
+    linha/histórico. Os padrões de campos ausentes valem só para a gravação:
+    o produto recebido não é alterado.
+    """
+    prod = sanitize_product(dict(prod))
+    values = [prod.get(col) for col in PRODUCT_COLUMNS]
+    extra = {
+        k: v
+        for k, v in prod.items()
+        if k not in PRODUCT_COLUMNS and k not in ("id", "history")
+    }
+    extra_json = json.dumps(extra, sort_keys=True, default=str)
+    values.append(extra_json)
+    return values, _digest(values), _digest(list(prod.get("history", [])))
+
+
+_HISTORY_QUERY = (
+    "SELECT product_id, period, quantity, unit_price "
+    "FROM sales_history ORDER BY product_id, seq"
+)
+
+
+def _generation(conn: sqlite3.Connection) -> str:
+    """
+    Token aleatório do banco, criado na primeira leitura. Distingue o
+    snapshot de um banco do de outro (recriado ou trocado) com a mesma
+    `history_version`.
+    """
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', ?)",
+            (uuid.uuid4().hex,),
+        )
+    return conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+
+def _history_layout(conn: sqlite3.Connection) -> List[Tuple[str, int]]:
+    """Pares (product_id, nº de registros) do histórico, na ordem do snapshot."""
+    return conn.execute(
+        "SELECT product_id, COUNT(*) FROM sales_history "
+        "GROUP BY product_id ORDER BY product_id"
+    ).fetchall()
+
+
+def _history_snapshot(
+    conn: sqlite3.Connection, history_dir: str, version: int
+) -> HistoryStore:
+    """
+    Abre o snapshot colunar da versão atual do histórico. Se não existir ou
+    não bater com o banco (outra geração, outros ids ou contagens de
+    registros), regrava a partir do banco.
+    """
+    generation = _generation(conn)
+    directory = os.path.join(history_dir, f"v{version}")
+    try:
+        store = HistoryStore(directory)
+        if store.generation == generation and store.layout() == _history_layout(conn):
+            return store
+    except (OSError, ValueError, KeyError):
+        pass
+    # Apaga antes de regravar: quem ainda tem os arquivos antigos mapeados
+    # continua com eles, em vez de vê-los truncados
+    shutil.rmtree(directory, ignore_errors=True)
+    store = HistoryStore.write(
+        directory, version, conn.execute(_HISTORY_QUERY), generation
+    )
+    prune_snapshots(history_dir, keep=directory)
+    return store
+
+
+def _load_sqlite_state(
+    path: str, history_dir: Optional[str] = None, write_back: bool = False
+) -> AppState:
+    conn = _connect(path)
+    try:
+        settings = dict(conn.execute("SELECT key, value FROM settings"))
+
+        if history_dir is not None:
+            store = _history_snapshot(
+                conn, history_dir, int(settings.get("history_version", 0))
+            )
+            histories: Dict[str, Any] = {
+                pid: store.history(pid) for pid in store.product_ids
+            }
+        else:
+            histories = {}
+            for pid, period, qty, price in conn.execute(_HISTORY_QUERY):
+                histories.setdefault(pid, []).append(
+                    {"period": period, "quantity": qty, "unit_price": price}
+                )
+
+        products = []
+        columns = ", ".join(PRODUCT_COLUMNS)
+        loads = orjson.loads if orjson is not None else json.loads
+        for row in conn.execute(
+            f"SELECT id, {columns}, extra FROM products ORDER BY position"
+        ):
+            prod = {"id": row[0]}
+            prod.update(zip(PRODUCT_COLUMNS, row[1:-1]))
+            prod.update(loads(row[-1]))
+            prod["history"] = histories.get(row[0], [])
+            products.append(prod)
+    finally:
+        conn.close()
+
+    state: AppState = {
+        "budget": settings.get("budget", 5000.0),
+        "risk_factor": settings.get("risk_factor", 0.5),
+        "products": products,
+    }
+    # Bancos antigos: migra e grava (só as linhas alteradas e a nova versão)
+    if migrate_state(state, int(settings.get("schema_version", 1))) and write_back:
+        _save_sqlite_state(state, path)
+    return state
+
+
+def _save_sqlite_state(state: AppState, path: str) -> None:
+    """
+    Grava só o que mudou: compara o hash de cada produto (e do seu histórico)
+    com o que está no banco e faz upsert apenas das linhas diferentes.
+    Históricos lazy da versão atual não são lidos: já estão no banco. Quando
+    a gravação muda a versão, os lazy do estado passam para a nova (o banco
+    agora tem exatamente os registros deles), e a próxima gravação continua
+    sem lê-los.
+    """
+    conn = _connect(path)
+    try:
+        row = conn.execute(
+            "SELECT value FROM settings WHERE key = 'history_version'"
+        ).fetchone()
+        history_version = int(row[0]) if row else 0
+        generation = _generation(conn)
+        history_changed = False
+
+        stored = {
+            pid: (position, row_hash, history_hash)
+            for pid, position, row_hash, history_hash in conn.execute(
+                "SELECT id, position, row_hash, history_hash FROM products"
+            )
+        }
+
+        columns = ", ".join(PRODUCT_COLUMNS)
+        placeholders = ", ".join("?" for _ in PRODUCT_COLUMNS)
+        updates = ", ".join(
+            f"{col} = excluded.{col}"
+            for col in PRODUCT_COLUMNS + ("position", "extra", "row_hash")
+        )
+        upsert_sql = (
+            f"INSERT INTO products (id, position, {columns}, extra, row_hash, history_hash) "
+            f"VALUES (?, ?, {placeholders}, ?, ?, ?) "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}, history_hash = excluded.history_hash"
+        )
+
+        with conn:
+            conn.executemany(
+                "INSERT INTO settings (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [
+                    ("budget", float(state["budget"])),
+                    ("risk_factor", float(state["risk_factor"])),
+                    ("schema_version", float(SCHEMA_VERSION)),
+                ],
+            )
+
+            seen = set()
+            for position, prod in enumerate(state["products"]):
+                pid = prod["id"]
+                seen.add(pid)
+                history = prod.get("history", [])
+                old = stored.get(pid)
+                if (
+                    old is not None
+                    and isinstance(history, LazyHistory)
+                    and history.version == history_version
+                    and history.store.generation == generation
+                    and history.product_id == pid
+                ):
+                    values, row_hash, _ = _product_row(
+                        {k: v for k, v in prod.items() if k != "history"}
+                    )
+                    history_hash = old[2]
+                else:
+                    values, row_hash, history_hash = _product_row(prod)
+
+                if old is None or old[1] != row_hash or old[2] != history_hash:
+                    conn.execute(
+                        upsert_sql, [pid, position, *values, row_hash, history_hash]
+                    )
+                elif old[0] != position:
+                    conn.execute(
+                        "UPDATE products SET position = ? WHERE id = ?",
+                        (position, pid),
+                    )
+
+                if old is None or old[2] != history_hash:
+                    history_changed = True
+                    conn.execute(
+                        "DELETE FROM sales_history WHERE product_id = ?", (pid,)
+                    )
+                    conn.executemany(
+                        "INSERT INTO sales_history "
+                        "(product_id, seq, period, quantity, unit_price) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (pid, seq, r["period"], r["quantity"], r["unit_price"])
+                            for seq, r in enumerate(history)
+                        ],
+                    )
+
+            removed = [(pid,) for pid in stored if pid not in seen]
+            if removed:
+                history_changed = True
+                conn.executemany("DELETE FROM products WHERE id = ?", removed)
+
+            # Invalida o snapshot colunar; o próximo load regrava a nova versão
+            if history_changed:
+                conn.execute(
+                    "INSERT INTO settings (key, value) VALUES ('history_version', ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                    (float(history_version + 1),),
+                )
+    finally:
+        conn.close()
+
+    if history_changed:
+        for prod in state["products"]:
+            history = prod.get("history")
+            if (
+                isinstance(history, LazyHistory)
+                and history.store.generation == generation
+                and history.product_id == prod["id"]
+            ):
+                history.version = history_version + 1
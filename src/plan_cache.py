@@ -0,0 +1,362 @@
+"""
+Cache em disco dos planos de compra, endereçado por uma impressão digital
+das entradas (campos dos produtos que afetam o plano, históricos,
+orçamento, risco e configurações do solver). Fica num banco SQLite em modo
+WAL: vale entre sessões, recargas da página e processos diferentes.
+
+O cache tem tamanho máximo (descarta os planos usados há mais tempo) e cada
+consulta fica registrada num histórico de auditoria, com o plano completo
+das execuções que foram de fato calculadas.
+
+O resumo de cada consulta (data, pedido, status, itens, investimento,
+lucro) é mantido para sempre; o plano completo só nas últimas
+`PLAN_HISTORY_PAYLOADS` execuções calculadas. Nas mais antigas o plano é
+apagado (payload NULL) e `history_plan` recorre ao plano ainda guardado no
+cache, se houver. Os planos do histórico não contam em `max_bytes`.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+from src.models import Product
+from src.catalog import Catalog, as_catalog
+from src.analytics import pack_history_columns
+from src.history_stats import STATS_FIELD, stored_stats
+
+PLAN_CACHE_FILE = os.environ.get("PROFITMAX_PLAN_CACHE", "store_plans.db")
+# Tamanho máximo dos planos guardados (comprimidos)
+PLAN_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Mude ao alterar o cálculo do plano: as entradas antigas deixam de casar
+PLAN_CACHE_VERSION = 1
+# Planos que dependem do limite de tempo (ou do acaso da busca) não são
+# reaproveitados: outra execução pode chegar a um resultado melhor
+UNCACHED_STATUSES = ("Feasible", "Not Solved")
+# Execuções calculadas que mantêm o plano completo no histórico de auditoria
+PLAN_HISTORY_PAYLOADS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    fingerprint TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_plans_last_used ON plans (last_used);
+CREATE TABLE IF NOT EXISTS plan_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    fingerprint TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    items INTEGER NOT NULL,
+    investment REAL NOT NULL,
+    profit REAL NOT NULL,
+    cache_hit INTEGER NOT NULL,
+    -- Plano completo só nas execuções calculadas; acertos apontam para elas
+    payload BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_plan_history_fingerprint ON plan_history (fingerprint);
+CREATE INDEX IF NOT EXISTS idx_plan_history_payload ON plan_history (id)
+    WHERE payload IS NOT NULL;
+"""
+
+# Campos do registro de auditoria devolvidos por `PlanCache.history`
+HISTORY_COLUMNS = (
+    "id",
+    "created",
+    "fingerprint",
+    "request",
+    "status",
+    "items",
+    "investment",
+    "profit",
+    "cache_hit",
+)
+
+
+def _plain(value: Any) -> Any:
+    """Escalares do NumPy que escapam para o resultado viram tipos do Python."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def _encode(result: Dict[str, Any]) -> bytes:
+    raw = json.dumps(result, separators=(",", ":"), default=_plain)
+    return zlib.compress(raw.encode("utf-8"), 6)
+
+
+def _decode(payload: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def plan_fingerprint(
+    products: Union[List[Product], Catalog],
+    budget: float,
+    risk_appetite: float,
+    settings: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Hash estável de tudo o que determina o plano: colunas numéricas, ids e
+    nomes do catálogo, históricos (preço, quantidade, mês), fator de
+    esquecimento das somas guardadas, orçamento, risco e `settings` (backend,
+    limite de tempo, gap, origem da demanda...).
+    """
+    catalog = as_catalog(products)
+    header = {
+        "version": PLAN_CACHE_VERSION,
+        "budget": float(budget),
+        "risk_appetite": float(risk_appetite),
+        "settings": settings or {},
+    }
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(header, sort_keys=True, default=str).encode("utf-8"))
+    for labels in (catalog.ids, catalog.names):
+        digest.update("\x1f".join(map(str, labels)).encode("utf-8"))
+        digest.update(b"\x1e")
+    digest.update(np.ascontiguousarray(catalog.data).tobytes())
+
+    columns = pack_history_columns(catalog)
+    digest.update(columns["lengths"].tobytes())
+    digest.update(columns["prices"].tobytes())
+    digest.update(columns["quantities"].tobytes())
+    digest.update(columns["months"].tobytes())
+
+    # Somas guardadas mudam o ajuste (esquecimento); 0 = ajuste pelo histórico
+    decays = np.zeros(len(catalog))
+    for i, extra in enumerate(catalog.extras):
+        stats = stored_stats(catalog.histories[i], extra.get(STATS_FIELD))
+        if stats is not None:
+            decays[i] = stats["decay"]
+    digest.update(decays.tobytes())
+    return digest.hexdigest()
+
+
+class PlanCache:
+    """
+    Planos guardados em disco, com descarte dos menos usados recentemente
+    acima de `max_bytes`; o histórico de auditoria guarda o plano completo
+    das últimas `keep_payloads` execuções calculadas. Cada operação abre a
+    própria conexão: pode ser usado por várias threads e processos ao mesmo
+    tempo.
+
+    Os planos devolvidos são cópias novas (lidas do disco) e podem ser
+    alterados por quem os recebe.
+    """
+
+    def __init__(
+        self,
+        path: str = PLAN_CACHE_FILE,
+        max_bytes: int = PLAN_CACHE_MAX_BYTES,
+        keep_payloads: int = PLAN_HISTORY_PAYLOADS,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.keep_payloads = keep_payloads
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._ready = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT payload FROM plans WHERE fingerprint = ?", (fingerprint,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE plans SET last_used = ?, hits = hits + 1 "
+                    "WHERE fingerprint = ?",
+                    (time.time(), fingerprint),
+                )
+        finally:
+            conn.close()
+        return _decode(row[0])
+
+    def put(self, fingerprint: str, result: Dict[str, Any]) -> bool:
+        """Guarda o plano (se o status permitir). Retorna True se guardou."""
+        if result.get("status") in UNCACHED_STATUSES:
+            return False
+        payload = _encode(result)
+        if len(payload) > self.max_bytes:
+            return False
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO plans (fingerprint, payload, size, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (fingerprint) DO UPDATE SET payload = excluded.payload, "
+                    "size = excluded.size, last_used = excluded.last_used",
+                    (fingerprint, payload, len(payload), now, now),
+                )
+                self._evict(conn)
+        finally:
+            conn.close()
+        return True
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Descarta os planos usados há mais tempo até caber em `max_bytes`."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM plans").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for fingerprint, size in conn.execute(
+            "SELECT fingerprint, size FROM plans ORDER BY last_used"
+        ):
+            if total <= self.max_bytes:
+                break
+            doomed.append((fingerprint,))
+            total -= size
+        conn.executemany("DELETE FROM plans WHERE fingerprint = ?", doomed)
+
+    def record(
+        self,
+        fingerprint: str,
+        request: Dict[str, Any],
+        result: Dict[str, Any],
+        cache_hit: bool,
+    ) -> None:
+        """
+        Registra a consulta no histórico de auditoria e apaga o plano
+        completo das execuções calculadas além das `keep_payloads` últimas.
+        """
+        rows = result.get("data", [])
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO plan_history (created, fingerprint, request, status, "
+                    "items, investment, profit, cache_hit, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        time.time(),
+                        fingerprint,
+                        json.dumps(request, sort_keys=True, default=_plain),
+                        result.get("status", ""),
+                        len(rows),
+                        float(sum(r["Investimento Total"] for r in rows)),
+                        float(sum(r["Lucro Previsto"] for r in rows)),
+                        int(cache_hit),
+                        None if cache_hit else _encode(result),
+                    ),
+                )
+                if not cache_hit:
+                    self._prune_history(conn)
+        finally:
+            conn.close()
+
+    def _prune_history(self, conn: sqlite3.Connection) -> None:
+        """Mantém o resumo das entradas antigas, sem o plano completo."""
+        row = conn.execute(
+            "SELECT id FROM plan_history WHERE payload IS NOT NULL "
+            "ORDER BY id DESC LIMIT 1 OFFSET ?",
+            (self.keep_payloads,),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE plan_history SET payload = NULL "
+                "WHERE payload IS NOT NULL AND id <= ?",
+                (row[0],),
+            )
+
+    def history(self, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """Consultas mais recentes primeiro (sem o plano; ver `history_plan`)."""
+        sql = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM plan_history ORDER BY id DESC"
+        params: tuple = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (limit,)
+        conn = self._connect()
+        try:
+            entries = [
+                dict(zip(HISTORY_COLUMNS, row)) for row in conn.execute(sql, params)
+            ]
+        finally:
+            conn.close()
+        for entry in entries:
+            entry["request"] = json.loads(entry["request"])
+            entry["cache_hit"] = bool(entry["cache_hit"])
+        return entries
+
+    def history_plan(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Plano completo de uma entrada do histórico (de um acerto, o original).
+        Se já foi apagado do histórico, usa o do cache; None se não houver.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT fingerprint, payload FROM plan_history WHERE id = ?",
+                (entry_id,),
+            ).fetchone()
+            if row is not None and row[1] is None:
+                fingerprint = row[0]
+                row = conn.execute(
+                    "SELECT fingerprint, payload FROM plan_history "
+                    "WHERE fingerprint = ? AND id < ? AND payload IS NOT NULL "
+                    "ORDER BY id DESC LIMIT 1",
+                    (fingerprint, entry_id),
+                ).fetchone()
+                if row is None:
+                    row = conn.execute(
+                        "SELECT fingerprint, payload FROM plans WHERE fingerprint = ?",
+                        (fingerprint,),
+                    ).fetchone()
+        finally:
+            conn.close()
+        return None if row is None else _decode(row[1])
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans"
+            ).fetchone()
+            history, history_plans, history_bytes = conn.execute(
+                "SELECT COUNT(*), COUNT(payload), COALESCE(SUM(LENGTH(payload)), 0) "
+                "FROM plan_history"
+            ).fetchone()
+        finally:
+            conn.close()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "history": history,
+            "history_plans": history_plans,
+            "history_bytes": history_bytes,
+        }
+
+    def clear(self) -> None:
+        """Esvazia o cache; o histórico de auditoria é mantido."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM plans")
+        finally:
+            conn.close()
+
+
+# Cache compartilhado pela interface (o arquivo só é criado no primeiro uso)
+PLAN_CACHE = PlanCache()
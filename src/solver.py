@@ -1,132 +1,1050 @@
-from pulp import LpProblem, LpMaximize, LpVariable, lpSum, PULP_CBC_CMD, LpStatus
-from typing import List, Dict, Any
+import math
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from pulp import PULP_CBC_CMD
+from scipy.optimize import milp, LinearConstraint, Bounds
+from scipy.sparse import csr_array
+from typing import Callable, List, Dict, Any, Tuple, Sequence, Optional, Union
 from src.models import Product
-from src.analytics import calculate_optimal_price_and_demand
+from src.catalog import Catalog, as_catalog
+from src.analytics import (
+    analyze_price_elasticity_batch,
+    calculate_optimal_price_and_demand_batch,
+    calculate_seasonal_price_and_demand_batch,
+    history_price_range,
+    ELASTICITY_CACHE,
+)
+from src.diagnostics import Diagnostics, MetricsHook
+from src.knapsack import BoundedKnapsack, solve_bounded_knapsack
+from src.matrix_model import build_matrix_model, solve_mps_with_cbc
+from src.plan_cache import PlanCache, plan_fingerprint
+
+# Backends disponíveis: "knapsack" é o motor exato para o modelo de uma única
+# restrição orçamentária, "highs" resolve em processo (scipy.optimize.milp),
+# "cbc" grava o modelo em MPS e chama o binário do CBC que acompanha o PuLP.
+# "auto" usa a mochila e só recorre ao MILP genérico quando o modelo tem
+# restrições extras ou a mochila estoura o limite de estados.
+SOLVER_BACKENDS = ("auto", "knapsack", "highs", "cbc")
+DEFAULT_BACKEND = "auto"
+MILP_BACKEND = "highs"
+
+# Cenários padrão de apetite ao risco (mesma legenda da barra lateral)
+RISK_SCENARIOS = (0.0, 0.5, 1.0)
+
+# Status que geram plano. "Feasible" é a melhor solução encontrada até o
+# limite de tempo, sem prova de otimalidade
+PLAN_STATUSES = ("Optimal", "Feasible")
+
+# Produtos por bloco da estimativa de demanda quando há acompanhamento de
+# progresso (sem ele, o catálogo vai inteiro numa só passada)
+DEMAND_CHUNK = 2_000
+
+# Origem da estimativa de demanda: "elasticity" é a regressão só de preço
+# (com cache por histórico), "seasonal" soma o efeito do mês do ano
+DEMAND_SOURCES = ("elasticity", "seasonal")
+DEFAULT_DEMAND_SOURCE = "elasticity"
+
+# Preços candidatos por produto no modo de preço e quantidade em conjunto
+JOINT_PRICE_POINTS = 20
+# Gap relativo aceito no modo conjunto (o padrão do HiGHS)
+JOINT_MIP_GAP = 1e-4
+
+# Recebe (concluídos, total)
+ProgressCallback = Callable[[int, int], None]
+# Devolve True quando a execução deve ser abandonada
+CancelCheck = Callable[[], bool]
+
+
+class OptimizationCancelled(Exception):
+    """A otimização foi cancelada antes de terminar."""
+
+
+# Códigos de status do scipy.optimize.milp, traduzidos para os nomes do PuLP
+_HIGHS_STATUS = {
+    0: "Optimal",
+    1: "Not Solved",
+    2: "Infeasible",
+    3: "Unbounded",
+}
+
+
+def estimate_demand(
+    products: Union[List[Product], Catalog],
+    progress: Optional[ProgressCallback] = None,
+    estimates: Optional[List[Tuple[Optional[float], int]]] = None,
+    source: str = DEFAULT_DEMAND_SOURCE,
+    month: Optional[Union[int, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Etapa independente de risco e orçamento: define preço de venda, teto de
+    demanda e origem da decisão de cada produto analisável. Pode ser
+    calculada uma vez e reaproveitada em vários cenários.
+
+    Com `progress`, o catálogo é processado em blocos de `DEMAND_CHUNK`
+    produtos e o callback é chamado após cada bloco. `estimates` reaproveita
+    (preço ótimo, demanda) já calculados para os mesmos produtos, na mesma
+    ordem (ex.: um catálogo compartilhado por várias lojas).
+
+    `source` escolhe o modelo de demanda (ver `DEMAND_SOURCES`); `month` é o
+    mês previsto pelo modelo sazonal (sem ele, o mês seguinte ao histórico).
+    """
+    if source not in DEMAND_SOURCES:
+        raise ValueError(f"Origem de demanda desconhecida: {source}")
+    catalog = as_catalog(products)
+
+    def forecast(chunk: Catalog) -> List[Tuple[Optional[float], int]]:
+        if source == "seasonal":
+            return calculate_seasonal_price_and_demand_batch(chunk, month)
+        return calculate_optimal_price_and_demand_batch(chunk)
+
+    # Estimativa de demanda de todo o catálogo numa única passada vetorizada
+    if estimates is None and progress is None:
+        estimates = forecast(catalog)
+    elif estimates is None:
+        total = len(catalog)
+        estimates = []
+        progress(0, total)
+        for start in range(0, total, DEMAND_CHUNK):
+            chunk = catalog.take(slice(start, start + DEMAND_CHUNK))
+            estimates.extend(forecast(chunk))
+            progress(start + len(chunk), total)
+
+    n = len(catalog)
+    opt_price = np.fromiter(
+        (np.nan if price is None else price for price, _ in estimates),
+        dtype=np.float64,
+        count=n,
+    )
+    opt_demand = np.fromiter((qty for _, qty in estimates), dtype=np.float64, count=n)
+    committed = catalog["min_order_qty"].astype(np.float64)
+    manual = catalog["manual_sales_estimate"].astype(np.float64)
+    target_price = catalog["target_sell_price"]
+
+    # --- 1. DEFINIÇÃO DA DEMANDA TOTAL---
+    ai = ~np.isnan(opt_price) & (opt_demand > 0)
+    by_manual = ~ai & (manual > 0)
+    # Se não tem estimativa, mas TEM compromisso agendado, o teto é o próprio compromisso
+    committed_only = ~ai & ~by_manual & (committed > 0)
+    keep = np.flatnonzero(ai | by_manual | committed_only)
+
+    final_price = np.where(ai, opt_price, target_price)
+    ceiling = np.where(
+        ai, np.trunc(opt_demand * 1.2), np.where(by_manual, manual, committed)
+    )
+    labels = np.where(
+        ai,
+        "IA (Histórico)",
+        np.where(by_manual, "Manual (Estimativa)", "Apenas Agendados"),
+    )
+
+    return {
+        # Posição de cada produto analisável no catálogo de entrada
+        "rows": keep,
+        "ids": [catalog.ids[i] for i in keep],
+        "names": [catalog.names[i] for i in keep],
+        "sources": labels[keep].tolist(),
+        "cost": catalog["supplier_cost"][keep],
+        "op_cost": catalog["operational_cost"][keep],
+        "final_price": final_price[keep],
+        "ceiling": np.maximum(ceiling, committed)[keep],
+        "committed": committed[keep],
+        "stock": catalog["stock_on_hand"][keep].astype(np.float64),
+        "skipped": [
+            f"{catalog.names[i]} (Sem dados)"
+            for i in np.flatnonzero(~(ai | by_manual | committed_only))
+        ],
+    }
+
+
+def build_purchase_model(
+    products: List[Product],
+    risk_appetite: float,
+    demand: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Monta o modelo de compra em forma de vetores: limites inferior/superior
+    de cada variável, lucro unitário (objetivo) e custo unitário (linha da
+    restrição orçamentária), além dos metadados usados no relatório.
+    `demand` permite reaproveitar uma chamada anterior de `estimate_demand`.
+    """
+    if demand is None:
+        demand = estimate_demand(products)
+    committed = demand["committed"]
+    stock = demand["stock"]
+
+    # --- 2. APLICAÇÃO DO RISCO ---
+    upside = demand["ceiling"] - committed
+    allowed_demand = np.floor(committed + upside * risk_appetite)
+
+    # --- 3. DEFINIÇÃO DE NECESSIDADE DE COMPRA ---
+    must_buy = np.maximum(0, committed - stock)
+    can_buy = np.maximum(0, allowed_demand - stock)
+    must_buy[can_buy == 0] = 0
+
+    return {
+        "ids": demand["ids"],
+        "names": demand["names"],
+        "sources": demand["sources"],
+        "cost": demand["cost"],
+        "op_cost": demand["op_cost"],
+        "final_price": demand["final_price"],
+        # Função Objetivo (Lucro Líquido por unidade)
+        "unit_profit": demand["final_price"] - (demand["cost"] + demand["op_cost"]),
+        "lower": must_buy,
+        "upper": can_buy,
+        # Linhas além do orçamento (tiram o modelo do caminho da mochila)
+        "extra_constraints": [],
+        "skipped": demand["skipped"],
+    }
+
+
+# Os backends recebem `info` (opcional) e preenchem o backend efetivamente
+# usado e o gap de otimalidade (None quando o solver não informa).
+# `deadline` (instante de time.perf_counter) e `mip_gap` limitam a busca:
+# ao estourar o prazo com uma solução viável em mãos, o status é "Feasible".
+# `cancelled` só pode ser atendido no meio da busca pela mochila; os MILPs
+# externos são limitados pelo prazo e checados pelo chamador ao final.
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.perf_counter())
+
+
+def _solve_highs(
+    model: Dict[str, Any],
+    budget: float,
+    info: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+    mip_gap: float = 0.0,
+    cancelled: Optional[CancelCheck] = None,
+) -> Tuple[str, np.ndarray]:
+    n = len(model["ids"])
+    start = time.perf_counter()
+    arrays = build_matrix_model(model, budget)
+    build_seconds = time.perf_counter() - start
+
+    options: Dict[str, Any] = {"mip_rel_gap": mip_gap}
+    time_left = _time_left(deadline)
+    if time_left is not None:
+        options["time_limit"] = time_left
+    res = milp(
+        c=-arrays["objective"],
+        constraints=LinearConstraint(
+            arrays["matrix"], arrays["row_lower"], arrays["row_upper"]
+        ),
+        integrality=np.ones(n),
+        bounds=Bounds(arrays["lower"], arrays["upper"]),
+        options=options,
+    )
+
+    status = _HIGHS_STATUS.get(res.status, "Undefined")
+    if status == "Not Solved" and res.x is not None:
+        # Limite de tempo com incumbente: devolve a melhor solução encontrada
+        status = "Feasible"
+    if info is not None:
+        info.update(
+            backend="highs",
+            mip_gap=getattr(res, "mip_gap", None),
+            model_build_seconds=build_seconds,
+        )
+    if res.x is None:
+        return status, np.zeros(n, dtype=np.int64)
+    return status, np.rint(res.x).astype(np.int64)
+
+
+def _solve_cbc(
+    model: Dict[str, Any],
+    budget: float,
+    info: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+    mip_gap: float = 0.0,
+    cancelled: Optional[CancelCheck] = None,
+) -> Tuple[str, np.ndarray]:
+    n = len(model["ids"])
+    start = time.perf_counter()
+    arrays = build_matrix_model(model, budget)
+    # Montagem do modelo, separada do tempo do CBC nos diagnósticos
+    build_seconds = time.perf_counter() - start
+
+    time_left = _time_left(deadline)
+    status, values = solve_mps_with_cbc(
+        arrays,
+        PULP_CBC_CMD().path,
+        time_limit=None if time_left is None else max(1, math.ceil(time_left)),
+        mip_gap=mip_gap,
+    )
+    if info is not None:
+        info.update(backend="cbc", mip_gap=None, model_build_seconds=build_seconds)
+    if values is None:
+        return status, np.zeros(n, dtype=np.int64)
+    return status, np.rint(values).astype(np.int64)
+
+
+def _solve_knapsack(
+    model: Dict[str, Any],
+    budget: float,
+    info: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+    mip_gap: float = 0.0,
+    cancelled: Optional[CancelCheck] = None,
+) -> Tuple[str, np.ndarray]:
+    def should_stop() -> bool:
+        if cancelled is not None and cancelled():
+            return True
+        return deadline is not None and time.perf_counter() >= deadline
+
+    status, qty = solve_bounded_knapsack(
+        model["unit_profit"],
+        model["cost"],
+        model["lower"],
+        model["upper"],
+        budget,
+        mip_gap=mip_gap,
+        should_stop=should_stop,
+    )
+    if status == "Stopped":
+        # A incumbente da mochila é sempre viável
+        status = "Feasible"
+    if info is not None:
+        # Motor exato: com "Optimal", o gap é no máximo o tolerado (zero por padrão)
+        info.update(
+            backend="knapsack", mip_gap=mip_gap if status == "Optimal" else None
+        )
+    return status, qty
+
+
+def _solve_auto(
+    model: Dict[str, Any],
+    budget: float,
+    info: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+    mip_gap: float = 0.0,
+    cancelled: Optional[CancelCheck] = None,
+) -> Tuple[str, np.ndarray]:
+    limits = dict(deadline=deadline, mip_gap=mip_gap, cancelled=cancelled)
+    if model.get("extra_constraints"):
+        return _BACKEND_FUNCS[MILP_BACKEND](model, budget, info, **limits)
+
+    status, qty = _solve_knapsack(model, budget, info, **limits)
+    if status == "Not Solved":
+        # O MILP herda o que sobrou do prazo
+        return _BACKEND_FUNCS[MILP_BACKEND](model, budget, info, **limits)
+    return status, qty
+
+
+_BACKEND_FUNCS = {
+    "auto": _solve_auto,
+    "knapsack": _solve_knapsack,
+    "highs": _solve_highs,
+    "cbc": _solve_cbc,
+}
+
+
+def solve_purchase_model(
+    model: Dict[str, Any],
+    budget: float,
+    backend: str = DEFAULT_BACKEND,
+    info: Optional[Dict[str, Any]] = None,
+    time_limit: Optional[float] = None,
+    mip_gap: float = 0.0,
+    cancelled: Optional[CancelCheck] = None,
+) -> Tuple[str, np.ndarray]:
+    """
+    Resolve o modelo de compra no backend escolhido e devolve (status,
+    quantidades). Se `info` for passado, recebe o backend usado e o gap.
+
+    `time_limit` (segundos) e `mip_gap` (gap relativo aceito) limitam a
+    busca; ao estourar o tempo com uma solução viável o status é "Feasible"
+    e as quantidades são as da melhor solução encontrada.
+    """
+    if backend not in _BACKEND_FUNCS:
+        raise ValueError(
+            f"Backend de solver desconhecido: {backend!r}. Opções: {SOLVER_BACKENDS}"
+        )
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    return _BACKEND_FUNCS[backend](
+        model, budget, info, deadline=deadline, mip_gap=mip_gap, cancelled=cancelled
+    )
 
 
 def optimize_purchasing_plan(
-    products: List[Product], budget: float, risk_appetite: float
+    products: List[Product],
+    budget: float,
+    risk_appetite: float,
+    backend: str = DEFAULT_BACKEND,
+    hook: Optional[MetricsHook] = None,
+    time_limit: Optional[float] = None,
+    mip_gap: float = 0.0,
+    cancelled: Optional[CancelCheck] = None,
+    demand_source: str = DEFAULT_DEMAND_SOURCE,
+    month: Optional[Union[int, str]] = None,
+    plan_cache: Optional[PlanCache] = None,
 ) -> Dict[str, Any]:
+    """
+    Plano de compra ótimo. O resultado traz em "diagnostics" o tempo de cada
+    etapa e os contadores da execução; `hook` recebe os mesmos eventos à
+    medida que acontecem (ex.: para um profiler ou coletor de métricas),
+    inclusive o progresso da estimativa de demanda.
 
-    prob = LpProblem("ProfitMax_Engine", LpMaximize)
-
-    variables = {}
-    meta_data = {}
-    skipped_products = []
-
-    for p in products:
-        cost = p["supplier_cost"]
-        op_cost = p["operational_cost"]
-        stock = p["stock_on_hand"]
-        committed_orders = p["min_order_qty"]
-
-        # --- 1. DEFINIÇÃO DA DEMANDA TOTAL---
-
-        opt_price, opt_demand = calculate_optimal_price_and_demand(p["history"], cost)
-
-        total_demand_ceiling = 0
-        final_price = 0.0
-        source = ""
-        analyzable = False
-
-        if opt_price is not None and opt_demand > 0:
-            final_price = opt_price
-            total_demand_ceiling = int(opt_demand * 1.2)
-            source = "IA (Histórico)"
-            analyzable = True
-        elif p["manual_sales_estimate"] > 0:
-            final_price = p["target_sell_price"]
-            total_demand_ceiling = int(p["manual_sales_estimate"])
-            source = "Manual (Estimativa)"
-            analyzable = True
-        else:
-            # Se não tem estimativa, mas TEM compromisso agendado, o teto é o próprio compromisso
-            if committed_orders > 0:
-                final_price = p["target_sell_price"]
-                total_demand_ceiling = committed_orders
-                source = "Apenas Agendados"
-                analyzable = True
-            else:
-                skipped_products.append(f"{p['name']} (Sem dados)")
-                analyzable = False
-
-        if not analyzable:
-            continue
-        total_demand_ceiling = max(total_demand_ceiling, committed_orders)
-
-        # --- 2. APLICAÇÃO DO RISCO ---
-
-        upside = total_demand_ceiling - committed_orders
-        allowed_demand = committed_orders + (upside * risk_appetite)
-        allowed_demand = int(allowed_demand)
-
-        # --- 3. DEFINIÇÃO DE NECESSIDADE DE COMPRA ---
-        must_buy = max(0, committed_orders - stock)
-        can_buy = max(0, allowed_demand - stock)
-        if can_buy == 0:
-            var_min = 0
-            var_max = 0
-        else:
-            var_min = must_buy
-            var_max = can_buy
-
-        # Variável de Decisão
-        var_name = f"qty_{p['id']}"
-        x = LpVariable(var_name, lowBound=var_min, upBound=var_max, cat="Integer")
-
-        variables[p["id"]] = x
-
-        # Função Objetivo (Lucro Líquido)
-        unit_profit = final_price - (cost + op_cost)
-        prob += x * unit_profit
-
-        meta_data[p["id"]] = {
-            "name": p["name"],
-            "cost": cost,
-            "op_cost": op_cost,
-            "final_price": final_price,
-            "real_profit": unit_profit,
-            "source": source,
+    `time_limit` e `mip_gap` são repassados ao solver. `cancelled` é
+    consultado entre os blocos da estimativa de demanda e durante a busca;
+    quando devolve True, a execução termina com `OptimizationCancelled`.
+    `demand_source` e `month` vão para `estimate_demand`.
+
+    Com `plan_cache`, entradas idênticas (ver `plan_fingerprint`) devolvem o
+    plano guardado sem recalcular, e toda consulta fica no histórico de
+    auditoria do cache.
+    """
+    diagnostics = Diagnostics(hook)
+    if plan_cache is not None:
+        settings = {
+            "backend": backend,
+            "time_limit": time_limit,
+            "mip_gap": mip_gap,
+            "demand_source": demand_source,
+            "month": month,
         }
+        request = {"budget": budget, "risk_appetite": risk_appetite, **settings}
+        with diagnostics.stage("plan_cache"):
+            fingerprint = plan_fingerprint(products, budget, risk_appetite, settings)
+            cached = plan_cache.get(fingerprint)
+        if cached is not None:
+            diagnostics.count(plan_cache="hit")
+            plan_cache.record(fingerprint, request, cached, cache_hit=True)
+            # Tempos desta consulta, com os contadores do cálculo original
+            original = cached.get("diagnostics", {}).get("counters", {})
+            cached["diagnostics"] = diagnostics.as_dict()
+            cached["diagnostics"]["counters"] = {**original, **diagnostics.counters}
+            return cached
 
-    # Restrição Orçamentária
-    if variables:
-        prob += (
-            lpSum([variables[pid] * meta_data[pid]["cost"] for pid in variables])
-            <= budget
+    cache_before = ELASTICITY_CACHE.stats()
+
+    def demand_progress(done: int, total: int) -> None:
+        if cancelled is not None and cancelled():
+            raise OptimizationCancelled()
+        diagnostics.progress("demand_estimation", done, total)
+
+    tracked = hook is not None or cancelled is not None
+    with diagnostics.stage("demand_estimation"):
+        demand = estimate_demand(
+            products,
+            demand_progress if tracked else None,
+            source=demand_source,
+            month=month,
         )
+    with diagnostics.stage("model_build"):
+        model = build_purchase_model(products, risk_appetite, demand)
 
-        prob.solve(PULP_CBC_CMD(msg=0))
-    else:
+    cache_after = ELASTICITY_CACHE.stats()
+    diagnostics.count(
+        products_total=len(products),
+        demand_source=demand_source,
+        elasticity_cache_hits=cache_after["hits"] - cache_before["hits"],
+        elasticity_cache_misses=cache_after["misses"] - cache_before["misses"],
+    )
+
+    result = solve_plan(
+        model, budget, backend, diagnostics, time_limit, mip_gap, cancelled
+    )
+    if plan_cache is not None:
+        diagnostics.count(plan_cache="miss")
+    result["diagnostics"] = diagnostics.as_dict()
+    if plan_cache is not None:
+        plan_cache.put(fingerprint, result)
+        plan_cache.record(fingerprint, request, result, cache_hit=False)
+    return result
+
+
+def solve_plan(
+    model: Dict[str, Any],
+    budget: float,
+    backend: str = DEFAULT_BACKEND,
+    diagnostics: Optional[Diagnostics] = None,
+    time_limit: Optional[float] = None,
+    mip_gap: float = 0.0,
+    cancelled: Optional[CancelCheck] = None,
+) -> Dict[str, Any]:
+    """Resolve um modelo já montado e devolve o plano no formato do dashboard."""
+    skipped_products = model["skipped"]
+    if diagnostics is None:
+        diagnostics = Diagnostics()
+
+    sources = Counter(model["sources"])
+    diagnostics.count(
+        products_analyzed=len(model["ids"]),
+        products_skipped=len(skipped_products),
+        source_ai=sources["IA (Histórico)"],
+        source_manual=sources["Manual (Estimativa)"],
+        source_committed_only=sources["Apenas Agendados"],
+        variables=len(model["ids"]),
+        constraints=1 + len(model.get("extra_constraints", [])),
+        backend_requested=backend,
+        time_limit=time_limit,
+        mip_gap_target=mip_gap,
+    )
+
+    if not model["ids"]:
         return {"status": "Error", "message": "Nenhum produto analisável.", "data": []}
 
-    results = []
+    info: Dict[str, Any] = {}
+    with diagnostics.stage("solve"):
+        status, quantities = solve_purchase_model(
+            model, budget, backend, info, time_limit, mip_gap, cancelled
+        )
+    if cancelled is not None and cancelled():
+        raise OptimizationCancelled()
+    if "model_build_seconds" in info:
+        diagnostics.add_timing("solver_model_build", info["model_build_seconds"])
+        diagnostics.add_timing("solve", -info["model_build_seconds"])
+    diagnostics.count(
+        backend_used=info.get("backend", backend),
+        solver_status=status,
+        mip_gap=info.get("mip_gap"),
+    )
+
+    # Parou pelo tempo sem nenhuma solução viável
+    if status == "Not Solved":
+        return {
+            "status": status,
+            "data": [],
+            "skipped": skipped_products,
+            "message": (
+                "O solver parou antes de encontrar um plano viável. "
+                "Aumente o limite de tempo."
+            ),
+        }
 
     # Tratamento se não houver dinheiro para os pedidos agendados
-    status = LpStatus[prob.status]
-    if status != "Optimal":
+    if status not in PLAN_STATUSES:
+        return {
+            "status": status,
+            "data": [],
+            "skipped": skipped_products,
+            "message": "Orçamento insuficiente para cobrir as vendas já agendadas!",
+        }
+
+    with diagnostics.stage("extraction"):
+        rows = plan_rows(model, quantities)
+    diagnostics.count(items_purchased=len(rows))
+
+    result = {
+        "status": status,
+        "data": rows,
+        "skipped": skipped_products,
+    }
+    if status == "Feasible":
+        result["message"] = (
+            "Limite de tempo atingido: o plano usa a melhor solução encontrada."
+        )
+    return result
+
+
+def plan_rows(model: Dict[str, Any], quantities: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Linhas do plano (colunas "ID", "Produto", "Qtd Compra"...) dos itens do
+    modelo com quantidade comprada > 0, na ordem do modelo. `model` é o de
+    `build_purchase_model` (ou outro com os mesmos vetores) e `quantities`
+    as unidades compradas de cada item.
+    """
+    results = []
+    for i in np.flatnonzero(quantities > 0):
+        qty = int(quantities[i])
+        cost = float(model["cost"][i])
+        results.append(
+            {
+                "ID": model["ids"][i],
+                "Produto": model["names"][i],
+                "Qtd Compra": qty,
+                "Custo Unit": cost,
+                "Custo Operacional": float(model["op_cost"][i]),
+                "Preço Venda": float(model["final_price"][i]),
+                "Investimento Total": qty * cost,
+                "Lucro Previsto": qty * float(model["unit_profit"][i]),
+                "Base Decisão": model["sources"][i],
+            }
+        )
+    return results
+
+
+def build_joint_price_model(
+    products: Union[List[Product], Catalog],
+    risk_appetite: float,
+    points: int = JOINT_PRICE_POINTS,
+    demand: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Modelo de preço e quantidade em conjunto. Cada produto com curva de
+    demanda válida ganha `points - 1` preços candidatos (entre 80% do menor e
+    150% do maior preço do histórico, nunca abaixo de custo + 10% nem acima
+    do preço de demanda zero, mais o preço ótimo isolado); os demais ficam
+    só com o preço do modelo de duas etapas.
+
+    Cada candidato é uma "opção" com lucro unitário e teto de compra
+    próprios, calculados pelas mesmas regras de risco de
+    `build_purchase_model`; opções dominadas por um preço maior são
+    descartadas. O mínimo obrigatório não depende do preço.
+    """
+    catalog = as_catalog(products)
+    if demand is None:
+        demand = estimate_demand(catalog)
+    base = build_purchase_model(catalog, risk_appetite, demand)
+    rows = demand["rows"]
+    n = len(rows)
+
+    fits = analyze_price_elasticity_batch(catalog.take(rows))
+    price_min, price_max = history_price_range(catalog.take(rows))
+    cost, op_cost = base["cost"], base["op_cost"]
+    priced = np.array([f["valid"] for f in fits], dtype=bool) & (
+        np.asarray(base["sources"]) == "IA (Histórico)"
+    )
+    slope = np.array([f["elasticity"] if f["valid"] else 0.0 for f in fits])
+    intercept = np.array([f["intercept"] if f["valid"] else 0.0 for f in fits])
+
+    # --- GRADE DE PREÇOS ---
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zero_demand = np.where(priced, -intercept / slope, np.inf)
+    low = np.maximum(price_min * 0.8, cost * 1.1)
+    high = np.minimum(price_max * 1.5, zero_demand)
+    priced &= (high > low) & (points > 1)
+    k = max(points - 1, 1)
+    steps = np.linspace(0.0, 1.0, k)
+    grid = low[:, None] + (high - low)[:, None] * steps[None, :]
+    # O preço do modelo de duas etapas é sempre um dos candidatos
+    grid = np.column_stack([base["final_price"], grid])
+    candidate = np.zeros(grid.shape, dtype=bool)
+    candidate[:, 0] = True
+    candidate[priced, 1:] = True
+
+    # --- DEMANDA E RISCO POR OPÇÃO ---
+    committed = demand["committed"][:, None]
+    with np.errstate(invalid="ignore"):
+        predicted = np.maximum(0, np.trunc(slope[:, None] * grid + intercept[:, None]))
+    ceiling = np.maximum(np.trunc(predicted * 1.2), committed)
+    ceiling[:, 0] = demand["ceiling"]
+    allowed = np.floor(committed + (ceiling - committed) * risk_appetite)
+    upper = np.maximum(0, allowed - demand["stock"][:, None])
+    unit_profit = grid - (cost + op_cost)[:, None]
+
+    # --- PODA POR DOMINÂNCIA ---
+    # Do maior para o menor preço, o lucro unitário só cai; um preço menor
+    # só vale a pena se o lucro do teto inteiro passar o de todos os preços
+    # maiores (qualquer compra nele é igualada ou superada num preço maior).
+    # O maior preço de cada produto fica sempre.
+    order = np.argsort(np.where(candidate, -grid, np.inf), axis=1, kind="stable")
+    take = lambda a: np.take_along_axis(a, order, axis=1)
+    grid, candidate, upper, unit_profit = (
+        take(a) for a in (grid, candidate, upper, unit_profit)
+    )
+    total = np.where(candidate & (unit_profit > 0), unit_profit * upper, -np.inf)
+    best_above = np.maximum.accumulate(total, axis=1)
+    keep = candidate & (
+        total > np.column_stack([np.full(n, -np.inf), best_above[:, :-1]])
+    )
+    keep[:, 0] = True
+
+    item, col = np.nonzero(keep)
+    return {
+        **base,
+        "option_item": item,
+        "option_price": grid[item, col],
+        "option_profit": unit_profit[item, col],
+        "option_upper": upper[item, col],
+    }
+
+
+def _joint_relaxation(
+    model: Dict[str, Any], budget: float
+) -> Optional[Tuple[float, np.ndarray]]:
+    """
+    Relaxação linear do modelo de escolha única, em forma fechada.
+
+    Relaxado, cada produto pode gastar s reais com lucro f(s), o envelope
+    côncavo dos pontos (custo x teto, lucro x teto) de suas opções e do
+    mínimo obrigatório (ou da origem). Com uma única linha de orçamento, o
+    ótimo preenche os trechos dos envelopes em ordem decrescente de lucro
+    por real, e no máximo um produto fica no meio de um trecho.
+
+    Devolve (limite superior do lucro, opção escolhida por produto): a do
+    vértice onde o gasto de cada produto parou, ou a do vértice seguinte
+    no produto fracionário. None quando nem o mínimo obrigatório cabe.
+    """
+    item = model["option_item"]
+    cost, lower = model["cost"], model["lower"]
+    base_spend = float(cost @ lower)
+    if base_spend > budget + 1e-6:
+        return None
+
+    # Opções de cada produto em sequência, da de maior preço para a menor
+    starts = np.searchsorted(item, np.arange(len(model["ids"]) + 1))
+    profit = model["option_profit"].tolist()
+    spend = (cost[item] * model["option_upper"]).tolist()
+    gain = (model["option_profit"] * model["option_upper"]).tolist()
+    chosen = starts[:-1].copy()
+    bound = 0.0
+    segments = []
+    for i in range(len(chosen)):
+        first, last = int(starts[i]), int(starts[i + 1])
+        low = float(lower[i])
+        hull = [(float(cost[i]) * low, profit[first] * low, first)]
+        bound += hull[0][1]
+        for o in range(first, last):
+            point = (spend[o], gain[o], o)
+            if point[0] <= hull[-1][0]:
+                if point[1] > hull[-1][1] and len(hull) > 1:
+                    hull[-1] = point
+                continue
+            # Remove vértices que deixam o envelope não côncavo
+            while len(hull) > 1:
+                (x0, y0, _), (x1, y1, _) = hull[-2], hull[-1]
+                if (y1 - y0) * (point[0] - x0) <= (point[1] - y0) * (x1 - x0):
+                    hull.pop()
+                else:
+                    break
+            hull.append(point)
+        for (x0, y0, _), (x1, y1, o) in zip(hull, hull[1:]):
+            if y1 > y0:
+                segments.append(((y1 - y0) / (x1 - x0), x1 - x0, i, o))
+
+    remaining = budget - base_spend
+    segments.sort(key=lambda seg: -seg[0])
+    for slope, width, i, o in segments:
+        if remaining <= 0:
+            break
+        used = min(width, remaining)
+        bound += slope * used
+        remaining -= used
+        chosen[i] = o
+    return bound, chosen
+
+
+def _solve_joint(
+    model: Dict[str, Any],
+    budget: float,
+    info: Dict[str, Any],
+    deadline: Optional[float] = None,
+    mip_gap: float = JOINT_MIP_GAP,
+) -> Tuple[str, np.ndarray, np.ndarray]:
+    """
+    Fixa em cada produto o preço da relaxação linear e resolve as
+    quantidades inteiras na mochila exata; se o gap em relação ao limite da
+    relaxação passar de `mip_gap`, resolve o MILP completo no HiGHS.
+
+    Devolve (status, quantidade por produto, preço escolhido por produto);
+    `info` recebe o método usado e o gap.
+    """
+    relaxed = _joint_relaxation(model, budget)
+    if relaxed is None:
+        info.update(method="relaxation", mip_gap=None)
+        return (
+            "Infeasible",
+            np.zeros(len(model["ids"]), dtype=np.int64),
+            model["final_price"],
+        )
+
+    bound, chosen = relaxed
+    status, quantities = solve_bounded_knapsack(
+        model["option_profit"][chosen],
+        model["cost"],
+        model["lower"],
+        model["option_upper"][chosen],
+        budget,
+    )
+    profit = float(model["option_profit"][chosen] @ quantities)
+    gap = max(0.0, (bound - profit) / max(abs(bound), 1.0))
+    if status == "Optimal" and gap <= mip_gap:
+        info.update(method="relaxation", mip_gap=gap)
+        return status, quantities, model["option_price"][chosen]
+    return _solve_joint_highs(model, budget, info, deadline, mip_gap)
+
+
+def _solve_joint_highs(
+    model: Dict[str, Any],
+    budget: float,
+    info: Dict[str, Any],
+    deadline: Optional[float] = None,
+    mip_gap: float = JOINT_MIP_GAP,
+) -> Tuple[str, np.ndarray, np.ndarray]:
+    """
+    Formulação esparsa de escolha única: x_o (unidades compradas na opção
+    o) e, para produtos com mais de uma opção, z_o binária indicando o
+    preço escolhido, com x_o <= teto_o * z_o e soma de z_o <= 1 (= 1 quando
+    há mínimo obrigatório, atendido por soma de x_o >= mínimo).
+    """
+    item = model["option_item"]
+    upper = model["option_upper"]
+    lower = model["lower"]
+    n_items = len(model["ids"])
+    n_opts = item.size
+
+    per_item = np.bincount(item, minlength=n_items)
+    multi = per_item[item] > 1
+    z_of = np.flatnonzero(multi)
+    n_z = z_of.size
+    z_idx = np.arange(n_z)
+    x_lower = np.where(multi, 0.0, lower[item])
+
+    blocks = []
+    row_lo = []
+    row_hi = []
+    # Restrição Orçamentária
+    blocks.append(
+        (model["cost"][item], np.zeros(n_opts, dtype=np.int64), np.arange(n_opts))
+    )
+    row_lo.append([-np.inf])
+    row_hi.append([budget])
+    r = 1
+    # x_o - teto_o * z_o <= 0
+    rows = r + z_idx
+    blocks.append((np.ones(n_z), rows, z_of))
+    blocks.append((-upper[z_of], rows, n_opts + z_idx))
+    row_lo.append(np.full(n_z, -np.inf))
+    row_hi.append(np.zeros(n_z))
+    r += n_z
+    # Um preço por produto; mínimo obrigatório sobre a soma das opções
+    multi_items = np.flatnonzero(per_item > 1)
+    item_row = np.full(n_items, -1)
+    item_row[multi_items] = np.arange(multi_items.size)
+    blocks.append((np.ones(n_z), r + item_row[item[z_of]], n_opts + z_idx))
+    needs = lower[multi_items] > 0
+    row_lo.append(np.where(needs, 1.0, -np.inf))
+    row_hi.append(np.ones(multi_items.size))
+    r += multi_items.size
+    blocks.append((np.ones(n_z), r + item_row[item[z_of]], z_of))
+    row_lo.append(lower[multi_items])
+    row_hi.append(np.full(multi_items.size, np.inf))
+    r += multi_items.size
+
+    values, row_ids, col_ids = (np.concatenate(parts) for parts in zip(*blocks))
+    matrix = csr_array((values, (row_ids, col_ids)), shape=(r, n_opts + n_z))
+
+    options: Dict[str, Any] = {"mip_rel_gap": mip_gap}
+    time_left = _time_left(deadline)
+    if time_left is not None:
+        options["time_limit"] = time_left
+    res = milp(
+        c=-np.concatenate([model["option_profit"], np.zeros(n_z)]),
+        constraints=LinearConstraint(
+            matrix, np.concatenate(row_lo), np.concatenate(row_hi)
+        ),
+        integrality=np.ones(n_opts + n_z),
+        bounds=Bounds(
+            np.concatenate([x_lower, np.zeros(n_z)]),
+            np.concatenate([upper, np.ones(n_z)]),
+        ),
+        options=options,
+    )
+
+    status = _HIGHS_STATUS.get(res.status, "Undefined")
+    if status == "Not Solved" and res.x is not None:
+        status = "Feasible"
+    info.update(method="milp", mip_gap=getattr(res, "mip_gap", None))
+    quantities = np.zeros(n_items, dtype=np.int64)
+    prices = model["final_price"].copy()
+    if res.x is not None:
+        x = np.rint(res.x[:n_opts]).astype(np.int64)
+        np.add.at(quantities, item, x)
+        bought = x > 0
+        prices[item[bought]] = model["option_price"][bought]
+    return status, quantities, prices
+
+
+def optimize_joint_pricing_plan(
+    products: Union[List[Product], Catalog],
+    budget: float,
+    risk_appetite: float,
+    points: int = JOINT_PRICE_POINTS,
+    hook: Optional[MetricsHook] = None,
+    time_limit: Optional[float] = None,
+    mip_gap: float = JOINT_MIP_GAP,
+) -> Dict[str, Any]:
+    """
+    Plano de compra escolhendo também o preço de venda de cada produto com
+    curva de demanda válida, dentro do mesmo orçamento. O plano de duas
+    etapas (preço ótimo isolado) é sempre uma solução viável deste modelo,
+    então o lucro previsto nunca é menor. A coluna "Preço Venda" traz o
+    preço escolhido.
+    """
+    diagnostics = Diagnostics(hook)
+    with diagnostics.stage("demand_estimation"):
+        demand = estimate_demand(products)
+    with diagnostics.stage("model_build"):
+        model = build_joint_price_model(products, risk_appetite, points, demand)
+
+    skipped_products = model["skipped"]
+    item = model["option_item"]
+    n_opts = item.size
+    # Colunas do modelo: x_o de cada opção e z_o das opções de produtos com
+    # mais de um preço (ver _solve_joint_highs)
+    n_choices = int(np.count_nonzero(np.bincount(item)[item] > 1))
+    diagnostics.count(
+        products_total=len(products),
+        products_analyzed=len(model["ids"]),
+        products_skipped=len(skipped_products),
+        price_points=points,
+        price_options=n_opts,
+        variables=n_opts + n_choices,
+        backend_requested="highs",
+        backend_used="highs",
+        time_limit=time_limit,
+        mip_gap_target=mip_gap,
+    )
+    if not model["ids"]:
+        return {
+            "status": "Error",
+            "message": "Nenhum produto analisável.",
+            "data": [],
+            "diagnostics": diagnostics.as_dict(),
+        }
+
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    info: Dict[str, Any] = {}
+    with diagnostics.stage("solve"):
+        status, quantities, prices = _solve_joint(
+            model, budget, info, deadline, mip_gap
+        )
+    diagnostics.count(
+        solver_status=status,
+        solve_method=info.get("method"),
+        mip_gap=info.get("mip_gap"),
+    )
+
+    if status not in PLAN_STATUSES:
         return {
             "status": status,
             "data": [],
             "skipped": skipped_products,
             "message": "Orçamento insuficiente para cobrir as vendas já agendadas!",
+            "diagnostics": diagnostics.as_dict(),
+        }
+
+    with diagnostics.stage("extraction"):
+        chosen = {
+            **model,
+            "final_price": prices,
+            "unit_profit": prices - model["cost"] - model["op_cost"],
+        }
+        rows = plan_rows(chosen, quantities)
+    diagnostics.count(
+        items_purchased=len(rows),
+        prices_changed=int(np.sum((quantities > 0) & (prices != model["final_price"]))),
+    )
+
+    result = {"status": status, "data": rows, "skipped": skipped_products}
+    if status == "Feasible":
+        result["message"] = (
+            "Limite de tempo atingido: o plano usa a melhor solução encontrada."
+        )
+    result["diagnostics"] = diagnostics.as_dict()
+    return result
+
+
+def optimize_budget_frontier(
+    products: List[Product],
+    budgets: Sequence[float],
+    risk_appetite: float,
+    backend: str = DEFAULT_BACKEND,
+) -> Dict[str, Any]:
+    """
+    Curva lucro x investimento para vários orçamentos.
+
+    A demanda é estimada e o modelo é montado uma única vez; os orçamentos
+    são resolvidos em ordem crescente, reaproveitando a ordenação da mochila
+    e usando a solução do orçamento anterior (sempre viável para um
+    orçamento maior) como ponto de partida. Os pontos voltam na ordem de
+    `budgets`.
+    """
+    model = build_purchase_model(products, risk_appetite)
+
+    if not model["ids"]:
+        return {
+            "status": "Error",
+            "message": "Nenhum produto analisável.",
+            "points": [],
         }
 
-    for pid in variables:
-        qty = int(variables[pid].varValue)
-        if qty > 0:
-            d = meta_data[pid]
-            results.append(
-                {
-                    "Produto": d["name"],
-                    "Qtd Compra": qty,
-                    "Custo Unit": d["cost"],
-                    "Custo Operacional": d["op_cost"],
-                    "Preço Venda": d["final_price"],
-                    "Investimento Total": qty * d["cost"],
-                    "Lucro Previsto": qty * d["real_profit"],
-                    "Base Decisão": d["source"],
-                }
+    knapsack = None
+    if backend in ("auto", "knapsack") and not model["extra_constraints"]:
+        knapsack = BoundedKnapsack(
+            model["unit_profit"], model["cost"], model["lower"], model["upper"]
+        )
+
+    points: List[Dict[str, Any]] = [{} for _ in budgets]
+    previous = None
+    for idx in np.argsort(np.asarray(budgets, dtype=np.float64), kind="stable"):
+        budget = float(budgets[idx])
+
+        if knapsack is None:
+            status, quantities = solve_purchase_model(model, budget, backend)
+        else:
+            status, quantities = knapsack.solve(budget, warm_start=previous)
+            if status == "Not Solved" and backend == "auto":
+                status, quantities = solve_purchase_model(model, budget, MILP_BACKEND)
+
+        if status == "Optimal":
+            previous = quantities
+            profit = float(model["unit_profit"] @ quantities)
+            investment = float(model["cost"] @ quantities)
+        else:
+            profit = investment = 0.0
+
+        points[idx] = {
+            "budget": budget,
+            "status": status,
+            "profit": profit,
+            "investment": investment,
+        }
+
+    return {"status": "Optimal", "points": points, "skipped": model["skipped"]}
+
+
+def risk_label(risk_appetite: float) -> str:
+    if risk_appetite == 0.0:
+        return "Conservador"
+    if risk_appetite == 1.0:
+        return "Agressivo"
+    return "Moderado"
+
+
+def run_risk_scenarios(
+    products: List[Product],
+    budget: float,
+    risk_levels: Sequence[float] = RISK_SCENARIOS,
+    backend: str = DEFAULT_BACKEND,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Simula vários níveis de risco lado a lado.
+
+    A demanda é estimada uma única vez; cada nível de risco gera seu próprio
+    modelo, e os modelos são resolvidos em paralelo num pool de processos
+    (um por núcleo, até o número de cenários). `max_workers=1` resolve tudo
+    no processo atual.
+    """
+    demand = estimate_demand(products)
+    models = [build_purchase_model(products, r, demand) for r in risk_levels]
+
+    workers = min(len(models), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        plans = [solve_plan(model, budget, backend) for model in models]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            plans = list(
+                pool.map(
+                    solve_plan,
+                    models,
+                    [budget] * len(models),
+                    [backend] * len(models),
+                )
             )
 
-    return {"status": status, "data": results, "skipped": skipped_products}
+    scenarios = []
+    for risk, plan in zip(risk_levels, plans):
+        plan["risk"] = risk
+        plan["label"] = risk_label(risk)
+        scenarios.append(plan)
+    return {"scenarios": scenarios, "skipped": demand["skipped"]}
@@ -0,0 +1,87 @@
+"""
+Paridade entre os backends do solver: mesmo lucro e mesmas quantidades no
+catálogo de exemplo e em catálogos sintéticos reprodutíveis.
+"""
+
+import os
+import pytest
+from src.benchmark import generate_synthetic_catalog
+from src.persistence import load_state_file
+from src.solver import PLAN_STATUSES, optimize_purchasing_plan
+
+BACKENDS = ("knapsack", "highs", "cbc")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _solve_all(products, budget, risk=0.5):
+    return {
+        backend: optimize_purchasing_plan(products, budget, risk, backend)
+        for backend in BACKENDS
+    }
+
+
+def _profit(plan):
+    return sum(r["Lucro Previsto"] for r in plan["data"])
+
+
+def _quantities(plan):
+    return {r["ID"]: r["Qtd Compra"] for r in plan["data"]}
+
+
+def _assert_parity(plans):
+    reference = plans[BACKENDS[0]]
+    for backend, plan in plans.items():
+        assert plan["status"] == reference["status"], backend
+        assert _profit(plan) == pytest.approx(_profit(reference), abs=1e-6), backend
+        assert _quantities(plan) == _quantities(reference), backend
+
+
+def _synthetic(seed, n=40, min_order=None):
+    products = generate_synthetic_catalog(n, seed)
+    if min_order is not None:
+        for p in products:
+            p["min_order_qty"] = min_order
+    return products
+
+
+def test_store_data_parity():
+    state = load_state_file(os.path.join(ROOT, "store_data.json"))
+    plans = _solve_all(state["products"], state["budget"], state["risk_factor"])
+    _assert_parity(plans)
+    assert _profit(plans["knapsack"]) == pytest.approx(11042.41, abs=0.01)
+
+
+@pytest.mark.parametrize("seed", [1, 7, 42])
+@pytest.mark.parametrize("risk", [0.0, 0.5, 1.0])
+def test_synthetic_parity(seed, risk):
+    products = _synthetic(seed)
+    budget = sum(p["supplier_cost"] * p["manual_sales_estimate"] for p in products)
+    plans = _solve_all(products, budget / 5, risk)
+    assert plans["knapsack"]["status"] in PLAN_STATUSES
+    _assert_parity(plans)
+
+
+def test_min_order_parity():
+    # Pedidos agendados altos: boa parte do orçamento já está comprometida
+    products = _synthetic(3, min_order=8)
+    committed = sum(p["supplier_cost"] * 8 for p in products)
+    plans = _solve_all(products, committed * 1.5)
+    assert plans["knapsack"]["status"] in PLAN_STATUSES
+    _assert_parity(plans)
+
+
+def test_zero_budget_without_commitments():
+    products = _synthetic(5, min_order=0)
+    plans = _solve_all(products, 0.0)
+    _assert_parity(plans)
+    assert plans["knapsack"]["status"] in PLAN_STATUSES
+    assert _profit(plans["knapsack"]) == 0
+
+
+@pytest.mark.parametrize("budget", [0.0, 10.0])
+def test_infeasible_commitments(budget):
+    products = _synthetic(11, min_order=5)
+    plans = _solve_all(products, budget)
+    for backend, plan in plans.items():
+        assert plan["status"] not in PLAN_STATUSES, backend
+        assert plan["data"] == [], backend